@@ -0,0 +1,413 @@
+# -*- coding: UTF-8 -*-
+#
+# Copyright (c) 2009-2010 Ars Aperta, Itaapy, Pierlis, Talend.
+#
+# This file is part of Lpod (see: http://lpod-project.org).
+# Lpod is free software; you can redistribute it and/or modify it under
+# the terms of either:
+#
+# a) the GNU General Public License as published by the Free Software
+#    Foundation, either version 3 of the License, or (at your option)
+#    any later version.
+#    Lpod is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#    You should have received a copy of the GNU General Public License
+#    along with Lpod.  If not, see <http://www.gnu.org/licenses/>.
+#
+# b) the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+
+"""Bridge between odf_table and NumPy arrays or pandas data frames.
+
+NumPy is required, pandas only for the data frame functions.
+"""
+
+# Import from the Standard Library
+from math import isnan
+from xml.sax.saxutils import escape, quoteattr
+
+# Import from numpy
+from numpy import arange, array, concatenate, cumsum, datetime_as_string
+from numpy import empty, nan, repeat
+
+# Import from lpod
+from element import odf_create_element
+from table import _get_cell_range, odf_create_cell, odf_create_table
+
+
+# Rows decoded or encoded at once
+CHUNK_SIZE = 10000
+
+FLOAT_TYPES = frozenset(['float', 'percentage', 'currency'])
+
+
+def _get_cell_runs(row, x1, x2):
+    """Get the list of (x, count, value_type, cell) runs of cells with a
+    value between "x1" and "x2", x relative to "x1".
+    """
+    runs = []
+    x = 0
+    for cell in row._get_cells():
+        if x > x2:
+            break
+        repeated = cell.get_repeated() or 1
+        if x + repeated > x1:
+            value_type = cell.get_type()
+            if value_type is not None:
+                first = max(x, x1)
+                count = min(x + repeated - 1, x2) - first + 1
+                runs.append((first - x1, count, value_type, cell))
+        x += repeated
+    return runs
+
+
+
+def _make_array(runs, length, decoding):
+    """Build the array of a column from its (y, count, value_type, cell)
+    runs. Values are decoded once per run and broadcast.
+    """
+    if not runs:
+        result = empty(length, 'float64')
+        result.fill(nan)
+        return result
+    value_types = set(run[2] for run in runs)
+    if value_types <= FLOAT_TYPES:
+        values = array([cell.get_attribute('office:value')
+            for y, count, value_type, cell in runs], dtype='float64')
+        result = empty(length, 'float64')
+        result.fill(nan)
+    elif value_types == set(['date']):
+        # XXX "Z" means a UTC datetime, ignored like in DateTime.decode
+        values = array([cell.get_attribute('office:date-value').rstrip('Z')
+            for y, count, value_type, cell in runs], dtype='datetime64[us]')
+        result = empty(length, 'datetime64[us]')
+        result.fill('NaT')
+    else:
+        values = empty(len(runs), 'object')
+        values[:] = [cell.get_value(decoding=decoding)
+                for y, count, value_type, cell in runs]
+        result = empty(length, 'object')
+    offsets = array([run[0] for run in runs])
+    counts = array([run[1] for run in runs])
+    # Positions of every repetition of every run
+    starts = cumsum(counts) - counts
+    positions = (repeat(offsets, counts) + arange(counts.sum())
+            - repeat(starts, counts))
+    result[positions] = repeat(values, counts)
+    return result
+
+
+
+def iter_table_arrays(table, cell_range=None, chunk_size=CHUNK_SIZE,
+        decoding='decimal'):
+    """Iterate through the table by chunks of rows, as lists of one array
+    per column.
+
+    Columns of floats, percentages or currencies become "float64" arrays,
+    columns of dates "datetime64" arrays, and other columns "object"
+    arrays of the Python values, decoded as with ``odf_cell.get_value``.
+    Empty cells are NaN, NaT or None.
+
+    By default, the table is read up to its last populated row and column.
+    See ``odf_table.iter_values`` for the range syntax.
+
+    Arguments:
+
+        table -- odf_table
+
+        cell_range -- str or tuple
+
+        chunk_size -- int
+
+        decoding -- 'decimal', 'float' or 'raw'
+
+    Return: iterator of lists of numpy.ndarray
+    """
+    if cell_range is None:
+        width, height = table._get_rstripped_size(aggressive=True)
+        if not width:
+            return
+        x1, y1, x2, y2 = 0, 0, width - 1, height - 1
+    else:
+        x1, y1, x2, y2 = _get_cell_range(cell_range)
+    width = x2 - x1 + 1
+    columns = [[] for x in xrange(width)]
+    start = y1
+    y = 0
+    for row in table._get_rows():
+        if y > y2:
+            break
+        repeated = row.get_repeated() or 1
+        first = max(y, y1)
+        last = min(y + repeated - 1, y2)
+        y += repeated
+        if first > last:
+            continue
+        runs = _get_cell_runs(row, x1, x2)
+        # The rows may span several chunks
+        while first <= last:
+            end = min(last, start + chunk_size - 1)
+            for x, count, value_type, cell in runs:
+                run = (first - start, end - first + 1, value_type, cell)
+                for i in xrange(count):
+                    columns[x + i].append(run)
+            first = end + 1
+            if first == start + chunk_size:
+                yield [_make_array(column, chunk_size, decoding)
+                        for column in columns]
+                columns = [[] for x in xrange(width)]
+                start = first
+    length = min(y, y2 + 1) - start
+    if length > 0:
+        yield [_make_array(column, length, decoding) for column in columns]
+
+
+
+def table_to_arrays(table, cell_range=None, chunk_size=CHUNK_SIZE,
+        decoding='decimal'):
+    """Get the table as a list of one array per column.
+
+    See ``iter_table_arrays``.
+
+    Arguments:
+
+        table -- odf_table
+
+        cell_range -- str or tuple
+
+        chunk_size -- int
+
+        decoding -- 'decimal', 'float' or 'raw'
+
+    Return: list of numpy.ndarray
+    """
+    chunks = list(iter_table_arrays(table, cell_range=cell_range,
+        chunk_size=chunk_size, decoding=decoding))
+    if not chunks:
+        return []
+    if len(chunks) == 1:
+        return chunks[0]
+    return [concatenate(column) for column in zip(*chunks)]
+
+
+
+def table_to_dataframe(table, cell_range=None, header=True,
+        chunk_size=CHUNK_SIZE):
+    """Get the table as a pandas DataFrame. If header is True, the first
+    row gives the column names.
+
+    See ``iter_table_arrays``.
+
+    Arguments:
+
+        table -- odf_table
+
+        cell_range -- str or tuple
+
+        header -- bool
+
+        chunk_size -- int
+
+    Return: pandas.DataFrame
+    """
+    from pandas import DataFrame
+
+    if cell_range is None:
+        width, height = table._get_rstripped_size(aggressive=True)
+        x1, y1, x2, y2 = 0, 0, width - 1, height - 1
+    else:
+        x1, y1, x2, y2 = _get_cell_range(cell_range)
+    names = None
+    if header and x2 >= x1:
+        for values in table.iter_values((x1, y1, x2, y1)):
+            names = [unicode(x1 + i) if name is None else name
+                    for i, name in enumerate(values)]
+        y1 += 1
+    if x2 < x1 or y2 < y1:
+        return DataFrame(columns=names)
+    arrays = table_to_arrays(table, cell_range=(x1, y1, x2, y2),
+            chunk_size=chunk_size)
+    if not arrays:
+        return DataFrame(columns=names)
+    dataframe = DataFrame(dict(enumerate(arrays)), columns=range(len(arrays)))
+    if names is not None:
+        # Names may not be unique
+        dataframe.columns = names
+    return dataframe
+
+
+
+def _encode_column(column):
+    """Turn a column of values into the list of serialized cells.
+    """
+    kind = column.dtype.kind
+    empty_cell = u'<table:table-cell/>'
+    if kind == 'f':
+        return [empty_cell if isnan(value) else
+                (u'<table:table-cell office:value-type="float" '
+                 u'office:value="%s"><text:p>%s</text:p></table:table-cell>'
+                 % (text, text))
+                for value, text in zip(column, column.astype('unicode'))]
+    elif kind in 'iu':
+        return [(u'<table:table-cell office:value-type="float" '
+                 u'office:value="%s"><text:p>%s</text:p></table:table-cell>'
+                 % (value, value))
+                for value in column.astype('unicode')]
+    elif kind == 'b':
+        return [(u'<table:table-cell office:value-type="boolean" '
+                 u'office:boolean-value="%s"><text:p>%s</text:p>'
+                 u'</table:table-cell>' % (value, value))
+                for value in [u'true' if value else u'false'
+                    for value in column]]
+    elif kind == 'M':
+        # Dates without time are written as dates
+        unit = 'D' if (column.astype('datetime64[D]') == column).all() else 's'
+        return [empty_cell if value == u'NaT' else
+                (u'<table:table-cell office:value-type="date" '
+                 u'office:date-value="%s"><text:p>%s</text:p>'
+                 u'</table:table-cell>' % (value, value))
+                for value in datetime_as_string(column, unit=unit)]
+    # Python values, one by one
+    result = []
+    for value in column:
+        if value is None or (isinstance(value, float) and isnan(value)):
+            result.append(empty_cell)
+        elif isinstance(value, basestring):
+            if type(value) is str:
+                value = unicode(value, 'utf-8')
+            result.append(u'<table:table-cell office:value-type="string" '
+                    u'office:string-value=%s><text:p>%s</text:p>'
+                    u'</table:table-cell>' % (quoteattr(value),
+                        escape(value)))
+        else:
+            if hasattr(value, 'item'):
+                # NumPy scalar
+                value = value.item()
+            cell = odf_create_cell(value)
+            result.append(cell.serialize().decode('utf-8'))
+    return result
+
+
+
+def _collapse(items):
+    """Group identical consecutive items as (item, count) pairs.
+    """
+    result = []
+    for item in items:
+        if result and result[-1][0] == item:
+            result[-1][1] += 1
+        else:
+            result.append([item, 1])
+    return result
+
+
+
+def _encode_rows(columns):
+    """Serialize the rows of the given columns, collapsing repeated cells
+    and rows.
+    """
+    encoded = [_encode_column(column) for column in columns]
+    rows = []
+    for cells in zip(*encoded):
+        row = []
+        for cell, count in _collapse(cells):
+            if count > 1:
+                cell = cell.replace(u'<table:table-cell',
+                        u'<table:table-cell '
+                        u'table:number-columns-repeated="%d"' % count, 1)
+            row.append(cell)
+        rows.append(u''.join(row))
+    result = []
+    for row, count in _collapse(rows):
+        if count > 1:
+            result.append(u'<table:table-row table:number-rows-repeated='
+                    u'"%d">%s</table:table-row>' % (count, row))
+        else:
+            result.append(u'<table:table-row>%s</table:table-row>' % row)
+    return u''.join(result)
+
+
+
+def odf_create_table_from_arrays(name, arrays, style=None,
+        chunk_size=CHUNK_SIZE):
+    """Create a table from a list of one array (or sequence) per column.
+    All columns must have the same length.
+
+    Float, integer, boolean and datetime64 arrays are encoded at once,
+    other values one by one like ``odf_create_cell`` does. NaN, NaT and
+    None give empty cells. Identical consecutive cells and rows are
+    repeated instead of duplicated.
+
+    Arguments:
+
+        name -- unicode
+
+        arrays -- list of numpy.ndarray
+
+        style -- unicode
+
+        chunk_size -- int
+
+    Return: odf_table
+    """
+    table = odf_create_table(name, style=style)
+    if not len(arrays):
+        return table
+    columns = []
+    for column in arrays:
+        column = array(column)
+        if column.dtype.kind in 'SU':
+            column = column.astype('object')
+        columns.append(column)
+    height = len(columns[0])
+    for column in columns:
+        if len(column) != height:
+            raise ValueError, "all arrays must have the same length"
+    table.append(odf_create_element(
+        u'<table:table-column table:number-columns-repeated="%d"/>'
+        % len(columns)))
+    for start in xrange(0, height, chunk_size):
+        chunk = [column[start:start + chunk_size] for column in columns]
+        rows = odf_create_element(u'<table:table>%s</table:table>'
+                % _encode_rows(chunk))
+        for row in rows.get_children():
+            table.append(row)
+    return table
+
+
+
+def odf_create_table_from_dataframe(name, dataframe, header=True,
+        style=None, chunk_size=CHUNK_SIZE):
+    """Create a table from a pandas DataFrame. If header is True, the
+    column names are written in the first row.
+
+    See ``odf_create_table_from_arrays``.
+
+    Arguments:
+
+        name -- unicode
+
+        dataframe -- pandas.DataFrame
+
+        header -- bool
+
+        style -- unicode
+
+        chunk_size -- int
+
+    Return: odf_table
+    """
+    arrays = [dataframe[column].values for column in dataframe.columns]
+    table = odf_create_table_from_arrays(name, arrays, style=style,
+            chunk_size=chunk_size)
+    if header and len(arrays):
+        names = [unicode(column) for column in dataframe.columns]
+        table.insert_row(0, odf_create_element(u'<table:table-row>%s'
+            u'</table:table-row>' % u''.join(_encode_column(
+                array(names, dtype='object')))))
+    return table
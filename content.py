@@ -27,6 +27,7 @@
 #
 
 # Import from lpod
+from style import odf_style
 from utils import obsolete
 from xmlpart import odf_xmlpart
 
@@ -41,9 +42,9 @@ class odf_content(odf_xmlpart):
 
     def _get_style_contexts(self, family):
         if family == 'font-face':
-            return (self.get_element('//office:font-face-decls'),)
-        return (self.get_element('//office:font-face-decls'),
-                self.get_element('//office:automatic-styles'))
+            return (self._get_style_context('office:font-face-decls'),)
+        return (self._get_style_context('office:font-face-decls'),
+                self._get_style_context('office:automatic-styles'))
 
 
     #
@@ -90,12 +91,13 @@ class odf_content(odf_xmlpart):
 
         Return: odf_style or None if not found
         """
+        if isinstance(name_or_element, odf_style):
+            return name_or_element
         for context in self._get_style_contexts(family):
             if context is None:
                 continue
-            style = context.get_style(family,
-                    name_or_element=name_or_element,
-                    display_name=display_name)
+            style = self._get_indexed_style(context, family,
+                    name=name_or_element, display_name=display_name)
             if style is not None:
                 return style
         return None
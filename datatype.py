@@ -39,6 +39,12 @@ DATETIME_FORMAT_MICRO = DATETIME_FORMAT + '.%f'
 DURATION_FORMAT = 'PT%02dH%02dM%02dS'
 
 
+# Dates decoded by their ISO string, kept as datetime is immutable
+DATE_CACHE_SIZE = 10000
+_date_cache = {}
+_datetime_cache = {}
+
+
 
 class Boolean(object):
 
@@ -65,7 +71,13 @@ class Date(object):
 
     @staticmethod
     def decode(data):
-        return datetime.strptime(data, DATE_FORMAT)
+        value = _date_cache.get(data)
+        if value is None:
+            value = datetime.strptime(data, DATE_FORMAT)
+            if len(_date_cache) == DATE_CACHE_SIZE:
+                _date_cache.clear()
+            _date_cache[data] = value
+        return value
 
 
     @staticmethod
@@ -78,14 +90,22 @@ class DateTime(object):
 
     @staticmethod
     def decode(data):
+        value = _datetime_cache.get(data)
+        if value is not None:
+            return value
+        key = data
         # XXX "Z" means a UTC datetime, convert it ??
         # Cf http://en.wikipedia.org/wiki/ISO_8601
         if data.endswith('Z'):
             data = data[:-1]
-        try:
-            return datetime.strptime(data, DATETIME_FORMAT_MICRO)
-        except ValueError:
-            return datetime.strptime(data, DATETIME_FORMAT)
+        if '.' in data:
+            value = datetime.strptime(data, DATETIME_FORMAT_MICRO)
+        else:
+            value = datetime.strptime(data, DATETIME_FORMAT)
+        if len(_datetime_cache) == DATE_CACHE_SIZE:
+            _datetime_cache.clear()
+        _datetime_cache[key] = value
+        return value
 
 
     @staticmethod
@@ -28,9 +28,11 @@
 
 # Import from the Standard Library
 from copy import deepcopy
+from hashlib import sha1
 from mimetypes import guess_type
 from operator import itemgetter
 from os.path import splitext
+from re import compile
 from uuid import uuid4
 
 # Import from lpod
@@ -107,6 +109,37 @@ def _get_part_class(path):
 
 
 
+def _rename_links(element, mapping):
+    """Make the links from the element and its descendants to the old
+    paths of the mapping point to the new ones.
+    """
+    query = 'descendant-or-self::*[@xlink:href]'
+    for linked in element.get_elements(query):
+        new_url = mapping.get(linked.get_attribute('xlink:href'))
+        if new_url is not None:
+            linked.set_attribute('xlink:href', new_url)
+
+
+
+# Characters escaped in style names, e.g. "_20_" for a space
+_escaped_character = compile(r'_([0-9a-fA-F]{2,4})_')
+
+
+
+def _get_display_name(name):
+    return _escaped_character.sub(lambda match: unichr(int(match.group(1),
+        16)), name)
+
+
+
+# Styles prune_styles may delete
+_prunable_styles = frozenset(['style:style', 'style:page-layout',
+    'text:list-style', 'number:number-style', 'number:currency-style',
+    'number:percentage-style', 'number:date-style', 'number:time-style',
+    'number:boolean-style', 'number:text-style'])
+
+
+
 class odf_document(object):
     """Abstraction of the ODF document.
     """
@@ -119,6 +152,15 @@ class odf_document(object):
         self.__xmlparts = {}
         # Cache of the body
         self.__body = None
+        # Names of the automatic styles by key, see "insert_style"
+        self.__style_keys = None
+        # Next number of the automatic style names by family
+        self.__style_numbers = {}
+        # See "get_effective_properties"
+        self.__effective_properties = {}
+        self.__styles_versions = None
+        # Paths of the media by digest of their bytes, see "add_media"
+        self.__media_paths = None
 
 
     #
@@ -183,6 +225,112 @@ class odf_document(object):
         return self.container.del_part(path)
 
 
+    def __get_media_paths(self):
+        if self.__media_paths is None:
+            media_paths = {}
+            manifest = self.get_part(ODF_MANIFEST)
+            for path in manifest.get_paths():
+                if not path.startswith('Pictures/') or path.endswith('/'):
+                    continue
+                try:
+                    data = self.get_part(path)
+                except (KeyError, ValueError):
+                    # Listed but missing or deleted
+                    continue
+                media_paths.setdefault(sha1(data).digest(), path)
+            self.__media_paths = media_paths
+        return self.__media_paths
+
+
+    def __find_media(self, digest, data):
+        """Return the path of the media of the given bytes, if any.
+        """
+        for attempt in (0, 1):
+            path = self.__get_media_paths().get(digest)
+            if path is None:
+                return None
+            try:
+                if self.get_part(path) == data:
+                    return path
+            except (KeyError, ValueError):
+                pass
+            # Changed behind our back
+            self.__media_paths = None
+        return None
+
+
+    def add_media(self, full_path, data, media_type=None):
+        """Store the bytes of a media, e.g. an image, at the given path in
+        the container and the manifest. Media are told by the digest of
+        their bytes: if the same bytes are already stored, nothing is added
+        and the existing path is returned. If the path is taken by other
+        bytes, a unique name is made from it.
+
+        Arguments:
+
+            full_path -- str, e.g. "Pictures/logo.png"
+
+            data -- str
+
+            media_type -- str
+
+        Return: str, the path to reference in the content
+        """
+        digest = sha1(data).digest()
+        existing = self.__find_media(digest, data)
+        if existing is not None:
+            return existing
+        manifest = self.get_part(ODF_MANIFEST)
+        if '/' in full_path:
+            folder, name = full_path.rsplit('/', 1)
+            folder += '/'
+        else:
+            folder, name = '', full_path
+        # Generate a safe portable name
+        if manifest.get_media_type(full_path) is not None:
+            basename, extension = splitext(name)
+            full_path = '%s%s_%s%s' % (folder, basename, uuid4(), extension)
+        if folder:
+            # The top folder is listed, e.g. "Pictures/"
+            top_folder = folder.split('/', 1)[0] + '/'
+            if manifest.get_media_type(top_folder) is None:
+                manifest.add_full_path(top_folder)
+        self.container.set_part(full_path, data)
+        manifest.add_full_path(full_path, media_type)
+        self.__get_media_paths()[digest] = full_path
+        return full_path
+
+
+    def dedupe_media(self):
+        """Delete the media of the same bytes as a previous one, and make the
+        links of content and styles to them use the one kept.
+
+        Return: number of deleted media
+        """
+        self.__media_paths = None
+        media_paths = {}
+        mapping = {}
+        manifest = self.get_part(ODF_MANIFEST)
+        for path in manifest.get_paths():
+            if not path.startswith('Pictures/') or path.endswith('/'):
+                continue
+            try:
+                data = self.get_part(path)
+            except (KeyError, ValueError):
+                continue
+            first = media_paths.setdefault(sha1(data).digest(), path)
+            if first != path:
+                mapping[path] = first
+        if mapping:
+            for part_name in (ODF_CONTENT, ODF_STYLES):
+                _rename_links(self.get_part(part_name).get_root(), mapping)
+            for path in mapping:
+                self.del_part(path)
+                manifest.del_full_path(path)
+        self.__media_paths = media_paths
+        return len(mapping)
+
+
     def get_mimetype(self):
         return self.get_part('mimetype')
 
@@ -342,6 +490,9 @@ class odf_document(object):
         """Insert a file from a path or a fike-like object in the container.
         Return the full path to reference it in the content.
 
+        A file of the same bytes as a media already in the document is not
+        stored again, its path is returned instead. See "add_media".
+
         Arguments:
 
             path_or_file -- str or file-like
@@ -350,10 +501,6 @@ class odf_document(object):
         """
         name = None
         close_after = False
-        # Folder for added files (FIXME hard-coded and copied)
-        manifest = self.get_part(ODF_MANIFEST)
-        medias = manifest.get_paths()
-
         if type(path_or_file) is unicode or type(path_or_file) is str:
             path_or_file = path_or_file.encode('utf_8')
             file = open(path_or_file, 'rb')
@@ -365,31 +512,17 @@ class odf_document(object):
             #name = getattr(_file, 'name')
             name = 'image'
         name = name.count('./') and name.split('./')[-1] or name
-        # Generate a safe portable name
-        uuid = str(uuid4())
         if name is None:
-            name = uuid
+            # Generate a safe portable name
+            name = str(uuid4())
             media_type = ''
         else:
             basename, extension = splitext(name)
             name = basename + extension.lower()
             media_type, encoding = guess_type(name)
-            # Check this name is already used in the document
-            fullpath = 'Pictures/%s' % name
-            if fullpath in medias:
-                _, extension = splitext(name)
-                basename = '%s_%s' % (basename, uuid)
-                name = basename + extension.lower()
-                media_type, encoding = guess_type(name)
-
-        if manifest.get_media_type('Pictures/') is None:
-            manifest.add_full_path('Pictures/')
 
-        full_path = 'Pictures/%s' % (name)
-        self.container.set_part(full_path, file.read())
-
-        # Update manifest
-        manifest.add_full_path(full_path, media_type)
+        full_path = self.add_media('Pictures/%s' % name, file.read(),
+                media_type)
         # Close file
         if close_after:
             file.close()
@@ -443,6 +576,29 @@ class odf_document(object):
         container.save(target, packaging)
 
 
+    def to_sqlite(self, path, header=False):
+        """Export the tables of the spreadsheet to the SQLite database at
+        the given path, one SQL table per table, named after it. Existing
+        SQL tables of the same names are replaced.
+
+        See ``odf_table.to_sqlite``.
+
+        Arguments:
+
+            path -- str
+
+            header -- bool
+        """
+        from sqlite3 import connect
+
+        connection = connect(path)
+        try:
+            for table in self.get_body().get_tables():
+                table.to_sqlite(connection, header=header)
+        finally:
+            connection.close()
+
+
     #
     # Styles over several parts
     #
@@ -487,7 +643,60 @@ class odf_document(object):
                 display_name=display_name)
 
 
-    def insert_style(self, style, name=None, automatic=False, default=False):
+    def get_effective_properties(self, family, name=None, area=None):
+        """Get the properties the style applies, merged from the default
+        style of the family, the parent styles from the farthest, and the
+        style itself. By default the area is the family, see
+        "odf_style.get_properties".
+
+        Results are cached until styles are inserted, deleted or renamed
+        through the methods of the document. After changing a style in
+        place, call the "_styles_changed" of its part.
+
+        Arguments:
+
+            family -- str
+
+            name -- unicode, or None for the default style
+
+            area -- str
+
+        Return: dict
+        """
+        versions = tuple(self.get_part(part_name)._get_style_version()
+                for part_name in (ODF_CONTENT, ODF_STYLES))
+        if self.__styles_versions != versions:
+            self.__effective_properties = {}
+            self.__styles_versions = versions
+        cache = self.__effective_properties
+        key = (family, name, area)
+        properties = cache.get(key)
+        if properties is not None:
+            return properties.copy()
+        # From the style to the farthest parent, then the default style
+        styles = []
+        seen = set()
+        while name is not None and name not in seen:
+            seen.add(name)
+            style = self.get_style(family, name)
+            if style is None:
+                break
+            styles.append(style)
+            name = style.get_parent_style()
+        default = self.get_style(family)
+        if default is not None and default.get_name() is None:
+            styles.append(default)
+        properties = {}
+        for style in reversed(styles):
+            style_properties = style.get_properties(area=area)
+            if style_properties:
+                properties.update(style_properties)
+        cache[key] = properties
+        return properties.copy()
+
+
+    def insert_style(self, style, name=None, automatic=False, default=False,
+            dedupe=False):
         """Insert the given style object in the document, as required by the
         style family and type.
 
@@ -503,6 +712,10 @@ class odf_document(object):
 
         Automatic and default arguments are mutually exclusive.
 
+        If dedupe is True, an automatic style formatting like one already in
+        the document (see "odf_style.get_key") is not inserted, and it
+        takes the name of the existing one.
+
         All styles can’t be used as default styles. Default styles are
         allowed for the following families: paragraph, text, section, table,
         table-column, table-row, table-cell, table-page, chart, drawing-page,
@@ -517,6 +730,10 @@ class odf_document(object):
             automatic -- bool
 
             default -- bool
+
+            dedupe -- bool
+
+        Return: unicode, the name of the style in the document
         """
 
         # Get family and name
@@ -527,43 +744,40 @@ class odf_document(object):
         # Master page style
         if isinstance(style, odf_master_page):
             part = self.get_part(ODF_STYLES)
-            container = part.get_element("office:master-styles")
+            container = part._get_style_context("office:master-styles")
             existing = part.get_style(family, name)
         # Font face declarations
         elif isinstance(style, odf_font_style):
             # XXX If inserted in styles.xml => It doesn't work, it's normal?
             part = self.get_part(ODF_CONTENT)
-            container = part.get_element("office:font-face-decls")
+            container = part._get_style_context("office:font-face-decls")
             existing = part.get_style(family, name)
         # Common style
         elif isinstance(style, odf_style):
             # Common style
             if name and automatic is False and default is False:
                 part = self.get_part(ODF_STYLES)
-                container = part.get_element("office:styles")
+                container = part._get_style_context("office:styles")
                 existing = part.get_style(family, name)
 
             # Automatic style
             elif automatic is True and default is False:
                 part = self.get_part(ODF_CONTENT)
-                container = part.get_element("office:automatic-styles")
+                container = part._get_style_context(
+                        "office:automatic-styles")
+
+                if dedupe:
+                    key = style.get_key()
+                    found = self.__get_automatic_style(family, key)
+                    if found is not None:
+                        name = found.get_name()
+                        style.set_name(name)
+                        return name
 
                 # A name ?
                 if name is None:
                     # Make a beautiful name
-
-                    # TODO: Use prefixes of Ooo: Mpm1, ...
-                    prefix = 'lpod_auto_'
-
-                    styles = self.get_style_list(family=family, automatic=True)
-                    names = [ s.get_name () for s in styles ]
-                    numbers = [ int(name[len(prefix):]) for name in names
-                                if name and name.startswith(prefix) ]
-                    if numbers:
-                        number = max(numbers) + 1
-                    else:
-                        number = 1
-                    name = prefix + str(number)
+                    name = self.__get_automatic_name(family)
 
                     # And set it
                     style.set_name(name)
@@ -574,7 +788,7 @@ class odf_document(object):
             # Default style
             elif automatic is False and default is True:
                 part = self.get_part(ODF_STYLES)
-                container = part.get_element("office:styles")
+                container = part._get_style_context("office:styles")
 
                 # Force default style
                 style.set_tag("style:default-style")
@@ -592,13 +806,76 @@ class odf_document(object):
 
         # Insert it!
         if existing is not None:
-            container.delete(existing)
-        container.append(style)
+            part._delete_style(container, existing)
+        part._append_style(container, style)
+        if automatic is True and self.__style_keys is not None:
+            self.__style_keys.setdefault(style.get_key(), style.get_name())
+        return style.get_name()
+
+
+    def __get_automatic_name(self, family):
+        """Allocate the next "lpod_auto_N" name of the family, the numbers
+        being read from the existing names on the first call only.
+        """
+        # TODO: Use prefixes of Ooo: Mpm1, ...
+        prefix = 'lpod_auto_'
+        numbers = self.__style_numbers
+        number = numbers.get(family)
+        if number is None:
+            styles = self.get_style_list(family=family, automatic=True)
+            names = [ s.get_name () for s in styles ]
+            existing = [ int(name[len(prefix):]) for name in names
+                         if name and name.startswith(prefix)
+                         and name[len(prefix):].isdigit() ]
+            number = max(existing) + 1 if existing else 1
+        # Names given since by hand
+        content = self.get_part(ODF_CONTENT)
+        while content.get_style(family, prefix + str(number)) is not None:
+            number += 1
+        numbers[family] = number + 1
+        return prefix + str(number)
+
+
+    def __get_automatic_style(self, family, key):
+        """Find the automatic style of content of the given family and key,
+        from a cache built on the first call.
+        """
+        content = self.get_part(ODF_CONTENT)
+        for attempt in (0, 1):
+            if self.__style_keys is None:
+                style_keys = {}
+                context = content._get_style_context(
+                        'office:automatic-styles')
+                for style in context.get_children():
+                    if not isinstance(style, odf_style):
+                        continue
+                    name = style.get_name()
+                    if name is not None:
+                        style_keys.setdefault(style.get_key(), name)
+                self.__style_keys = style_keys
+            name = self.__style_keys.get(key)
+            if name is None:
+                return None
+            style = content.get_style(family, name)
+            if style is not None and style.get_key() == key:
+                return style
+            # Changed behind our back
+            self.__style_keys = None
+        return None
+
+
+    def __styles_changed(self):
+        """Reset the style caches of the document and its parts, after
+        styles were deleted or renamed in place.
+        """
+        self.__style_keys = None
+        for part_name in (ODF_CONTENT, ODF_STYLES):
+            self.get_part(part_name)._styles_changed()
 
 
     def get_styled_elements(self, name=True):
-        """Brute-force to find paragraphs, tables, etc. using the given style
-        name (or all by default).
+        """Find paragraphs, tables, etc. using the given style name (or any
+        style by default), in content then styles.
 
         Arguments:
 
@@ -613,8 +890,25 @@ class odf_document(object):
                 + styles.get_root().get_styled_elements(name))
 
 
+    def get_style_usage(self):
+        """Map the name of every style referenced in the document, from
+        content or from other styles, to the list of elements referencing
+        it. The document is read once, so prefer it to
+        "get_styled_elements" for many styles.
+
+        Return: dict of unicode: list of odf_element
+        """
+        usage = self.get_part(ODF_CONTENT).get_root().get_style_usage()
+        # Header, footer, etc. have styles too
+        styles_usage = self.get_part(ODF_STYLES).get_root().get_style_usage()
+        for name, elements in styles_usage.iteritems():
+            usage.setdefault(name, []).extend(elements)
+        return usage
+
+
     def show_styles(self, automatic=True, common=True, properties=False):
         infos = []
+        usage = self.get_style_usage()
         for style in self.get_style_list():
             name = style.get_name()
             is_auto = (style.get_parent().get_tag()
@@ -622,7 +916,8 @@ class odf_document(object):
             if (is_auto and automatic is False
                     or not is_auto and common is False):
                 continue
-            is_used = bool(self.get_styled_elements(name))
+            # Default styles are always used
+            is_used = name is None or name in usage
             infos.append({'type': u"auto  " if is_auto else u"common",
                           'used': u"y" if is_used else u"n",
                           'family': style.get_family() or u"",
@@ -660,14 +955,8 @@ class odf_document(object):
         Return: number of deleted styles
         """
         # First remove references to styles
-        for element in self.get_styled_elements():
-            for attribute in ('text:style-name', 'draw:style-name',
-                    'draw:text-style-name', 'table:style-name',
-                    'style:page-layout-name'):
-                try:
-                    element.del_attribute(attribute)
-                except KeyError:
-                    continue
+        for part_name in (ODF_CONTENT, ODF_STYLES):
+            self.get_part(part_name).get_root()._del_style_references()
         # Then remove supposedly orphaned styles
         i = 0
         for style in self.get_style_list():
@@ -679,19 +968,179 @@ class odf_document(object):
             #    continue
             style.delete()
             i += 1
+        self.__styles_changed()
+        return i
+
+
+    def dedupe_styles(self):
+        """Merge the automatic styles formatting the same way (see
+        "odf_style.get_key") into the first of them, and make their
+        references use it, in content and in styles.
+
+        Styles whose name is shared by several families of the same part
+        are left untouched.
+
+        Return: number of deleted styles
+        """
+        i = 0
+        for part_name in (ODF_CONTENT, ODF_STYLES):
+            part = self.get_part(part_name)
+            context = part._get_style_context('office:automatic-styles')
+            if context is None:
+                continue
+            # Merging styles may make the styles using them identical
+            while True:
+                styles = [style for style in context.get_children()
+                        if isinstance(style, odf_style)]
+                families = {}
+                for style in styles:
+                    families.setdefault(style.get_name(), set()).add(
+                            (style.get_tag(),
+                                style.get_attribute('style:family')))
+                kept = {}
+                mapping = {}
+                duplicates = []
+                for style in styles:
+                    name = style.get_name()
+                    if name is None or len(families[name]) > 1:
+                        continue
+                    first = kept.setdefault(style.get_key(), name)
+                    if first != name:
+                        mapping[(style.get_family(), name)] = first
+                        duplicates.append(style)
+                if not duplicates:
+                    break
+                part.get_root()._rename_style_references(mapping)
+                for style in duplicates:
+                    style.delete()
+                i += len(duplicates)
+        self.__styles_changed()
         return i
 
 
-    def merge_styles_from(self, document):
+    def prune_styles(self, common=False):
+        """Delete the automatic styles that nothing uses, and the common
+        ones too if common is True.
+
+        A style is used if it is referenced from the body, master pages,
+        default styles or other styles kept, directly or through other
+        styles: parent, list, data, page layout or master page styles. Only
+        content.xml and styles.xml are read, settings.xml holding no style
+        reference. Styles are matched by name only, whatever their family.
+        Master pages, font faces and drawing styles are never deleted.
+
+        Return: number of deleted styles
+        """
+        contexts = ('office:styles', 'office:automatic-styles',
+                'office:master-styles')
+        # Style name -> names of the styles it refers to
+        references = {}
+        live = set()
+        candidates = []
+        for part_name in (ODF_CONTENT, ODF_STYLES):
+            part = self.get_part(part_name)
+            for child in part.get_root().get_children():
+                tag = child.get_tag()
+                if tag not in contexts:
+                    live.update(child._get_referenced_styles())
+                    continue
+                prunable = (tag == 'office:automatic-styles'
+                        or (tag == 'office:styles' and common is True))
+                for style in child.get_children():
+                    names = style._get_referenced_styles()
+                    name = style.get_attribute('style:name')
+                    if (prunable and name is not None
+                            and style.get_tag() in _prunable_styles):
+                        references.setdefault(name, set()).update(names)
+                        candidates.append((name, style))
+                    else:
+                        live.update(names)
+        # Mark
+        stack = list(live)
+        while stack:
+            for name in references.pop(stack.pop(), ()):
+                if name not in live:
+                    live.add(name)
+                    stack.append(name)
+        # Sweep
+        i = 0
+        for name, style in candidates:
+            if name not in live:
+                style.delete()
+                i += 1
+        if i:
+            self.__styles_changed()
+        return i
+
+
+    def rename_styles(self, mapping):
+        """Rename styles from the (family, old name) to the new names of
+        the mapping, and their references from content and styles, in one
+        traversal. Where a style of the same family already has the new
+        name, the old style is deleted instead, its references now pointing
+        to the existing one. A display name follows the new name, "_20_"
+        and the like decoded as desktop applications do.
+
+        Arguments:
+
+            mapping -- dict of (str, unicode): unicode
+
+        Return: number of renamed or deleted styles
+        """
+        styles = self.get_style_list()
+        names = set((style.get_family(), style.get_name())
+                for style in styles)
+        i = 0
+        for style in styles:
+            family = style.get_family()
+            new_name = mapping.get((family, style.get_name()))
+            if new_name is None:
+                continue
+            # Unless the existing style is renamed too
+            new_key = (family, new_name)
+            if new_key in names and new_key not in mapping:
+                style.delete()
+            else:
+                style.set_name(new_name)
+                if style.get_display_name() is not None:
+                    style.set_display_name(_get_display_name(new_name))
+            i += 1
+        for part_name in (ODF_CONTENT, ODF_STYLES):
+            self.get_part(part_name).get_root()._rename_style_references(
+                    mapping)
+        self.__styles_changed()
+        return i
+
+
+    def merge_styles_from(self, document, conflict='replace'):
         """Copy all the styles of a document into ourself.
 
-        Styles with the same type and name will be replaced, so only unique
-        styles will be preserved.
+        Styles with the same type and name as ours follow the conflict
+        policy: "replace" ours, "keep" ours, or "rename" the copied ones.
+        Renamed styles are also renamed where the copied styles use them,
+        but the source document is left untouched: rename its content with
+        the returned mapping before copying it. Styles without a name and
+        font faces are kept when renaming.
+
+        Images of master pages and fill images are copied at the end, those
+        already in the document being reused, see "add_media".
+
+        Arguments:
+
+            document -- odf_document
+
+            conflict -- 'replace', 'keep' or 'rename'
+
+        Return: dict of the (family, old name) to the new names of renamed
+                styles
         """
-        styles = self.get_part(ODF_STYLES)
-        content = self.get_part(ODF_CONTENT)
-        manifest = self.get_part(ODF_MANIFEST)
-        document_manifest = document.get_part(ODF_MANIFEST)
+        if conflict not in ('replace', 'keep', 'rename'):
+            raise ValueError, 'unknown conflict policy "%s"' % conflict
+        parts = {'office:document-styles': self.get_part(ODF_STYLES),
+                 'office:document-content': self.get_part(ODF_CONTENT)}
+        # Destination style contexts, looked up once
+        contexts = {}
+        merged = []
         for style in document.get_style_list():
             tagname = style.get_tag()
             family = style.get_family()
@@ -700,11 +1149,8 @@ class odf_document(object):
             container_name = container.get_tag()
             partname = container.get_parent().get_tag()
             # The destination part
-            if partname == "office:document-styles":
-                part = styles
-            elif partname == "office:document-content":
-                part = content
-            else:
+            part = parts.get(partname)
+            if part is None:
                 raise NotImplementedError, partname
             # Implemented containers
             if container_name not in ('office:styles',
@@ -712,31 +1158,91 @@ class odf_document(object):
                                       'office:master-styles',
                                       'office:font-face-decls'):
                 raise NotImplementedError, container_name
-            dest = part.get_element('//%s' % container_name)
+            dest = part._get_style_context(container_name)
             # Implemented style types
             if tagname not in registered_styles:
                 raise NotImplementedError, tagname
-            duplicate = part.get_style(family, stylename)
+            key = (partname, family)
+            if key not in contexts:
+                contexts[key] = [context
+                        for context in part._get_style_contexts(family)
+                        if context is not None]
+            duplicate = None
+            for context in contexts[key]:
+                duplicate = part._get_indexed_style(context, family,
+                        name=stylename)
+                if duplicate is not None:
+                    break
+            merged.append((style.clone(), part, dest, duplicate))
+        # New names
+        renamed = {}
+        if conflict == 'rename':
+            # The same name may be used by several families
+            new_names = {}
+            names = set(style.get_name() for style, part, dest, duplicate
+                    in merged)
+            for i, (style, part, dest, duplicate) in enumerate(merged):
+                name = style.get_name()
+                if (duplicate is None or name is None
+                        or style.get_tag() == 'style:font-face'):
+                    continue
+                family = style.get_family()
+                new_name = new_names.get(name)
+                if (new_name is None
+                        or part.get_style(family, new_name) is not None):
+                    number = 1
+                    while True:
+                        new_name = u"%s_%d" % (name, number)
+                        if (new_name not in names and
+                                part.get_style(family, new_name) is None):
+                            break
+                        number += 1
+                    names.add(new_name)
+                    new_names[name] = new_name
+                style.set_name(new_name)
+                renamed[(family, name)] = new_name
+                # No longer a duplicate
+                merged[i] = (style, part, dest, None)
+            if renamed:
+                for style, part, dest, duplicate in merged:
+                    style._rename_style_references(renamed)
+        # Insert
+        urls = []
+        linked = []
+        for style, part, dest, duplicate in merged:
             if duplicate is not None:
-                duplicate.delete()
-            dest.append(style)
-            # Copy images from the header/footer
+                if conflict != 'replace':
+                    continue
+                part._delete_style(duplicate.get_parent(), duplicate)
+            part._append_style(dest, style)
+            tagname = style.get_tag()
+            # Images from the header/footer
             if tagname == 'style:master-page':
                 query = 'descendant::draw:image'
-                for image in style.get_elements(query):
-                    url = image.get_url()
-                    part = document.get_part(url)
-                    # Manually add the part to keep the name
-                    self.set_part(url, part)
-                    media_type = document_manifest.get_media_type(url)
-                    manifest.add_full_path(url, media_type)
-            # Copy images from the fill-image
+                images = style.get_elements(query)
+                if images:
+                    urls.extend(image.get_url() for image in images)
+                    linked.append(style)
+            # Images from the fill-image
             elif tagname == 'draw:fill-image':
-                url = style.get_url()
-                part = document.get_part(url)
-                self.set_part(url, part)
-                media_type = document_manifest.get_media_type(url)
-                manifest.add_full_path(url, media_type)
+                urls.append(style.get_url())
+                linked.append(style)
+        # Copy the images at once, reusing the identical ones
+        if urls:
+            media_types = dict(
+                    document.get_part(ODF_MANIFEST).get_path_medias())
+            links = {}
+            for url in urls:
+                if url in links:
+                    continue
+                links[url] = self.add_media(url, document.get_part(url),
+                        media_types.get(url))
+            links = dict((url, path) for url, path in links.iteritems()
+                    if path != url)
+            if links:
+                for style in linked:
+                    _rename_links(style, links)
+        return renamed
 
 
 
@@ -30,13 +30,14 @@ from copy import deepcopy
 from re import search, compile
 
 # Import from lxml
-from lxml.etree import fromstring, tostring, Element, _Element
+from lxml.etree import fromstring, tostring, Element, XMLParser, _Element
 from lxml.etree import _ElementStringResult, _ElementUnicodeResult
 
 # Import from lpod
 from datatype import DateTime, Boolean
 from utils import _get_abspath, _get_elements, _get_element
-from utils import _get_style_tagname, get_value, obsolete
+from utils import _get_style_tagname, _get_style_family, get_value
+from utils import obsolete
 
 
 ODF_NAMESPACES = {
@@ -121,6 +122,119 @@ def _get_prefixed_name(tag):
 
 
 
+def _get_clark_name(qname):
+    """Turn a prefixed name to the lxml "{uri}name" syntax.
+    """
+    return '{%s}%s' % _decode_qname(qname)
+
+
+
+# Attributes referring to a style by its name, with the families of the
+# styles they refer to, None where it depends on the element
+_style_name_attributes = dict((_get_clark_name(qname), families)
+        for qname, families in (('text:style-name', None),
+            ('text:cond-style-name', ('paragraph',)),
+            ('text:visited-style-name', ('text',)),
+            ('draw:style-name', None),
+            ('draw:text-style-name', ('paragraph',)),
+            ('draw:master-page-name', ('master-page',)),
+            ('presentation:style-name', ('presentation',)),
+            ('table:style-name', None),
+            ('table:default-cell-style-name', ('table-cell',)),
+            ('chart:style-name', ('chart',)),
+            ('style:parent-style-name', None),
+            ('style:next-style-name', ('paragraph',)),
+            ('style:list-style-name', ('list',)),
+            ('style:data-style-name', ('number', 'percentage', 'time',
+                'date')),
+            ('style:page-layout-name', ('page-layout',)),
+            ('style:master-page-name', ('master-page',)),
+            ('style:apply-style-name', None),
+            ('style:leader-text-style', ('text',)),
+            ('style:register-truth-ref-style-name', ('paragraph',)),
+            ('style:font-name', ('font-face',)),
+            ('style:font-name-asian', ('font-face',)),
+            ('style:font-name-complex', ('font-face',)),
+            ('text:default-style-name', ('paragraph',)),
+            ('text:citation-style-name', ('text',)),
+            ('text:citation-body-style-name', ('text',)),
+            ('text:main-entry-style-name', ('text',)),
+            ('text:master-page-name', ('master-page',))))
+
+# Where the family depends on the element: family by tag, and otherwise
+_reference_families_by_tag = {
+        _get_clark_name('text:style-name'): (dict(
+            (_get_clark_name(qname), family) for qname, family in (
+                ('text:p', 'paragraph'), ('text:h', 'paragraph'),
+                ('text:list', 'list'), ('text:numbered-paragraph', 'list'),
+                ('text:section', 'section'),
+                ('text:table-of-content', 'section'),
+                ('text:illustration-index', 'section'),
+                ('text:table-index', 'section'),
+                ('text:object-index', 'section'),
+                ('text:user-index', 'section'),
+                ('text:alphabetical-index', 'section'),
+                ('text:bibliography', 'section'))), 'text'),
+        _get_clark_name('table:style-name'): (dict(
+            (_get_clark_name(qname), family) for qname, family in (
+                ('table:table-column', 'table-column'),
+                ('table:table-row', 'table-row'),
+                ('table:table-cell', 'table-cell'),
+                ('table:covered-table-cell', 'table-cell'))), 'table'),
+        _get_clark_name('draw:style-name'): ({
+            _get_clark_name('draw:page'): 'drawing-page'}, 'graphic')}
+
+_style_element_tags = (_get_clark_name('style:style'),
+        _get_clark_name('style:default-style'))
+_style_family_attribute = _get_clark_name('style:family')
+_apply_style_name_attribute = _get_clark_name('style:apply-style-name')
+
+
+
+def _get_native_style_family(native_element):
+    tag = native_element.tag
+    if tag in _style_element_tags:
+        return native_element.get(_style_family_attribute)
+    return _get_style_family(_get_prefixed_name(tag))
+
+
+
+def _get_reference_families(native_element, key):
+    """Get the families of the styles the attribute of the element may
+    refer to.
+    """
+    families = _style_name_attributes[key]
+    if families is not None:
+        return families
+    by_tag = _reference_families_by_tag.get(key)
+    if by_tag is not None:
+        families_by_tag, default = by_tag
+        return (families_by_tag.get(native_element.tag, default),)
+    # Parent and conditional styles are of the family of the style
+    if key == _apply_style_name_attribute:
+        native_element = native_element.getparent()
+        if native_element is None:
+            return ()
+    return (_get_native_style_family(native_element),)
+
+
+
+def _iter_style_references(native_element, include_self=False):
+    """Iterate the (native element, lxml attribute name, style name) of the
+    style references below the given element, in document order. The
+    element itself is included on demand.
+    """
+    if include_self:
+        elements = native_element.iter(tag=Element)
+    else:
+        elements = native_element.iterdescendants(tag=Element)
+    for element in elements:
+        for key, value in element.items():
+            if key in _style_name_attributes:
+                yield element, key, value
+
+
+
 #
 # Semi-Public API
 # (not in the lpOD specification but foundation of the Python implementation)
@@ -203,6 +317,30 @@ def odf_create_element(element_data):
 
 
 
+def _create_element_from_chunks(chunks):
+    """Like ``odf_create_element`` for an XML fragment given as pieces of
+    str or unicode, e.g. from a generator. They are parsed as they come so
+    the whole fragment is never in memory as text.
+
+    Arguments:
+
+        chunks -- iterable of str or unicode
+
+    Return: odf_element
+    """
+    head, tail = ns_document_data.split('%s')
+    parser = XMLParser()
+    parser.feed(head)
+    for chunk in chunks:
+        if type(chunk) is unicode:
+            chunk = chunk.encode('utf-8')
+        parser.feed(chunk)
+    parser.feed(tail)
+    root = parser.close()
+    return _make_odf_element(root[0])
+
+
+
 # TODO remove some day
 def _debug_element(native_element):
     return repr(odf_element(native_element).serialize(pretty=True))
@@ -472,7 +610,7 @@ class odf_element(object):
         Return: odf_element or a subclass
         """
         element = self.__element
-        element.tag = '{%s}%s' % _decode_qname(qname)
+        element.tag = _get_clark_name(qname)
         return _make_odf_element(element)
 
 
@@ -697,6 +835,16 @@ class odf_element(object):
         return [_make_odf_element(e) for e in element]
 
 
+    def _get_native_child(self, position):
+        """Return the lxml child at the given position, or None. Cheap
+        from the end, unlike counting the children.
+        """
+        try:
+            return self.__element[position]
+        except IndexError:
+            return None
+
+
     def index(self, child):
         """Return the position of the child in this element.
 
@@ -765,13 +913,9 @@ class odf_element(object):
         elif xmlposition is LAST_CHILD:
             current.append(element)
         elif xmlposition is NEXT_SIBLING:
-            parent = current.getparent()
-            index = parent.index(current)
-            parent.insert(index + 1, element)
+            current.addnext(element)
         elif xmlposition is PREV_SIBLING:
-            parent = current.getparent()
-            index = parent.index(current)
-            parent.insert(index, element)
+            current.addprevious(element)
         else:
             raise ValueError, "(xml)position must be defined"
 
@@ -886,8 +1030,9 @@ class odf_element(object):
 
 
     def get_styled_elements(self, name=True):
-        """Brute-force to find paragraphs, tables, etc. using the given style
-        name (or all by default).
+        """Find paragraphs, tables, etc. using the given style name (or any
+        style by default), in document order. See "get_style_usage" to
+        answer several names at once.
 
         Arguments:
 
@@ -895,14 +1040,89 @@ class odf_element(object):
 
         Return: list
         """
-        # FIXME incomplete (and possibly inaccurate)
-        return (_get_elements(self, 'descendant::*', text_style=name)
-                + _get_elements(self, 'descendant::*', draw_style=name)
-                + _get_elements(self, 'descendant::*', draw_text_style=name)
-                + _get_elements(self, 'descendant::*', table_style=name)
-                + _get_elements(self, 'descendant::*', page_layout=name)
-                + _get_elements(self, 'descendant::*', master_page=name)
-                + _get_elements(self, 'descendant::*', parent_style=name))
+        result = []
+        last = None
+        for element, key, value in _iter_style_references(
+                self.__element):
+            if name is not True and value != name:
+                continue
+            if element is not last:
+                result.append(_make_odf_element(element))
+                last = element
+        return result
+
+
+    def get_style_usage(self):
+        """Map the name of every style referenced from the descendants of
+        this element to the list of elements referencing it, in a single
+        traversal.
+
+        Style references include parent styles, list styles, data styles,
+        page layouts and master pages.
+
+        Return: dict of unicode: list of odf_element
+        """
+        usage = {}
+        # One wrapper per element
+        wrappers = {}
+        for element, key, name in _iter_style_references(
+                self.__element):
+            wrapper = wrappers.get(element)
+            if wrapper is None:
+                wrapper = wrappers[element] = _make_odf_element(element)
+            elements = usage.setdefault(name, [])
+            if not elements or elements[-1] is not wrapper:
+                elements.append(wrapper)
+        return usage
+
+
+    def _get_referenced_styles(self):
+        """Return the names of the styles referenced from this element or
+        its descendants.
+
+        Return: set of unicode
+        """
+        names = set()
+        for element in self.__element.iter(tag=Element):
+            for key, value in element.items():
+                if key in _style_name_attributes:
+                    names.add(value)
+        return names
+
+
+    def _del_style_references(self):
+        """Remove all the style references from the descendants of this
+        element.
+
+        Return: int
+        """
+        # Collected first not to modify the tree while iterating it
+        references = list(_iter_style_references(self.__element))
+        for element, key, name in references:
+            del element.attrib[key]
+        return len(references)
+
+
+    def _rename_style_references(self, mapping):
+        """Rename the style references from this element and its
+        descendants, from the (family, old name) to the new names of the
+        mapping. The family of a reference is known from its attribute and
+        its element.
+
+        Return: int
+        """
+        count = 0
+        for element, key, name in list(_iter_style_references(
+                self.__element, include_self=True)):
+            new_name = None
+            for family in _get_reference_families(element, key):
+                new_name = mapping.get((family, name))
+                if new_name is not None:
+                    break
+            if new_name is not None:
+                element.set(key, new_name)
+                count += 1
+        return count
 
     #
     # Common attributes
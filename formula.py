@@ -0,0 +1,1000 @@
+# -*- coding: UTF-8 -*-
+#
+# Copyright (c) 2009-2010 Ars Aperta, Itaapy, Pierlis, Talend.
+#
+# This file is part of Lpod (see: http://lpod-project.org).
+# Lpod is free software; you can redistribute it and/or modify it under
+# the terms of either:
+#
+# a) the GNU General Public License as published by the Free Software
+#    Foundation, either version 3 of the License, or (at your option)
+#    any later version.
+#    Lpod is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#    You should have received a copy of the GNU General Public License
+#    along with Lpod.  If not, see <http://www.gnu.org/licenses/>.
+#
+# b) the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+
+"""Calculation of the spreadsheet formulas.
+
+Formulas in the OpenFormula ("of:") and OpenOffice.org Calc ("oooc:")
+syntax are parsed, linked in a graph of the cells they depend on, and
+their values cached back in the cells.
+"""
+
+# Import from the Standard Library
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from re import compile, UNICODE, VERBOSE
+
+# Import from lpod
+from table import _alpha_to_digit, _get_cell_coordinates, odf_create_cell
+from utils import _formula_reference, _formula_address_parts
+
+
+# Error codes, as displayed by OpenOffice.org
+DIV0 = u'#DIV/0!'
+NA = u'#N/A'
+NAME = u'#NAME?'
+NUM = u'#NUM!'
+REF = u'#REF!'
+VALUE = u'#VALUE!'
+SYNTAX = u'Err:501'
+CIRCULAR = u'Err:522'
+
+
+_tokenizer = compile(ur"""\s*(?:
+    (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)
+    |(?P<string>"(?:[^"]|"")*")
+    |(?P<reference>\[(?:[^\]']|'(?:[^']|'')*')*\])
+    |(?P<name>[A-Za-z_][\w.]*)
+    |(?P<operator><>|<=|>=|[-+*/^&=<>%();,])
+    )""", VERBOSE | UNICODE)
+
+_comparisons = ('=', '<>', '<', '>', '<=', '>=')
+
+
+
+class FormulaError(ValueError):
+    """The error value of a formula, e.g. "#DIV/0!".
+    """
+
+    def __init__(self, code):
+        ValueError.__init__(self, code)
+        self.code = code
+
+
+    def __unicode__(self):
+        return self.code
+
+
+    def __eq__(self, other):
+        return isinstance(other, FormulaError) and other.code == self.code
+
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+
+
+#
+# Values
+#
+
+def _number(value):
+    if isinstance(value, FormulaError):
+        raise value
+    if value is None:
+        return Decimal(0)
+    if type(value) is bool:
+        return Decimal(int(value))
+    if isinstance(value, (int, long, Decimal)):
+        return Decimal(value)
+    if isinstance(value, float):
+        return Decimal(repr(value))
+    raise FormulaError(VALUE)
+
+
+
+def _is_number(value):
+    return (type(value) is not bool
+            and isinstance(value, (int, long, float, Decimal)))
+
+
+
+def _format_number(number):
+    # Never in scientific notation, as "ROUND(1234;-2)" would give
+    if number == number.to_integral_value():
+        number = number.to_integral_value()
+    else:
+        number = number.normalize()
+    return u'{0:f}'.format(number)
+
+
+
+def _text(value):
+    if isinstance(value, FormulaError):
+        raise value
+    if value is None:
+        return u''
+    if type(value) is bool:
+        return u'TRUE' if value else u'FALSE'
+    if _is_number(value):
+        return _format_number(_number(value))
+    return unicode(value)
+
+
+
+def _boolean(value):
+    if isinstance(value, FormulaError):
+        raise value
+    if value is None:
+        return False
+    if type(value) is bool:
+        return value
+    if _is_number(value):
+        return value != 0
+    if isinstance(value, basestring):
+        if value.upper() == u'TRUE':
+            return True
+        if value.upper() == u'FALSE':
+            return False
+    raise FormulaError(VALUE)
+
+
+
+def _rank(value):
+    """Numbers sort before text, before booleans.
+    """
+    if type(value) is bool:
+        return 2
+    if isinstance(value, basestring):
+        return 1
+    if _is_number(value):
+        return 0
+    return 3
+
+
+
+def _compare(left, right):
+    for value in (left, right):
+        if isinstance(value, FormulaError):
+            raise value
+    # Empty cells are zero or empty strings
+    if left is None:
+        left = u'' if isinstance(right, basestring) else 0
+    if right is None:
+        right = u'' if isinstance(left, basestring) else 0
+    left_rank, right_rank = _rank(left), _rank(right)
+    if left_rank != right_rank:
+        return cmp(left_rank, right_rank)
+    if left_rank == 0:
+        return cmp(_number(left), _number(right))
+    if left_rank == 1:
+        return cmp(left.lower(), right.lower())
+    return cmp(left, right)
+
+
+
+#
+# Parsing
+#
+
+def _tokenize(formula):
+    tokens = []
+    formula = formula.rstrip()
+    position = 0
+    while position < len(formula):
+        match = _tokenizer.match(formula, position)
+        if match is None:
+            raise FormulaError(SYNTAX)
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind)))
+        position = match.end()
+    return tokens
+
+
+
+def _get_address(address, sheet):
+    """Translate "$Sheet1.$B$3" to (u"Sheet1", 1, 2), the sheet defaulting
+    to the given one.
+    """
+    name, column, line = _formula_address_parts.match(address).groups()
+    if name.startswith(u"'"):
+        name = name[1:-1].replace(u"''", u"'")
+    if not name:
+        name = sheet
+    return name, _alpha_to_digit(column), int(line) - 1
+
+
+
+class _formula_parser(object):
+    """Recursive descent parser of a formula into a tree of tuples:
+
+        ('value', value)
+        ('ref', sheet, x, y)
+        ('range', sheet, x1, y1, x2, y2)
+        ('negate', node)
+        ('percent', node)
+        ('binary', operator, left, right)
+        ('call', name, [node, ...])
+    """
+
+    def __init__(self, formula, sheet):
+        self.tokens = _tokenize(formula)
+        self.position = 0
+        self.sheet = sheet
+
+
+    def peek(self):
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return None, None
+
+
+    def next(self):
+        token = self.peek()
+        self.position += 1
+        return token
+
+
+    def expect(self, text):
+        if self.next() != ('operator', text):
+            raise FormulaError(SYNTAX)
+
+
+    def parse(self):
+        node = self.comparison()
+        if self.position != len(self.tokens):
+            raise FormulaError(SYNTAX)
+        return node
+
+
+    def comparison(self):
+        node = self.concatenation()
+        while self.peek()[1] in _comparisons:
+            operator = self.next()[1]
+            node = ('binary', operator, node, self.concatenation())
+        return node
+
+
+    def concatenation(self):
+        node = self.additive()
+        while self.peek() == ('operator', '&'):
+            self.next()
+            node = ('binary', '&', node, self.additive())
+        return node
+
+
+    def additive(self):
+        node = self.term()
+        while self.peek() in (('operator', '+'), ('operator', '-')):
+            operator = self.next()[1]
+            node = ('binary', operator, node, self.term())
+        return node
+
+
+    def term(self):
+        node = self.power()
+        while self.peek() in (('operator', '*'), ('operator', '/')):
+            operator = self.next()[1]
+            node = ('binary', operator, node, self.power())
+        return node
+
+
+    def power(self):
+        node = self.unary()
+        while self.peek() == ('operator', '^'):
+            self.next()
+            node = ('binary', '^', node, self.unary())
+        return node
+
+
+    def unary(self):
+        token = self.peek()
+        if token == ('operator', '-'):
+            self.next()
+            return ('negate', self.unary())
+        if token == ('operator', '+'):
+            self.next()
+            return self.unary()
+        node = self.primary()
+        while self.peek() == ('operator', '%'):
+            self.next()
+            node = ('percent', node)
+        return node
+
+
+    def primary(self):
+        kind, text = self.next()
+        if kind == 'number':
+            return ('value', Decimal(text))
+        elif kind == 'string':
+            return ('value', text[1:-1].replace(u'""', u'"'))
+        elif kind == 'reference':
+            return self.reference(text)
+        elif kind == 'name':
+            name = text.upper()
+            if self.peek() == ('operator', '('):
+                self.next()
+                return ('call', name, self.arguments())
+            if name in ('TRUE', 'FALSE'):
+                return ('value', name == 'TRUE')
+            raise FormulaError(NAME)
+        elif (kind, text) == ('operator', '('):
+            node = self.comparison()
+            self.expect(')')
+            return node
+        raise FormulaError(SYNTAX)
+
+
+    def arguments(self):
+        arguments = []
+        if self.peek() == ('operator', ')'):
+            self.next()
+            return arguments
+        while True:
+            # Missing arguments are empty
+            if self.peek()[1] in (';', ',', ')'):
+                arguments.append(('value', None))
+            else:
+                arguments.append(self.comparison())
+            kind, text = self.next()
+            if text == ')':
+                return arguments
+            if text not in (';', ','):
+                raise FormulaError(SYNTAX)
+
+
+    def reference(self, text):
+        match = _formula_reference.match(text)
+        if match is None or match.end() != len(text):
+            raise FormulaError(REF)
+        first, last = match.groups()
+        sheet, x1, y1 = _get_address(first, self.sheet)
+        if last is None:
+            return ('ref', sheet, x1, y1)
+        last_sheet, x2, y2 = _get_address(last, sheet)
+        # Ranges through several sheets are not supported
+        if last_sheet != sheet:
+            raise FormulaError(REF)
+        return ('range', sheet, min(x1, x2), min(y1, y2), max(x1, x2),
+                max(y1, y2))
+
+
+
+def parse_formula(formula, sheet=None):
+    """Parse the formula in the "of:" or "oooc:" syntax, references without
+    a table name pointing to the given sheet.
+
+    Return the tree of tuples the formula is made of, or raise
+    FormulaError for invalid formulas.
+
+    Arguments:
+
+        formula -- unicode
+
+        sheet -- unicode
+
+    Return: tuple
+    """
+    # "of:=SUM([.A1:.A3])"
+    if u':=' in formula.split(u'[', 1)[0]:
+        formula = formula.split(u':=', 1)[1]
+    elif formula.startswith(u'='):
+        formula = formula[1:]
+    return _formula_parser(formula, sheet).parse()
+
+
+
+def _get_references(node):
+    """Get the sets of the cells and ranges the formula refers to.
+    """
+    cells, ranges = set(), set()
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        kind = node[0]
+        if kind == 'ref':
+            cells.add(node[1:])
+        elif kind == 'range':
+            ranges.add(node[1:])
+        elif kind in ('negate', 'percent'):
+            stack.append(node[1])
+        elif kind == 'binary':
+            stack.extend(node[2:])
+        elif kind == 'call':
+            stack.extend(node[2])
+    return cells, ranges
+
+
+
+#
+# Functions
+#
+
+def _function_sum(engine, arguments):
+    return sum(engine._iter_numbers(arguments), Decimal(0))
+
+
+
+def _function_average(engine, arguments):
+    numbers = list(engine._iter_numbers(arguments))
+    if not numbers:
+        raise FormulaError(DIV0)
+    return sum(numbers, Decimal(0)) / len(numbers)
+
+
+
+def _function_min(engine, arguments):
+    numbers = list(engine._iter_numbers(arguments))
+    if not numbers:
+        return Decimal(0)
+    return min(numbers)
+
+
+
+def _function_max(engine, arguments):
+    numbers = list(engine._iter_numbers(arguments))
+    if not numbers:
+        return Decimal(0)
+    return max(numbers)
+
+
+
+def _function_count(engine, arguments):
+    count = 0
+    for node in arguments:
+        if node[0] in ('ref', 'range'):
+            values = engine._iter_range(node)
+        else:
+            values = [engine._evaluate(node)]
+        for value in values:
+            if _is_number(value):
+                count += 1
+    return Decimal(count)
+
+
+
+def _function_if(engine, arguments):
+    if not 1 <= len(arguments) <= 3:
+        raise FormulaError(SYNTAX)
+    if _boolean(engine._evaluate(arguments[0])):
+        if len(arguments) < 2:
+            return True
+        return engine._evaluate(arguments[1])
+    if len(arguments) < 3:
+        return False
+    return engine._evaluate(arguments[2])
+
+
+
+def _function_and(engine, arguments):
+    return all([_boolean(engine._evaluate(node)) for node in arguments])
+
+
+
+def _function_or(engine, arguments):
+    return any([_boolean(engine._evaluate(node)) for node in arguments])
+
+
+
+def _function_not(engine, arguments):
+    if len(arguments) != 1:
+        raise FormulaError(SYNTAX)
+    return not _boolean(engine._evaluate(arguments[0]))
+
+
+
+def _function_true(engine, arguments):
+    return True
+
+
+
+def _function_false(engine, arguments):
+    return False
+
+
+
+def _function_abs(engine, arguments):
+    if len(arguments) != 1:
+        raise FormulaError(SYNTAX)
+    return abs(_number(engine._evaluate(arguments[0])))
+
+
+
+def _function_round(engine, arguments):
+    if not 1 <= len(arguments) <= 2:
+        raise FormulaError(SYNTAX)
+    number = _number(engine._evaluate(arguments[0]))
+    digits = 0
+    if len(arguments) == 2:
+        digits = int(_number(engine._evaluate(arguments[1])))
+    return number.quantize(Decimal(1).scaleb(-digits), ROUND_HALF_UP)
+
+
+
+def _function_vlookup(engine, arguments):
+    if not 3 <= len(arguments) <= 4:
+        raise FormulaError(SYNTAX)
+    value = engine._evaluate(arguments[0])
+    if isinstance(value, FormulaError):
+        raise value
+    table = arguments[1]
+    if table[0] == 'ref':
+        sheet, x1, y1 = table[1:]
+        x2, y2 = x1, y1
+    elif table[0] == 'range':
+        sheet, x1, y1, x2, y2 = table[1:]
+    else:
+        raise FormulaError(VALUE)
+    column = int(_number(engine._evaluate(arguments[2])))
+    if column < 1:
+        raise FormulaError(VALUE)
+    if column > x2 - x1 + 1:
+        raise FormulaError(REF)
+    is_sorted = True
+    if len(arguments) == 4:
+        is_sorted = _boolean(engine._evaluate(arguments[3]))
+    found = None
+    for y in xrange(y1, min(y2, engine._get_height(sheet) - 1) + 1):
+        key = engine._get(sheet, x1, y)
+        if key is None:
+            continue
+        if isinstance(key, FormulaError) or _rank(key) != _rank(value):
+            continue
+        comparison = _compare(key, value)
+        if comparison == 0:
+            found = y
+            break
+        if is_sorted:
+            # The first column is sorted: stop after the value
+            if comparison > 0:
+                break
+            found = y
+    if found is None:
+        raise FormulaError(NA)
+    return engine._get(sheet, x1 + column - 1, found)
+
+
+
+_functions = {
+        'ABS': _function_abs,
+        'AND': _function_and,
+        'AVERAGE': _function_average,
+        'COUNT': _function_count,
+        'FALSE': _function_false,
+        'IF': _function_if,
+        'MAX': _function_max,
+        'MIN': _function_min,
+        'NOT': _function_not,
+        'OR': _function_or,
+        'ROUND': _function_round,
+        'SUM': _function_sum,
+        'TRUE': _function_true,
+        'VLOOKUP': _function_vlookup}
+
+
+
+#
+# Engine
+#
+
+def _write_cells(table, cells):
+    """Set the values and formulas of the cells, given as a mapping of
+    (x, y) to (value, formula), in one sweep through the table.
+    """
+    lines = {}
+    for (x, y), (value, formula) in cells.iteritems():
+        if isinstance(value, FormulaError):
+            value, text = value.code, value.code
+        elif _is_number(value):
+            text = _format_number(_number(value))
+        else:
+            text = None
+        lines.setdefault(y, []).append((x, value, text, formula))
+    for y, row in table._split_rows_at(lines):
+        for x, value, text, formula in lines.pop(y):
+            cell = row.get_cell(x)
+            if value is None and formula is None:
+                # Clear the cell but keep its style
+                cell = odf_create_cell(style=cell.get_style())
+            else:
+                cell.set_value(value, text=text, formula=formula)
+            row.set_cell(x, cell)
+    # Below the table
+    for y, line in sorted(lines.iteritems()):
+        for x, value, text, formula in line:
+            table.set_cell((x, y), odf_create_cell(value, text=text,
+                formula=formula))
+
+
+
+class odf_formula_engine(object):
+    """Calculate the formulas of the tables of a spreadsheet.
+
+    The values and formulas of the cells are loaded once. Changing a value
+    or a formula through the engine recalculates only the formulas
+    depending on it, directly or not, and caches their new values in the
+    cells. Use ``recalculate`` to calculate every formula.
+
+    Changes made to the tables otherwise are not seen by the engine.
+
+    Errors like a division by zero give ``FormulaError`` values, and the
+    error code as the cell text.
+
+    Supported functions are ABS, AND, AVERAGE, COUNT, FALSE, IF, MAX, MIN,
+    NOT, OR, ROUND, SUM, TRUE and VLOOKUP, with the arithmetic, comparison
+    and "&" operators, and references to other tables.
+    """
+
+    def __init__(self, document):
+        # name -> odf_table
+        self.__tables = {}
+        # name -> {(x, y): value}
+        self.__values = {}
+        # name -> height
+        self.__heights = {}
+        # (name, x, y) -> formula
+        self.__formulas = {}
+        # (name, x, y) -> node or FormulaError
+        self.__nodes = {}
+        # (name, x, y) -> (cells, ranges)
+        self.__references = {}
+        # (name, x, y) -> set of (name, x, y)
+        self.__dependents = {}
+        # name -> {x: set of (y1, y2, (name, x, y))}
+        self.__range_dependents = {}
+        for table in document.get_body().get_tables():
+            self.__load(table)
+        for key in self.__formulas:
+            self.__link(key)
+
+
+    def __load(self, table):
+        name = table.get_name()
+        self.__tables[name] = table
+        self.__values[name] = values = {}
+        y = 0
+        for row in table._get_rows():
+            height = row.get_repeated() or 1
+            x = 0
+            for cell in row._get_cells():
+                width = cell.get_repeated() or 1
+                formula = cell.get_formula()
+                if formula is not None or cell.get_type() is not None:
+                    value = cell.get_value()
+                    for j in xrange(y, y + height):
+                        for i in xrange(x, x + width):
+                            values[(i, j)] = value
+                            if formula is not None:
+                                self.__formulas[(name, i, j)] = formula
+                x += width
+            y += height
+        self.__heights[name] = y
+
+
+    def __link(self, key):
+        name = key[0]
+        try:
+            node = parse_formula(self.__formulas[key], name)
+        except FormulaError, error:
+            node = error
+        self.__nodes[key] = node
+        if isinstance(node, FormulaError):
+            return
+        cells, ranges = _get_references(node)
+        self.__references[key] = cells, ranges
+        for cell in cells:
+            self.__dependents.setdefault(cell, set()).add(key)
+        for sheet, x1, y1, x2, y2 in ranges:
+            columns = self.__range_dependents.setdefault(sheet, {})
+            for x in xrange(x1, x2 + 1):
+                columns.setdefault(x, set()).add((y1, y2, key))
+
+
+    def __unlink(self, key):
+        del self.__formulas[key]
+        del self.__nodes[key]
+        cells, ranges = self.__references.pop(key, ((), ()))
+        for cell in cells:
+            self.__dependents[cell].discard(key)
+        for sheet, x1, y1, x2, y2 in ranges:
+            columns = self.__range_dependents[sheet]
+            for x in xrange(x1, x2 + 1):
+                columns[x].discard((y1, y2, key))
+
+
+    def __get_dependents(self, key):
+        dependents = set(self.__dependents.get(key, ()))
+        name, x, y = key
+        columns = self.__range_dependents.get(name, {})
+        for y1, y2, dependent in columns.get(x, ()):
+            if y1 <= y <= y2:
+                dependents.add(dependent)
+        return dependents
+
+
+    def __sort(self, keys):
+        """Sort the given cells and the formulas depending on them, each
+        after the cells it depends on. Also return the set of formulas
+        depending on themselves.
+        """
+        order = []
+        circular = set()
+        # key -> True while visiting its dependents, False when done
+        visiting = {}
+        for root in keys:
+            if root in visiting:
+                continue
+            visiting[root] = True
+            stack = [(root, iter(self.__get_dependents(root)))]
+            path = [root]
+            while stack:
+                key, dependents = stack[-1]
+                for dependent in dependents:
+                    state = visiting.get(dependent)
+                    if state is None:
+                        visiting[dependent] = True
+                        stack.append((dependent,
+                            iter(self.__get_dependents(dependent))))
+                        path.append(dependent)
+                        break
+                    elif state is True:
+                        # Back to a cell being visited: a cycle
+                        circular.update(path[path.index(dependent):])
+                else:
+                    stack.pop()
+                    path.pop()
+                    visiting[key] = False
+                    order.append(key)
+        order.reverse()
+        return order, circular
+
+
+    def __calculate(self, key):
+        node = self.__nodes[key]
+        try:
+            if isinstance(node, FormulaError):
+                raise node
+            if node[0] == 'range':
+                raise FormulaError(VALUE)
+            value = self._evaluate(node)
+        except FormulaError, error:
+            value = error
+        except ZeroDivisionError:
+            value = FormulaError(DIV0)
+        except (ArithmeticError, InvalidOperation, OverflowError):
+            value = FormulaError(NUM)
+        if value is None:
+            value = Decimal(0)
+        name, x, y = key
+        self.__values[name][(x, y)] = value
+
+
+    def __update(self, keys):
+        """Recalculate the formulas among the sorted cells.
+        """
+        order, circular = self.__sort(keys)
+        updated = []
+        for key in order:
+            if key not in self.__formulas:
+                continue
+            if key in circular:
+                name, x, y = key
+                self.__values[name][(x, y)] = FormulaError(CIRCULAR)
+            else:
+                self.__calculate(key)
+            updated.append(key)
+        tables = {}
+        for key in updated:
+            name, x, y = key
+            tables.setdefault(name, {})[(x, y)] = (
+                    self.__values[name][(x, y)], self.__formulas[key])
+        for name, cells in tables.iteritems():
+            _write_cells(self.__tables[name], cells)
+        return updated
+
+
+    def __get_key(self, name, coordinates):
+        if name not in self.__tables:
+            raise ValueError, 'table "%s" not found' % name
+        x, y = _get_cell_coordinates(coordinates)
+        return name, x, y
+
+
+    #
+    # For the functions
+    #
+
+    def _get(self, name, x, y):
+        values = self.__values.get(name)
+        if values is None:
+            raise FormulaError(REF)
+        return values.get((x, y))
+
+
+    def _get_height(self, name):
+        return self.__heights.get(name, 0)
+
+
+    def _iter_range(self, node):
+        """Iterate through the values of the cells in the range, or the
+        cell, empty cells excluded.
+        """
+        if node[0] == 'ref':
+            value = self._get(*node[1:])
+            if value is not None:
+                yield value
+            return
+        name, x1, y1, x2, y2 = node[1:]
+        values = self.__values.get(name)
+        if values is None:
+            raise FormulaError(REF)
+        if (x2 - x1 + 1) * (y2 - y1 + 1) <= len(values):
+            for y in xrange(y1, y2 + 1):
+                for x in xrange(x1, x2 + 1):
+                    value = values.get((x, y))
+                    if value is not None:
+                        yield value
+        else:
+            for (x, y), value in values.iteritems():
+                if (x1 <= x <= x2 and y1 <= y <= y2
+                        and value is not None):
+                    yield value
+
+
+    def _iter_numbers(self, arguments):
+        """Iterate through the numbers of the arguments. Text and booleans
+        in the referenced cells are ignored.
+        """
+        for node in arguments:
+            if node[0] in ('ref', 'range'):
+                for value in self._iter_range(node):
+                    if isinstance(value, FormulaError):
+                        raise value
+                    if _is_number(value):
+                        yield _number(value)
+            else:
+                yield _number(self._evaluate(node))
+
+
+    def _evaluate(self, node):
+        kind = node[0]
+        if kind == 'value':
+            return node[1]
+        elif kind == 'ref':
+            return self._get(*node[1:])
+        elif kind == 'range':
+            raise FormulaError(VALUE)
+        elif kind == 'negate':
+            return -_number(self._evaluate(node[1]))
+        elif kind == 'percent':
+            return _number(self._evaluate(node[1])) / 100
+        elif kind == 'call':
+            function = _functions.get(node[1])
+            if function is None:
+                raise FormulaError(NAME)
+            return function(self, node[2])
+        operator, left, right = node[1:]
+        left, right = self._evaluate(left), self._evaluate(right)
+        if operator == '&':
+            return _text(left) + _text(right)
+        elif operator in _comparisons:
+            comparison = _compare(left, right)
+            return {'=': comparison == 0,
+                    '<>': comparison != 0,
+                    '<': comparison < 0,
+                    '>': comparison > 0,
+                    '<=': comparison <= 0,
+                    '>=': comparison >= 0}[operator]
+        left, right = _number(left), _number(right)
+        if operator == '+':
+            return left + right
+        elif operator == '-':
+            return left - right
+        elif operator == '*':
+            return left * right
+        elif operator == '/':
+            if right == 0:
+                raise FormulaError(DIV0)
+            return left / right
+        return left ** right
+
+
+    #
+    # Public API
+    #
+
+    def get_value(self, name, coordinates):
+        """Get the value of the cell in the named table, as last calculated.
+
+        Arguments:
+
+            name -- unicode
+
+            coordinates -- (int, int) or str
+
+        Return: Python type or FormulaError
+        """
+        name, x, y = self.__get_key(name, coordinates)
+        return self.__values[name].get((x, y))
+
+
+    def get_formula(self, name, coordinates):
+        """Get the formula of the cell in the named table, or None.
+
+        Arguments:
+
+            name -- unicode
+
+            coordinates -- (int, int) or str
+
+        Return: unicode
+        """
+        return self.__formulas.get(self.__get_key(name, coordinates))
+
+
+    def set_value(self, name, coordinates, value):
+        """Set the value of the cell in the named table, removing its
+        formula, and recalculate the formulas depending on it.
+
+        Arguments:
+
+            name -- unicode
+
+            coordinates -- (int, int) or str
+
+            value -- Python type
+
+        Return: list of the (name, x, y) recalculated
+        """
+        key = self.__get_key(name, coordinates)
+        name, x, y = key
+        if key in self.__formulas:
+            self.__unlink(key)
+        if value is None:
+            self.__values[name].pop((x, y), None)
+        else:
+            self.__values[name][(x, y)] = value
+        self.__heights[name] = max(self.__heights[name], y + 1)
+        _write_cells(self.__tables[name], {(x, y): (value, None)})
+        return self.__update([key])
+
+
+    def set_formula(self, name, coordinates, formula):
+        """Set the formula of the cell in the named table, and calculate it
+        and the formulas depending on it.
+
+        Arguments:
+
+            name -- unicode
+
+            coordinates -- (int, int) or str
+
+            formula -- unicode
+
+        Return: list of the (name, x, y) recalculated
+        """
+        key = self.__get_key(name, coordinates)
+        if key in self.__formulas:
+            self.__unlink(key)
+        self.__formulas[key] = formula
+        self.__link(key)
+        name, x, y = key
+        self.__heights[name] = max(self.__heights[name], y + 1)
+        return self.__update([key])
+
+
+    def recalculate(self):
+        """Calculate every formula, and cache its value in the cell.
+
+        Return: list of the (name, x, y) recalculated
+        """
+        return self.__update(sorted(self.__formulas))
@@ -32,13 +32,71 @@ from xmlpart import odf_xmlpart
 
 
 def odf_create_file_entry(full_path, media_type):
-    data = ('<manifest:file-entry manifest:media-type="%s" '
-            'manifest:full-path="%s"/>')
-    return odf_create_element(data % (media_type, full_path))
+    file_entry = odf_create_element('manifest:file-entry')
+    if media_type is None:
+        media_type = ''
+    file_entry.set_attribute('manifest:media-type', media_type)
+    file_entry.set_attribute('manifest:full-path', full_path)
+    return file_entry
 
 
 
 class odf_manifest(odf_xmlpart):
+    """The file entries are kept in a mapping of their path, built on
+    first use, so lookups, additions and deletions don't search the XML.
+    The listings follow the order of the XML.
+    """
+    def __init__(self, part_name, container):
+        odf_xmlpart.__init__(self, part_name, container)
+        # (last child of the root, entries by path)
+        self.__entries = None
+
+
+    def __get_entries(self):
+        root = self.get_root()
+        last = root._get_native_child(-1)
+        if self.__entries is None or self.__entries[0] is not last:
+            entries = {}
+            for file_entry in root.get_children():
+                if file_entry.get_tag() != 'manifest:file-entry':
+                    continue
+                full_path = file_entry.get_attribute('manifest:full-path')
+                entries.setdefault(full_path, file_entry)
+            self.__entries = (last, entries)
+        return self.__entries[1]
+
+
+    def __get_entry(self, full_path):
+        file_entry = self.__get_entries().get(full_path)
+        if file_entry is None:
+            return None
+        if (file_entry.get_parent() is None or
+                file_entry.get_attribute('manifest:full-path') != full_path):
+            # Changed behind our back
+            self.__entries = None
+            file_entry = self.__get_entries().get(full_path)
+        return file_entry
+
+
+    def __iter_entries(self):
+        """Yield the (full_path, file_entry) pairs in document order, the
+        first entry of a path only.
+        """
+        seen = set()
+        for file_entry in self.get_root().get_children():
+            if file_entry.get_tag() != 'manifest:file-entry':
+                continue
+            full_path = file_entry.get_attribute('manifest:full-path')
+            if full_path not in seen:
+                seen.add(full_path)
+                yield full_path, file_entry
+
+
+    def clone(self):
+        clone = odf_xmlpart.clone(self)
+        clone.__entries = None
+        return clone
+
 
     #
     # Public API
@@ -49,8 +107,8 @@ class odf_manifest(odf_xmlpart):
 
         Return: list of unicode
         """
-        expr = '//manifest:file-entry/attribute::manifest:full-path'
-        return self.xpath(expr)
+        return [full_path for full_path, file_entry
+                in self.__iter_entries()]
 
     get_path_list = obsolete('get_path_list', get_paths)
 
@@ -60,12 +118,9 @@ class odf_manifest(odf_xmlpart):
 
         Return: list of (unicode, str) tuples
         """
-        expr = '//manifest:file-entry'
-        result = []
-        for file_entry in self.xpath(expr):
-            result.append((file_entry.get_attribute('manifest:full-path'),
-                           file_entry.get_attribute('manifest:media-type')))
-        return result
+        return [(full_path,
+                 file_entry.get_attribute('manifest:media-type'))
+                for full_path, file_entry in self.__iter_entries()]
 
     get_path_media_list = obsolete('get_path_media_list', get_path_medias)
 
@@ -75,12 +130,10 @@ class odf_manifest(odf_xmlpart):
 
         Return: str
         """
-        expr = ('//manifest:file-entry[attribute::manifest:full-path="%s"]'
-                '/attribute::manifest:media-type')
-        result = self.xpath(expr % full_path)
-        if not result:
+        file_entry = self.__get_entry(full_path)
+        if file_entry is None:
             return None
-        return result[0]
+        return file_entry.get_attribute('manifest:media-type')
 
 
     def set_media_type(self, full_path, media_type):
@@ -92,29 +145,39 @@ class odf_manifest(odf_xmlpart):
 
             media_type -- str
         """
-        expr = '//manifest:file-entry[attribute::manifest:full-path="%s"]'
-        result = self.xpath(expr % full_path)
-        if not result:
+        file_entry = self.__get_entry(full_path)
+        if file_entry is None:
             raise KeyError, 'path "%s" not found' % full_path
-        file_entry = result[0]
         file_entry.set_attribute('manifest:media-type', str(media_type))
 
 
     def add_full_path(self, full_path, media_type=''):
+        """Add the path, or set its media type if already there.
+
+        Arguments:
+
+            full_path -- unicode
+
+            media_type -- str
+        """
         # Existing?
-        existing = self.get_media_type(full_path)
-        if existing is not None:
+        if self.__get_entry(full_path) is not None:
             self.set_media_type(full_path, media_type)
+            return
         root = self.get_root()
+        entries = self.__get_entries()
         file_entry = odf_create_file_entry(full_path, media_type)
         root.append(file_entry)
+        entries[full_path] = file_entry
+        self.__entries = (root._get_native_child(-1), entries)
 
 
     def del_full_path(self, full_path):
-        expr = '//manifest:file-entry[attribute::manifest:full-path="%s"]'
-        result = self.xpath(expr % full_path)
-        if not result:
+        file_entry = self.__get_entry(full_path)
+        if file_entry is None:
             raise KeyError, 'path "%s" not found' % full_path
-        file_entry = result[0]
         root = self.get_root()
+        entries = self.__get_entries()
         root.delete(file_entry)
+        del entries[full_path]
+        self.__entries = (root._get_native_child(-1), entries)
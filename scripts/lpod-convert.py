@@ -49,21 +49,20 @@ def spreadsheet_to_text(indoc, outdoc):
     outbody = outdoc.get_body()
     # Copy tables
     for intable in inbody.get_tables():
-        # clone/rstrip the table
-        clone = intable.clone()
-        clone.rstrip(aggressive=True)
+        # rstrip the table in place, the input document is never saved
+        intable.rstrip(aggressive=True)
         # Skip empty table
-        if clone.get_size() == (0, 0):
+        if intable.get_size() == (0, 0):
             continue
         # At least OOo Writer doesn't like formulas referencing merged
         # cells, so expand
-        outtable = odf_create_table(clone.get_name(),
-                style=clone.get_style())
+        outtable = odf_create_table(intable.get_name(),
+                style=intable.get_style())
         # Columns
-        for column in clone.traverse_columns():
+        for column in intable.traverse_columns():
             outtable.append(column)
         # Rows
-        for inrow in clone.traverse():
+        for inrow in intable.traverse():
             outrow = odf_create_row(style=inrow.get_style())
             # Cells
             for cell in inrow.traverse():
@@ -101,8 +100,7 @@ def spreadsheet_to_csv(indoc, outdoc):
         return
     table = tables[0]
 
-    # clone/rstrip the table
-    table = table.clone()
+    # rstrip the table in place, the input document is never saved
     table.rstrip(aggressive=True)
 
     # Skip empty table
@@ -114,6 +112,12 @@ def spreadsheet_to_csv(indoc, outdoc):
 
 
 
+def spreadsheet_to_sqlite(indoc, outdoc, header=False):
+    # The output document is the path of the database
+    indoc.to_sqlite(outdoc, header=header)
+
+
+
 def spreadsheet_to_rst(indoc, outdoc):
     inbody = indoc.get_body()
 
@@ -128,8 +132,7 @@ def spreadsheet_to_rst(indoc, outdoc):
 
     # Convert tables
     for table in inbody.get_tables():
-        # clone/rstrip the table
-        table = table.clone()
+        # rstrip the table in place, the input document is never saved
         table.rstrip(aggressive=True)
 
         # Skip empty table
@@ -469,19 +472,29 @@ if  __name__ == '__main__':
     usage = ("%prog [options] <input.ods> <output.odt>\n"
       "       %prog [options] <input.ods> <output.csv>\n"
       "       %prog [options] <input.ods> <output.rst>\n"
+      "       %prog [options] --sqlite <input.ods> <output.db>\n"
       "       %prog [options] <input.odt> <output.txt>\n"
       "       %prog [options] <input.odt> <output.rst>\n"
       "       %prog [options] <input.rst> <output.odt>\n"
       "       %prog [options] <input.odp> <output.html>")
     description = ("Convert an OpenDocument to another format. Possible "
             "combinations: ODS to ODT (tables and styles), ODS to CSV (only "
-            "the first tab), ODS to RST, ODP to HTML (S5 format), and "
-            "RST <=> ODT (RST = reStructuredText format)")
+            "the first tab), ODS to SQLite (all the tabs), ODS to RST, ODP "
+            "to HTML (S5 format), and RST <=> ODT (RST = reStructuredText "
+            "format)")
     parser = OptionParser(usage, version=__version__, description=description)
     # --styles
     help = "import the styles from the given file"
     parser.add_option("-s", "--styles", dest="styles_from", metavar="FILE",
             help=help)
+    # --sqlite
+    help = "export the spreadsheet to a SQLite database, one table per tab"
+    parser.add_option("-q", "--sqlite", action="store_true", dest="sqlite",
+            help=help)
+    # --header
+    help = "name the SQLite columns after the first row"
+    parser.add_option("--header", action="store_true", dest="header",
+            help=help)
     # Parse !
     options, args = parser.parse_args()
     # Container
@@ -500,7 +513,10 @@ if  __name__ == '__main__':
     # Open output document
     outfile = args[1]
     extension = get_extension(outfile)
-    if extension in ('csv', 'html', 'rst', 'txt'):
+    if options.sqlite:
+        outdoc = outfile
+        outtype = 'sqlite'
+    elif extension in ('csv', 'html', 'rst', 'txt'):
         outdoc = open(outfile, 'wb')
         outtype = extension
     else:
@@ -526,8 +542,11 @@ if  __name__ == '__main__':
     # Remove output file
     check_target_file(outfile)
     # Convert!
-    converter(indoc, outdoc)
+    if outtype == 'sqlite':
+        converter(indoc, outdoc, header=options.header)
+    else:
+        converter(indoc, outdoc)
     if isinstance(outdoc, odf_document):
         outdoc.save(outfile)
-    else:
+    elif outtype != 'sqlite':
         outdoc.close()
@@ -35,20 +35,28 @@ from os import stat
 # Import from lpod
 from lpod import __version__
 from lpod.document import odf_get_document
+from lpod.tablediff import diff_documents, format_changes
 
 
 
 if  __name__ == '__main__':
 
     # Options initialisation
-    usage = "%prog <doc1.odt> <doc2.odt>"
-    description = "Show a diff between doc1.odt and doc2.odt"
+    usage = ("%prog <doc1.odt> <doc2.odt>\n"
+             "       %prog [-k COLUMNS] <doc1.ods> <doc2.ods>")
+    description = ("Show a diff between doc1.odt and doc2.odt, or the "
+            "changed cells, rows and tables between doc1.ods and doc2.ods")
     parser = OptionParser(usage, version=__version__, description=description)
 
     # --ndiff
     parser.add_option('-n', '--ndiff', action='store_true', default=False,
             help='use a contextual "ndiff" format to show the output')
 
+    # --key
+    parser.add_option('-k', '--key', dest='key', metavar='COLUMNS',
+            help='pair the rows of spreadsheets by the values of the given '
+                 'columns, e.g. "A,C", instead of by their content')
+
     # Parse !
     options, args = parser.parse_args()
 
@@ -57,10 +65,25 @@ if  __name__ == '__main__':
         parser.print_help()
         exit(1)
 
-    # Open the 2 documents, diff only for ODT
+    # Open the 2 documents, diff only for ODT and ODS
     doc1 = odf_get_document(args[0])
     doc2 = odf_get_document(args[1])
-    if doc1.get_type() != 'text' or doc2.get_type() != 'text':
+    type1 = doc1.get_type()
+    type2 = doc2.get_type()
+    encoding = stdout.encoding if stdout.encoding is not None else 'utf-8'
+
+    # Cell by cell for spreadsheets
+    if type1 == 'spreadsheet' and type2 == 'spreadsheet':
+        key_columns = None
+        if options.key:
+            key_columns = [column.strip() for column in
+                    options.key.split(',')]
+        changes = diff_documents(doc1, doc2, key_columns=key_columns)
+        if changes:
+            print format_changes(changes).encode(encoding)
+        exit(0)
+
+    if type1 != 'text' or type2 != 'text':
         parser.print_help()
         exit(1)
 
@@ -77,7 +100,6 @@ if  __name__ == '__main__':
         todate = ctime(stat(args[1]).st_mtime)
         result = unified_diff(text1, text2, args[0], args[1], fromdate, todate)
     result = u''.join(result)
-    encoding = stdout.encoding if stdout.encoding is not None else 'utf-8'
     result = result.encode(encoding)
 
     # And print it !
@@ -65,21 +65,33 @@ def init_doc(filename, mimetype):
 
 def _add_pictures(document, output_doc):
     # Copy extra parts (images...)
-    manifest = output_doc.get_part(ODF_MANIFEST)
     document_manifest = document.get_part(ODF_MANIFEST)
+    links = {}
     for partname in document.get_parts():
         if partname.startswith('Pictures/'):
             data = document.get_part(partname)
-            # Manually add the part to keep the name (suppose uniqueness)
-            output_doc.set_part(partname, data)
             media_type = document_manifest.get_media_type(partname)
-            manifest.add_full_path(partname, media_type)
+            # Identical images are stored once, others keep their name
+            # unless taken
+            path = output_doc.add_media(partname, data, media_type)
+            if path != partname:
+                links[partname] = path
+    # Link the content to copy to the images stored
+    if links:
+        query = 'descendant::*[@xlink:href]'
+        for element in document.get_body().get_elements(query):
+            path = links.get(element.get_attribute('xlink:href'))
+            if path is not None:
+                element.set_attribute('xlink:href', path)
 
 
 
 def add_odt(filename, output_doc):
     document = odf_get_document(filename)
 
+    # Add pictures/
+    _add_pictures(document, output_doc)
+
     # Copy content
     src_body = document.get_body()
     output_body = output_doc.get_body()
@@ -91,9 +103,6 @@ def add_odt(filename, output_doc):
         # Copy the rest recursively
         output_body.append(element.clone())
 
-    # Add pictures/
-    _add_pictures(document, output_doc)
-
 
 
 def _get_table_name(name, output_body):
@@ -117,6 +126,9 @@ def _get_table_name(name, output_body):
 def add_ods(filename, output_doc):
     document = odf_get_document(filename)
 
+    # Add pictures/
+    _add_pictures(document, output_doc)
+
     # Add the sheets
     output_body = output_doc.get_body()
     ods_body = document.get_body()
@@ -127,9 +139,6 @@ def add_ods(filename, output_doc):
 
         output_body.append(table)
 
-    # Add pictures/
-    _add_pictures(document, output_doc)
-
 
 
 def add_csv(filename, output_doc):
@@ -148,6 +157,9 @@ def add_csv(filename, output_doc):
 def add_odp(filename, output_doc):
     document = odf_get_document(filename)
 
+    # Add pictures/
+    _add_pictures(document, output_doc)
+
     # Add the pages
     output_body = output_doc.get_body()
     already_names = set([ page.get_name()
@@ -169,9 +181,6 @@ def add_odp(filename, output_doc):
         already_names.add(name)
         output_body.append(page)
 
-    # Add pictures/
-    _add_pictures(document, output_doc)
-
 
 
 def print_incompatible(filename, type):
@@ -39,6 +39,7 @@ from lpod.cleaner import test_document
 from lpod.document import odf_get_document
 from lpod.scriptutils import add_option_output, printerr
 from lpod.scriptutils import check_target_directory
+from lpod.table import export_to_csv
 
 
 
@@ -85,8 +86,7 @@ def spreadsheet_to_stdout(document):
         encoding = 'utf-8'
     body = document.get_body()
     for table in body.get_tables():
-        table.rstrip(aggressive=True)
-        table.to_csv(stdout, encoding=encoding)
+        table.to_csv(stdout, encoding=encoding, rstrip=True)
         stdout.write("\n")
     stdout.flush()
 
@@ -94,14 +94,11 @@ def spreadsheet_to_stdout(document):
 
 def spreadsheet_to_csv(document, target):
     body = document.get_body()
-    for table in body.get_tables():
-        name = table.get_name()
-        filename = clean_filename(name) + '.csv'
-        csv_file = open(join(target, filename), 'wb')
-
-        table.rstrip(aggressive=True)
-        table.to_csv(csv_file)
-        csv_file.close()
+    tables = body.get_tables()
+    paths = [join(target, clean_filename(table.get_name()) + '.csv')
+            for table in tables]
+    # One worker process per CPU
+    export_to_csv(tables, paths, rstrip=True)
 
 
 
@@ -200,6 +200,15 @@ def odf_create_style(family, name=None, display_name=None, parent=None,
 
 
 
+def _get_element_key(element):
+    attributes = element.get_attributes()
+    return (element.get_tag(), tuple(sorted(attributes.iteritems())),
+            element.get_text(),
+            tuple(_get_element_key(child)
+                for child in element.get_children()))
+
+
+
 class odf_style(odf_element):
     """Specialised element for styles, yet generic to all style types.
     """
@@ -418,6 +427,21 @@ class odf_style(odf_element):
         return self.set_style_attribute('style:master-page-name', name)
 
 
+    def get_key(self):
+        """Return a hashable summary of what this style does: its tag,
+        family and parent style, and the properties of all its areas, but
+        not its names. Two styles of the same key format the same way.
+
+        Return: tuple
+        """
+        attributes = self.get_attributes()
+        attributes.pop('style:name', None)
+        attributes.pop('style:display-name', None)
+        return (self.get_tag(), tuple(sorted(attributes.iteritems())),
+                tuple(_get_element_key(child)
+                    for child in self.get_children()))
+
+
 
 class odf_list_style(odf_style):
     """A list style is a container for list level styles.
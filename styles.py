@@ -26,6 +26,7 @@
 #
 
 # Import from lpod
+from style import odf_style
 from xmlpart import odf_xmlpart
 from utils import _get_elements, _get_element, obsolete
 
@@ -49,25 +50,25 @@ COLORMAP = {
 
 
 context_mapping = {
-        'paragraph': ('//office:styles', '//office:automatic-styles'),
-        'text': ('//office:styles',),
-        'graphic': ('//office:styles',),
-        'page-layout': ('//office:automatic-styles',),
-        'master-page': ('//office:master-styles',),
-        'font-face': ('//office:font-face-decls',),
-        'outline': ('//office:styles',),
-        'date': ('//office:automatic-styles',),
-        'list': ('//office:styles',),
-        'presentation': ('//office:styles', '//office:automatic-styles'),
-        'drawing-page': ('//office:automatic-styles',),
-        'presentation-page-layout': ('//office:styles',),
-        'marker': ('//office:styles',),
-        'fill-image': ('//office:styles',),
+        'paragraph': ('office:styles', 'office:automatic-styles'),
+        'text': ('office:styles',),
+        'graphic': ('office:styles',),
+        'page-layout': ('office:automatic-styles',),
+        'master-page': ('office:master-styles',),
+        'font-face': ('office:font-face-decls',),
+        'outline': ('office:styles',),
+        'date': ('office:automatic-styles',),
+        'list': ('office:styles',),
+        'presentation': ('office:styles', 'office:automatic-styles'),
+        'drawing-page': ('office:automatic-styles',),
+        'presentation-page-layout': ('office:styles',),
+        'marker': ('office:styles',),
+        'fill-image': ('office:styles',),
         # FIXME Do they?
-        'table': ('//office:automatic-styles',),
-        'table-cell': ('//office:automatic-styles',),
-        'table-row': ('//office:automatic-styles',),
-        'table-column': ('//office:automatic-styles',),
+        'table': ('office:automatic-styles',),
+        'table-cell': ('office:automatic-styles',),
+        'table-row': ('office:automatic-styles',),
+        'table-column': ('office:automatic-styles',),
 }
 
 
@@ -128,17 +129,17 @@ class odf_styles(odf_xmlpart):
 
     def _get_style_contexts(self, family, automatic=False):
         if automatic is True:
-            return (self.get_element('//office:automatic-styles'),)
+            return (self._get_style_context('office:automatic-styles'),)
         elif family is None:
             # All possibilities
-            return (self.get_element('//office:automatic-styles'),
-                    self.get_element('//office:styles'),
-                    self.get_element('//office:master-styles'),
-                    self.get_element('//office:font-face-decls'))
+            return (self._get_style_context('office:automatic-styles'),
+                    self._get_style_context('office:styles'),
+                    self._get_style_context('office:master-styles'),
+                    self._get_style_context('office:font-face-decls'))
         queries = context_mapping.get(family)
         if queries is None:
             raise ValueError, "unknown family: " + family
-        return [self.get_element(query) for query in queries]
+        return [self._get_style_context(query) for query in queries]
 
 
     def get_styles(self, family=None, automatic=False):
@@ -181,12 +182,13 @@ class odf_styles(odf_xmlpart):
 
         Return: odf_style or None if not found
         """
+        if isinstance(name_or_element, odf_style):
+            return name_or_element
         for context in self._get_style_contexts(family):
             if context is None:
                 continue
-            style = context.get_style(family,
-                    name_or_element=name_or_element,
-                    display_name=display_name)
+            style = self._get_indexed_style(context, family,
+                    name=name_or_element, display_name=display_name)
             if style is not None:
                 return style
         return None
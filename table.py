@@ -27,16 +27,71 @@
 #
 
 # Import from the Standard Library
+from bisect import bisect_right
 from cStringIO import StringIO
-from csv import reader, Sniffer
+from csv import reader, writer, Sniffer, QUOTE_ALL
+from datetime import datetime, timedelta
+from decimal import Decimal
+from itertools import chain, groupby, islice
+from multiprocessing import Pool
+from operator import itemgetter
+from re import compile, error, IGNORECASE
+from sre_constants import LITERAL
+from sre_parse import parse
 from textwrap import wrap
+from xml.sax.saxutils import escape
 
 # Import from lpod
 from datatype import Boolean, Date, DateTime, Duration
 from element import odf_create_element, register_element_class, odf_element
+from element import NEXT_SIBLING
+from element import _create_element_from_chunks
 from utils import get_value, _set_value_and_type, obsolete, isiterable
 
 
+# Attributes rendered by "to_csv" in "raw" mode
+_value_attributes = {
+        'boolean': 'office:boolean-value',
+        'currency': 'office:value',
+        'date': 'office:date-value',
+        'float': 'office:value',
+        'percentage': 'office:value',
+        'string': 'office:string-value',
+        'time': 'office:time-value'}
+
+# Escaped in attribute values, whitespace would be normalized
+_attribute_entities = {u'"': u'&quot;', u'\n': u'&#10;', u'\r': u'&#13;',
+        u'\t': u'&#9;'}
+
+# Elements grouping rows, possibly nested
+_xpath_row_groups = ('table:table-header-rows|table:table-row-group'
+        '|table:table-rows')
+_xpath_rows_and_groups = 'table:table-row|' + _xpath_row_groups
+
+# SQLite column types by cell value type
+_sqlite_types = {
+        'boolean': 'INTEGER',
+        'currency': 'REAL',
+        'date': 'TEXT',
+        'float': 'REAL',
+        'percentage': 'REAL',
+        'string': 'TEXT',
+        'time': 'TEXT'}
+
+# Lines read to guess the CSV dialect and column types
+CSV_SAMPLE_SIZE = 100
+
+# Cells kept encoded by column when importing a CSV file
+CSV_CACHE_SIZE = 10000
+
+# Bytes read at once from a CSV file
+CSV_CHUNK_SIZE = 65536
+
+# Rows fetched at once when importing from a database cursor
+CURSOR_BATCH_SIZE = 1000
+
+
+
 def _alpha_to_digit(alpha):
     """Translates A to 0, B to 1, etc. So "AB" is value 27.
     """
@@ -98,6 +153,26 @@ def _get_cell_coordinates(obj):
 
 
 
+def _get_cell_range(obj):
+    """Translates "B2:D5" to (1, 1, 3, 4), or ((1, 1), (3, 4)) and
+    (1, 1, 3, 4) to (1, 1, 3, 4). Bounds are included.
+    """
+    if isinstance(obj, basestring):
+        obj = obj.split(':')
+        if len(obj) == 1:
+            obj = obj * 2
+    else:
+        obj = tuple(obj)
+        if len(obj) == 4:
+            obj = (obj[:2], obj[2:])
+    if len(obj) != 2:
+        raise ValueError, 'cell range "%s" is malformed' % (obj,)
+    x1, y1 = _get_cell_coordinates(obj[0])
+    x2, y2 = _get_cell_coordinates(obj[1])
+    return min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2)
+
+
+
 def _get_python_value(data, encoding):
     """Try and guess the most appropriate Python type to load the data, with
     regard to ODF types.
@@ -141,20 +216,314 @@ def _get_python_value(data, encoding):
 
 
 
+def _decode_number(data):
+    """Integers keep their digits in a column of floats.
+    """
+    try:
+        return int(data)
+    except ValueError:
+        return float(data)
+
+
+
+# Tried in this order to guess the type of a CSV column
+_csv_decoders = (
+        int,
+        _decode_number,
+        Date.decode,
+        # Two tests: "yyyy-mm-dd hh:mm:ss" or "yyyy-mm-ddThh:mm:ss"
+        lambda data: DateTime.decode(data.replace(' ', 'T')),
+        Duration.decode,
+        # "True" or "False" with a .lower
+        lambda data: Boolean.decode(data.lower()))
+
+
+
+def _iter_csv_lines(file):
+    """Iterate the lines of the file read by chunks, ended by "\n",
+    "\r\n" or a single "\r" like "str.splitlines" does.
+    """
+    rest = ''
+    while True:
+        chunk = file.read(CSV_CHUNK_SIZE)
+        if not chunk:
+            break
+        lines = (rest + chunk).splitlines(True)
+        # The last line may go on in the next chunk, even a "\r" may be
+        # followed by "\n"
+        rest = lines.pop()
+        for line in lines:
+            yield line
+    if rest:
+        yield rest
+
+
+
+def _get_csv_decoders(lines, encoding):
+    """Guess the decoder of each column from a sample of CSV lines: the
+    first one that decodes all of its non-empty values, or unicode if none
+    of them can be decoded, or None if the column mixes types.
+    """
+    decoders = []
+    typed = []
+    for line in lines:
+        for x, data in enumerate(line):
+            if x == len(decoders):
+                decoders.append(list(_csv_decoders))
+                typed.append(False)
+            if not data:
+                continue
+            candidates = decoders[x]
+            if not candidates and typed[x]:
+                continue
+            data = unicode(data, encoding)
+            while candidates:
+                try:
+                    candidates[0](data)
+                except ValueError:
+                    candidates.pop(0)
+                else:
+                    typed[x] = True
+                    break
+            else:
+                guess = _get_python_value(data.encode('utf-8'), 'utf-8')
+                if type(guess) is not unicode:
+                    typed[x] = True
+    result = []
+    for candidates, is_typed in zip(decoders, typed):
+        if candidates:
+            result.append(candidates[0])
+        elif is_typed:
+            result.append(None)
+        else:
+            result.append(unicode)
+    return result
+
+
+
+def _encode_cell(value):
+    """Serialize a cell of the Python value like ``odf_create_cell``
+    does, without building the element.
+    """
+    if value is None:
+        return u'<table:table-cell/>'
+    text = None
+    if type(value) is bool:
+        value_type, attribute = 'boolean', 'office:boolean-value'
+        value = text = Boolean.encode(value)
+    elif isinstance(value, (int, float, long)):
+        value_type, attribute = 'float', 'office:value'
+        value, text = str(value), unicode(value)
+    elif type(value) is datetime:
+        value_type, attribute = 'date', 'office:date-value'
+        value = text = DateTime.encode(value)
+    elif type(value) is timedelta:
+        value_type, attribute = 'time', 'office:time-value'
+        value = text = Duration.encode(value)
+    elif type(value) is unicode:
+        value_type, attribute = 'string', 'office:string-value'
+        text = value
+    else:
+        return odf_create_cell(value).serialize().decode('utf-8')
+    if value_type == 'string':
+        # Only text needs escaping
+        value = escape(text, _attribute_entities)
+        text = escape(text)
+    return (u'<table:table-cell office:value-type="%s" %s="%s">'
+            u'<text:p>%s</text:p></table:table-cell>'
+            % (value_type, attribute, value, text))
+
+
+
+def _encode_row(cells):
+    """Serialize a row of serialized cells, merging identical consecutive
+    cells into repeated ones.
+    """
+    result = [u'<table:table-row>']
+    previous = None
+    repeated = 0
+    for cell in chain(cells, [None]):
+        if cell == previous:
+            repeated += 1
+            continue
+        if repeated > 1:
+            result.append(previous.replace(u'<table:table-cell',
+                u'<table:table-cell table:number-columns-repeated="%d"'
+                % repeated, 1))
+        elif repeated:
+            result.append(previous)
+        previous = cell
+        repeated = 1
+    result.append(u'</table:table-row>')
+    return u''.join(result)
+
+
+
+def _repeat_row(row, repeated):
+    """Add the repetition to a serialized row.
+    """
+    if repeated < 2:
+        return row
+    return row.replace(u'<table:table-row',
+            u'<table:table-row table:number-rows-repeated="%d"' % repeated, 1)
+
+
+
+def _repeat_rows(rows):
+    """Merge identical consecutive serialized rows into repeated ones.
+    """
+    previous = None
+    repeated = 0
+    for row in rows:
+        if row == previous:
+            repeated += 1
+            continue
+        if previous is not None:
+            yield _repeat_row(previous, repeated)
+        previous = row
+        repeated = 1
+    if previous is not None:
+        yield _repeat_row(previous, repeated)
+
+
+
+def _get_trigrams(text):
+    """Get the set of the three-character substrings of the text.
+    """
+    return set(text[i:i + 3] for i in xrange(len(text) - 2))
+
+
+
+def _get_pattern_trigrams(pattern, flags=0):
+    """Get the trigrams any text matching the regular expression contains,
+    i.e. those of its top-level literal parts. An empty set means the
+    pattern gives no hint.
+    """
+    try:
+        parsed = parse(pattern, flags)
+    except error:
+        # Let the regex fail properly
+        return set()
+    if parsed.pattern.flags & IGNORECASE:
+        return set()
+    trigrams = set()
+    literal = []
+    for op, av in list(parsed) + [(None, None)]:
+        if op == LITERAL:
+            literal.append(unichr(av))
+            continue
+        trigrams.update(_get_trigrams(u''.join(literal)))
+        literal = []
+    return trigrams
+
+
+
+def _compile_content(content):
+    if isinstance(content, str):
+        # Fail properly if the pattern is an non-ascii bytestring
+        content = unicode(content)
+    return compile(content)
+
+
+
+def _search_index(texts, trigrams, content):
+    """Get the runs of the texts matching the regular expression. The
+    trigrams of the pattern select the candidates.
+    """
+    regex = _compile_content(content)
+    candidates = None
+    found = [trigrams.get(trigram, ())
+            for trigram in _get_pattern_trigrams(regex.pattern, regex.flags)]
+    for texts_with_trigram in sorted(found, key=len):
+        if candidates is None:
+            candidates = set(texts_with_trigram)
+        else:
+            candidates.intersection_update(texts_with_trigram)
+        if not candidates:
+            return []
+    if candidates is None:
+        candidates = texts
+    runs = []
+    for text in candidates:
+        if regex.search(text) is not None:
+            runs.extend(texts[text])
+    return runs
+
+
+
+class _table_index(object):
+    """Map of the text contents of the cells and rows of a table to their
+    runs, with a trigram index of the texts. See ``odf_table.set_indexed``.
+    """
+
+    def __init__(self, table):
+        # text -> [(y, height, x, width, cell)]
+        self.cells = {}
+        # text -> [(y, height, row)]
+        self.rows = {}
+        y = 0
+        for row in table._get_rows():
+            height = row.get_repeated() or 1
+            text = row.get_text(recursive=True)
+            self.rows.setdefault(text, []).append((y, height, row))
+            x = 0
+            for cell in row._get_cells():
+                width = cell.get_repeated() or 1
+                text = cell.get_text(recursive=True)
+                self.cells.setdefault(text, []).append((y, height, x, width,
+                    cell))
+                x += width
+            y += height
+        self.cell_trigrams = self.__index_trigrams(self.cells)
+        self.row_trigrams = self.__index_trigrams(self.rows)
+
+
+    def __index_trigrams(self, texts):
+        trigrams = {}
+        for text in texts:
+            for trigram in _get_trigrams(text):
+                trigrams.setdefault(trigram, set()).add(text)
+        return trigrams
+
+
+    def get_cell_runs(self, content):
+        return _search_index(self.cells, self.cell_trigrams, content)
+
+
+    def get_row_runs(self, content):
+        return _search_index(self.rows, self.row_trigrams, content)
+
+
+
+def _get_sort_key(value):
+    """Sort numbers, then text ignoring case, then dates, then durations.
+    Empty cells have no key.
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, long, float, Decimal)):
+        return (0, value)
+    if isinstance(value, basestring):
+        return (1, value.lower())
+    if isinstance(value, datetime):
+        return (2, value)
+    if isinstance(value, timedelta):
+        return (3, value)
+    return (4, value)
+
+
+
 def _set_element(position, new_element, real_elements, get_repeated,
         set_repeated):
     pos = 0
     for real_element in real_elements:
         repeated = get_repeated(real_element) or 1
-        for current_repetition in xrange(repeated):
-            if pos == position:
-                # Repetitions start counting at 1
-                current_repetition += 1
-                break
-            pos += 1
-        else:
+        if position >= pos + repeated:
             # Not found on this(these) element(s)
+            pos += repeated
             continue
+        # Repetitions start counting at 1
+        current_repetition = position - pos + 1
         parent = real_element.get_parent()
         index = parent.index(real_element)
         # Split, update repetitions and insert the new one
@@ -183,15 +552,12 @@ def _insert_element(position, new_element, real_elements, get_repeated,
     pos = 0
     for real_element in real_elements:
         repeated = get_repeated(real_element) or 1
-        for current_repetition in xrange(repeated):
-            if pos == position:
-                # Repetitions start counting at 1
-                current_repetition += 1
-                break
-            pos += 1
-        else:
+        if position >= pos + repeated:
             # Not found on this(these) element(s)
+            pos += repeated
             continue
+        # Repetitions start counting at 1
+        current_repetition = position - pos + 1
         parent = real_element.get_parent()
         index = parent.index(real_element)
         if repeated == 1 or current_repetition == 1:
@@ -217,12 +583,9 @@ def _delete_element(position, real_elements, get_repeated, set_repeated):
     pos = 0
     for real_element in real_elements:
         repeated = get_repeated(real_element) or 1
-        for current_repetition in xrange(repeated):
-            if pos == position:
-                break
-            pos += 1
-        else:
+        if position >= pos + repeated:
             # Not found on this(these) element(s)
+            pos += repeated
             continue
         # Lost 1 credit
         repeated -= 1
@@ -235,6 +598,31 @@ def _delete_element(position, real_elements, get_repeated, set_repeated):
 
 
 
+def _get_grouped_rows(element, rows, groups=None, y=0):
+    """Append to "rows" the rows of the element, descending into header
+    rows and row groups. If "groups" is given, append to it the (y1, y2,
+    group) of these groups in document order.
+
+    Return the position after the last row.
+    """
+    for child in element.get_elements(_xpath_rows_and_groups):
+        if child.get_tag() == 'table:table-row':
+            rows.append(child)
+            if groups is not None:
+                y += child.get_repeated() or 1
+            continue
+        if groups is None:
+            _get_grouped_rows(child, rows)
+            continue
+        i = len(groups)
+        groups.append(None)
+        end = _get_grouped_rows(child, rows, groups, y)
+        groups[i] = (y, end - 1, child)
+        y = end
+    return y
+
+
+
 def odf_create_cell(value=None, text=None, cell_type=None, currency=None,
         formula=None, repeated=None, style=None):
     """Create a cell element containing the given value. The textual
@@ -312,9 +700,11 @@ def odf_create_row_group(height=None, width=None):
 
         height -- int
 
+        width -- int
+
     Return odf_row_group
     """
-    element = odf_create_row_group('<table:table-row-group')
+    element = odf_create_element('table:table-row-group')
     if height is not None:
         for i in xrange(height):
             row = odf_create_row(width)
@@ -439,15 +829,22 @@ class odf_cell(odf_element):
     """Class for the table cell element.
     """
 
-    def get_value(self):
+    def get_value(self, decoding='decimal'):
         """Get the Python value that represent the cell.
 
         Possible return types are unicode, int, Decimal, datetime,
         timedelta.
 
+        Numbers are decoded as int or Decimal ("decimal"), or as float
+        ("float"), faster. Or the value is left as stored ("raw").
+
+        Arguments:
+
+            decoding -- 'decimal', 'float' or 'raw'
+
         Return: Python type
         """
-        return get_value(self)
+        return get_value(self, decoding=decoding)
 
 
     def set_value(self, value, text=None, cell_type=None, currency=None,
@@ -589,8 +986,27 @@ class odf_cell(odf_element):
         return self.set_text_content(text)
 
 
-    def is_empty(self, aggressive):
-        if self.get_value() is not None or self.get_children():
+    def is_empty(self, aggressive=False):
+        """Return whether the cell has no value, no content and no style.
+
+        If aggressive is True, empty cells with style are considered empty.
+
+        The value is not decoded, only the presence of its attributes is
+        tested.
+
+        Arguments:
+
+            aggressive -- bool
+
+        Return: bool
+        """
+        value_type = self.get_attribute('office:value-type')
+        if value_type is not None:
+            # Same test as "get_value" without decoding
+            if (value_type != 'string'
+                    or self.get_attribute('office:string-value') is not None):
+                return False
+        if self.get_element('*') is not None:
             return False
         if not aggressive and self.get_style() is not None:
             return False
@@ -708,15 +1124,24 @@ class odf_row(odf_element):
 
         Return: list of tuples
         """
+        regex = _compile_content(content) if content else None
         cells = []
-        for x, cell in enumerate(self.traverse()):
+        x = 0
+        for cell in self._get_cells():
+            repeated = cell.get_repeated() or 1
+            x += repeated
             # Filter the cells with the regex
-            if content and not cell.match(content):
+            if (regex is not None and
+                    regex.search(cell.get_text(recursive=True)) is None):
                 continue
             # Filter the cells with the style
             if style and style != cell.get_style():
                 continue
-            cells.append((x, cell))
+            for i in xrange(x - repeated, x):
+                # Return a copy without the now obsolete repetition
+                clone = cell.clone()
+                clone.set_repeated(None)
+                cells.append((i, clone))
         # Return the coordinate and element
         return cells
 
@@ -742,22 +1167,28 @@ class odf_row(odf_element):
         # Inside the defined row
         cell_number = 0
         for cell in self._get_cells():
-            repeated = cell.get_repeated() or 1
-            for i in xrange(repeated):
-                if cell_number == x:
-                    # Return a copy without the now obsolete repetition
-                    cell = cell.clone()
-                    cell.set_repeated(None)
-                    return cell
-                cell_number += 1
+            cell_number += cell.get_repeated() or 1
+            if x < cell_number:
+                # Return a copy without the now obsolete repetition
+                cell = cell.clone()
+                cell.set_repeated(None)
+                return cell
 
 
-    def get_value(self, x):
+    def get_value(self, x, decoding='decimal'):
         """Shortcut to get the value of the cell at position "x".
 
         See ``get_cell`` and ``odf_cell.get_value``.
+
+        Arguments:
+
+            x -- int or str
+
+            decoding -- 'decimal', 'float' or 'raw'
+
+        Return: Python type
         """
-        return self.get_cell(x).get_value()
+        return self.get_cell(x).get_value(decoding=decoding)
 
 
     def set_cell(self, x, cell=None):
@@ -858,12 +1289,144 @@ class odf_row(odf_element):
                 odf_cell.set_repeated)
 
 
-    def get_values(self):
+    def get_values(self, decoding='decimal'):
         """Shortcut to get the list of all cell values in this row.
 
+        Repeated cells are decoded once.
+
+        See ``odf_cell.get_value`` for the decoding.
+
+        Arguments:
+
+            decoding -- 'decimal', 'float' or 'raw'
+
         Return: list of Python types
         """
-        return [cell.get_value() for cell in self.traverse()]
+        values = []
+        for cell in self._get_cells():
+            repeated = cell.get_repeated() or 1
+            values.extend([get_value(cell, decoding=decoding)] * repeated)
+        return values
+
+
+    def _get_values_between(self, x1, x2, decoding='decimal'):
+        """Get the list of values from "x1" to "x2" included, decoding each
+        repeated cell once and skipping the cells outside.
+        """
+        values = []
+        x = 0
+        for cell in self._get_cells():
+            if x > x2:
+                break
+            repeated = cell.get_repeated() or 1
+            if x + repeated > x1:
+                count = min(x + repeated - 1, x2) - max(x, x1) + 1
+                values.extend([get_value(cell, decoding=decoding)] * count)
+            x += repeated
+        # Complement row to match the range
+        values.extend([None] * (x2 - x1 + 1 - len(values)))
+        return values
+
+
+    def _split_cells(self, x1, x2):
+        """Yield the (x, cell) pairs of the cells from "x1" to "x2" included,
+        splitting the repeated cells so each of them is its own element.
+
+        The original cell elements are returned, not copies. Cells at the
+        right of the row are not created.
+        """
+        x = 0
+        for cell in self._get_cells():
+            if x > x2:
+                return
+            repeated = cell.get_repeated() or 1
+            if x + repeated <= x1:
+                x += repeated
+                continue
+            if repeated == 1:
+                yield x, cell
+                x += 1
+                continue
+            first = max(x, x1)
+            last = min(x + repeated - 1, x2)
+            index = self.index(cell)
+            # Keep the repetitions before
+            if first > x:
+                cell.set_repeated(first - x)
+                index += 1
+            else:
+                self.delete(cell)
+            template = cell.clone()
+            template.set_repeated(None)
+            split = []
+            for i in xrange(last - first + 1):
+                new_cell = template.clone()
+                self.insert(new_cell, position=index + i)
+                split.append(new_cell)
+            # Then the repetitions after
+            after = x + repeated - 1 - last
+            if after:
+                new_cell = template.clone()
+                new_cell.set_repeated(after)
+                self.insert(new_cell, position=index + len(split))
+            for i, new_cell in enumerate(split):
+                yield first + i, new_cell
+            x += repeated
+
+
+    def _set_values_from(self, x, values, style=None):
+        """Set the values of the cells starting at position "x". The new
+        cells are built at once like imported rows, and replace the old ones
+        in one pass through the row.
+        """
+        if not values:
+            return
+        x2 = x + len(values) - 1
+        new_row = odf_create_element(_encode_row(
+            [_encode_cell(value) for value in values]))
+        new_cells = new_row.get_children()
+        if style is not None:
+            for cell in new_cells:
+                cell.set_style(style)
+        # The last cell before the new ones, and the repetitions of a cell
+        # going on after them
+        previous = None
+        after = None
+        x_cell = 0
+        for cell in self._get_cells():
+            repeated = cell.get_repeated() or 1
+            last = x_cell + repeated - 1
+            if last < x:
+                previous = cell
+            elif x_cell > x2:
+                break
+            elif x_cell < x:
+                # Keep the repetitions before
+                cell.set_repeated(x - x_cell)
+                previous = cell
+                if last > x2:
+                    after = cell.clone()
+                    after.set_repeated(last - x2)
+            elif last > x2:
+                # Keep the repetitions after
+                cell.set_repeated(last - x2)
+                break
+            else:
+                self.delete(cell)
+            x_cell = last + 1
+        else:
+            # The row ends before "x"
+            if x_cell < x:
+                previous = self.append_cell(
+                        odf_create_cell(repeated=x - x_cell))
+        if after is not None:
+            new_cells.append(after)
+        # Inserted from the last, always at the same place
+        for cell in reversed(new_cells):
+            if previous is None:
+                self.insert(cell, position=0)
+            else:
+                previous.insert(cell, xmlposition=NEXT_SIBLING)
 
 
     def set_values(self, values, style=None):
@@ -874,11 +1437,7 @@ class odf_row(odf_element):
             values -- list of Python types
             style -- cell style
         """
-        width = self.get_width()
-        for x, value in enumerate(values[:width]):
-            self.set_value(x, value, style=style)
-        for value in values[width:]:
-            self.append_cell(odf_create_cell(value, style=style))
+        self._set_values_from(0, list(values), style=style)
 
 
     def rstrip(self, aggressive=False):
@@ -973,6 +1532,12 @@ class odf_column(odf_element):
 
 
 class odf_table(odf_element):
+    # See "set_indexed"
+    __indexed = False
+    __index = None
+    # See "get_span"
+    __spans = None
+
     #
     # Private API
     #
@@ -1001,6 +1566,78 @@ class odf_table(odf_element):
         return (x, y)
 
 
+    def __get_index(self):
+        if self.__index is None:
+            self.__index = _table_index(self)
+        return self.__index
+
+
+    def __reset_index(self):
+        self.__index = None
+        self.__spans = None
+
+
+    def __get_spans(self):
+        """Get the list of merged ranges, and the rows where the ranges
+        spanning them change with, for each of these row ranges, the sorted
+        list of the (x1, x2, range) spanning it.
+        """
+        if self.__spans is not None:
+            return self.__spans
+        spans = []
+        y = 0
+        for row in self._get_rows():
+            repeated = row.get_repeated() or 1
+            x = 0
+            for cell in row._get_cells():
+                columns = int(cell.get_attribute(
+                    'table:number-columns-spanned') or 1)
+                rows = int(cell.get_attribute('table:number-rows-spanned')
+                        or 1)
+                if columns > 1 or rows > 1:
+                    # Every repetition of the row spans too
+                    for i in xrange(y, y + repeated):
+                        spans.append((x, i, x + columns - 1, i + rows - 1))
+                x += cell.get_repeated() or 1
+            y += repeated
+        spans.sort(key=itemgetter(1, 0))
+        # Sweep the rows where ranges begin and end
+        changes = {}
+        for span in spans:
+            x1, y1, x2, y2 = span
+            changes.setdefault(y1, []).append((True, span))
+            changes.setdefault(y2 + 1, []).append((False, span))
+        starts = []
+        lines = []
+        current = set()
+        for y in sorted(changes):
+            for begins, span in changes[y]:
+                if begins:
+                    current.add(span)
+                else:
+                    current.discard(span)
+            starts.append(y)
+            lines.append(sorted((span[0], span[2], span)
+                for span in current))
+        self.__spans = spans, starts, lines
+        return self.__spans
+
+
+    def __split_span(self, span):
+        x1, y1, x2, y2 = span
+        for y, row in self._split_rows(y1, y2):
+            for x, cell in row._split_cells(x1, x2):
+                if (x, y) == (x1, y1):
+                    for name in ('table:number-columns-spanned',
+                            'table:number-rows-spanned'):
+                        try:
+                            cell.del_attribute(name)
+                        except KeyError:
+                            pass
+                else:
+                    cell.set_tag('table:table-cell')
+
+
     def __update_width(self, row):
         """Synchronize the number of columns if the row is bigger.
 
@@ -1033,17 +1670,20 @@ class odf_table(odf_element):
 
     def __get_formatted_text_rst(self, context):
         context['no_img_level'] += 1
-        # Strip the table => We must clone
-        table = self.clone()
-        table.rstrip(aggressive=True)
+        # Only read what "rstrip" would keep, no need to clone
+        width, height = self._get_rstripped_size(aggressive=True)
 
         # Fill the rows
         rows = []
         cols_nb = 0
         cols_size = {}
-        for odf_row in table.traverse():
+        for y, odf_row in enumerate(self.traverse()):
+            if y >= height:
+                break
             row = []
             for i, cell in enumerate(odf_row.traverse()):
+                if i >= width:
+                    break
                 value = get_value(cell, try_get_text=False)
                 # None ?
                 if value is None:
@@ -1168,6 +1808,8 @@ class odf_table(odf_element):
 
         Return: int
         """
+        if self.get_elements(_xpath_row_groups):
+            return sum(row.get_repeated() or 1 for row in self._get_rows())
         rows = self._get_rows()
         repeated = self.xpath('table:table-row/@table:number-rows-repeated')
         unrepeated = len(rows) - len(repeated)
@@ -1265,48 +1907,168 @@ class odf_table(odf_element):
             return self.__get_formatted_text_normal(context)
 
 
-    def get_values(self):
-        """Get a matrix of all Python values of the table.
+    def get_values(self, cell_range=None, decoding='decimal'):
+        """Get a matrix of all Python values of the table, or of the given
+        range of cells.
+
+        See ``iter_values``.
+
+        Arguments:
+
+            cell_range -- str or tuple
+
+            decoding -- 'decimal', 'float' or 'raw'
 
         Return: list of lists
         """
-        data = []
-        width = self.get_width()
-        for row in self.traverse():
-            values = row.get_values()
-            # Complement row to match column width
-            values.extend([None] * (width - len(values)))
-            data.append(values)
-        return data
+        return list(self.iter_values(cell_range=cell_range,
+            decoding=decoding))
+
+
+    def iter_values(self, cell_range=None, decoding='decimal'):
+        """Iterate through lines of Python values of the table, or of the
+        given range of cells.
+
+        The range is either a human-readable range like "B2:F5000", or
+        a 4-uplet of (x1, y1, x2, y2), or a pair of coordinates, bounds
+        included. Only the rows and cells within the range are read. Lines
+        have the width of the range, but lines below the table are not
+        returned.
+
+        Repeated rows and cells are decoded once. See
+        ``odf_cell.get_value`` for the decoding.
+
+        Arguments:
 
+            cell_range -- str or tuple
 
-    def iter_values(self):
-        """Iterate through lines of Python values of the table.
+            decoding -- 'decimal', 'float' or 'raw'
 
         Return: iterator of lists
         """
-        width = self.get_width()
-        for row in self.traverse():
-            values = row.get_values()
-            # Complement row to match column width
-            values.extend([None] * (width - len(values)))
-            yield values
+        if cell_range is None:
+            x1, y1, x2 = 0, 0, self.get_width() - 1
+            y2 = None
+        else:
+            x1, y1, x2, y2 = _get_cell_range(cell_range)
+        y = 0
+        for row in self._get_rows():
+            if y2 is not None and y > y2:
+                return
+            repeated = row.get_repeated() or 1
+            if y + repeated > y1:
+                values = row._get_values_between(x1, x2, decoding=decoding)
+                count = repeated - max(y1 - y, 0)
+                if y2 is not None:
+                    count = min(count, y2 - max(y, y1) + 1)
+                yield values
+                for i in xrange(count - 1):
+                    yield list(values)
+            y += repeated
+
+
+    def iter_sparse_values(self, decoding='decimal'):
+        """Iterate through the populated cells of the table, i.e. cells
+        with a value, as tuples of (x, y, value).
+
+        Runs of empty rows or cells are skipped at once, whatever their
+        repetition. See ``odf_cell.get_value`` for the decoding.
+
+        Arguments:
+
+            decoding -- 'decimal', 'float' or 'raw'
+
+        Return: iterator of tuples
+        """
+        y = 0
+        for row in self._get_rows():
+            row_repeated = row.get_repeated() or 1
+            populated = []
+            x = 0
+            for cell in row._get_cells():
+                repeated = cell.get_repeated() or 1
+                value = get_value(cell, decoding=decoding)
+                if value is not None:
+                    for i in xrange(repeated):
+                        populated.append((x + i, value))
+                x += repeated
+            for i in xrange(row_repeated if populated else 0):
+                for x, value in populated:
+                    yield x, y + i, value
+            y += row_repeated
+
+
+    def get_sparse_values(self, decoding='decimal'):
+        """Get the list of populated cells of the table, i.e. cells with a
+        value, as tuples of (x, y, value).
+
+        See ``iter_sparse_values``.
+
+        Arguments:
+
+            decoding -- 'decimal', 'float' or 'raw'
+
+        Return: list of tuples
+        """
+        return list(self.iter_sparse_values(decoding=decoding))
 
 
-    def set_values(self, values):
-        """Set all Python values for the whole table.
+    def set_values(self, values, cell_range=None):
+        """Set all Python values for the whole table, or for the given range
+        of cells.
 
         A list of lists is expected, with as many lists as rows, and as many
         items in each sublist as cells.
 
+        The range is either a human-readable range like "B2:F5000", or
+        a 4-uplet of (x1, y1, x2, y2), or a pair of coordinates, bounds
+        included. Values are written from its top-left corner and those
+        outside the range are ignored. Only the rows within the range are
+        modified, and the table grows if necessary.
+
         Arguments:
 
             values -- list of lists
+
+            cell_range -- str or tuple
         """
-        values = iter(values)
-        for y, row in enumerate(self.traverse()):
-            row.set_values(values.next())
-            self.set_row(y, row)
+        self.__reset_index()
+        if cell_range is None:
+            x1, y1, x2, y2 = 0, 0, None, None
+        else:
+            x1, y1, x2, y2 = _get_cell_range(cell_range)
+        values = list(values)
+        if y2 is not None:
+            values = values[:y2 - y1 + 1]
+        if x2 is not None:
+            values = [line[:x2 - x1 + 1] for line in values]
+        if not values:
+            return
+        # The row written the farthest to the right
+        widest, width = None, -1
+        y = y1 - 1
+        for y, row in self._split_rows(y1, y1 + len(values) - 1):
+            line = values[y - y1]
+            row._set_values_from(x1, line)
+            if len(line) > width:
+                widest, width = row, len(line)
+        # Rows below the table
+        diff = y1 - self.get_height()
+        if diff > 0:
+            self.append_row(odf_create_row(repeated=diff))
+        for line in values[y - y1 + 1:]:
+            # Filled in the table, moving a filled row costs more
+            row = odf_create_row()
+            self.append(row)
+            row._set_values_from(x1, line)
+            if len(line) > width:
+                widest, width = row, len(line)
+        # Initialize columns, as "append_row" does
+        if not self._get_columns():
+            self.insert(odf_create_column(repeated=self.get_width()),
+                    position=0)
+        # Update width if necessary
+        self.__update_width(widest)
 
     set_table_values = obsolete('set_table_values', set_values)
 
@@ -1322,6 +2084,7 @@ class odf_table(odf_element):
 
             aggressive -- bool
         """
+        self.__reset_index()
         # Step 1: remove empty rows below the table
         for row in reversed(self._get_rows()):
             if row.is_empty(aggressive=aggressive):
@@ -1352,6 +2115,26 @@ class odf_table(odf_element):
     rstrip_table = obsolete('rstrip_table', rstrip)
 
 
+    def _get_rstripped_size(self, aggressive=False):
+        """Get the size the table would have after ``rstrip``, without
+        modifying it nor expanding repetitions.
+
+        Return: (int, int)
+        """
+        width = height = y = 0
+        for row in self._get_rows():
+            y += row.get_repeated() or 1
+            row_width = x = 0
+            for cell in row._get_cells():
+                x += cell.get_repeated() or 1
+                if not cell.is_empty(aggressive=aggressive):
+                    row_width = x
+            if row_width:
+                width = max(width, row_width)
+                height = y
+        return width, height
+
+
     def is_empty(self, aggressive=False):
         """Return whether every cell in the table has no value or the value
         evaluates to False (empty string), and no style.
@@ -1368,12 +2151,112 @@ class odf_table(odf_element):
         return True
 
 
+    def set_indexed(self, indexed=True):
+        """Index the text content of the cells and rows, so the "content"
+        criterion of ``get_cells`` and ``get_rows`` looks it up instead of
+        scanning the table. The index is built at the first lookup, and
+        reset by the changes made through this table object.
+
+        Changes made otherwise, e.g. through the XML API or another object
+        of the same table, are not seen: call ``set_indexed`` again to reset
+        the index.
+
+        Arguments:
+
+            indexed -- bool
+        """
+        self.__indexed = indexed
+        self.__index = None
+
+
     #
     # Rows
     #
 
     def _get_rows(self):
-        return self.get_elements('table:table-row')
+        # Direct children unless grouped, it's faster
+        if not self.get_elements(_xpath_row_groups):
+            return self.get_elements('table:table-row')
+        rows = []
+        _get_grouped_rows(self, rows)
+        return rows
+
+
+    def _split_rows(self, y1, y2):
+        """Yield the (y, row) pairs of the rows from "y1" to "y2" included,
+        splitting the repeated rows so each of them is its own element.
+
+        The original row elements are returned, not copies. Rows below the
+        table are not created.
+        """
+        y2 = min(y2, self.get_height() - 1)
+        return self._split_rows_at(xrange(y1, y2 + 1))
+
+
+    def _split_rows_at(self, positions):
+        """Yield the (y, row) pairs of the rows at the given sorted
+        positions, splitting the repeated rows so each of them is its own
+        element. The other repetitions are kept.
+
+        The original row elements are returned, not copies. Rows below the
+        table are not created.
+        """
+        self.__reset_index()
+        positions = sorted(set(positions))
+        i = 0
+        y = 0
+        for row in self._get_rows():
+            if i == len(positions):
+                return
+            repeated = row.get_repeated() or 1
+            end = y + repeated
+            inside = []
+            while i < len(positions) and positions[i] < end:
+                inside.append(positions[i])
+                i += 1
+            if not inside:
+                y = end
+                continue
+            if repeated == 1:
+                yield y, row
+                y = end
+                continue
+            # Runs of (y, repeated, is_target)
+            runs = []
+            first = y
+            for position in inside:
+                if position > first:
+                    runs.append((first, position - first, False))
+                runs.append((position, 1, True))
+                first = position + 1
+            if end > first:
+                runs.append((first, end - first, False))
+            template = row.clone()
+            template.set_repeated(None)
+            parent = row.get_parent()
+            index = parent.index(row)
+            parent.delete(row)
+            for j, (first, count, is_target) in enumerate(runs):
+                new_row = template.clone()
+                if count > 1:
+                    new_row.set_repeated(count)
+                parent.insert(new_row, position=index + j)
+                if is_target:
+                    yield first, new_row
+            y = end
+
+
+    def get_row_groups(self):
+        """Get the header rows and the groups of rows of the table, nested
+        ones included, as (y1, y2, group) tuples in document order, "y2"
+        included. The rows inside are addressed like the others.
+
+        Return: list of (int, int, odf_element)
+        """
+        rows = []
+        groups = []
+        _get_grouped_rows(self, rows, groups)
+        return groups
 
 
     def traverse(self):
@@ -1407,13 +2290,28 @@ class odf_table(odf_element):
 
         Return: list of tuples
         """
+        if content and self.__indexed:
+            runs = self.__get_index().get_row_runs(content)
+            runs.sort(key=itemgetter(0))
+        else:
+            regex = _compile_content(content) if content else None
+            runs = []
+            y = 0
+            for row in self._get_rows():
+                height = row.get_repeated() or 1
+                if regex is None or regex.search(
+                        row.get_text(recursive=True)) is not None:
+                    runs.append((y, height, row))
+                y += height
         rows = []
-        for y, row in enumerate(self.traverse()):
-            if content and not row.match(content):
-                continue
+        for y, height, row in runs:
             if style and style != row.get_style():
                 continue
-            rows.append((y, row))
+            for i in xrange(height):
+                # Return a copy without the now obsolete repetition
+                clone = row.clone()
+                clone.set_repeated(None)
+                rows.append((y + i, clone))
         return rows
 
     get_row_list = obsolete('get_row_list', get_rows)
@@ -1455,6 +2353,7 @@ class odf_table(odf_element):
 
             row -- odf_row
         """
+        self.__reset_index()
         if row is None:
             row = odf_create_row()
         y = self._translate_y(y)
@@ -1483,6 +2382,7 @@ class odf_table(odf_element):
 
             row -- odf_row
         """
+        self.__reset_index()
         if row is None:
             row = odf_create_row()
         y = self._translate_y(y)
@@ -1515,6 +2415,7 @@ class odf_table(odf_element):
 
             row -- odf_row
         """
+        self.__reset_index()
         if row is None:
             row = odf_create_row(self.get_width() or 1)
         # Appending a repeated row accepted
@@ -1537,6 +2438,7 @@ class odf_table(odf_element):
 
             y -- int
         """
+        self.__reset_index()
         y = self._translate_y(y)
         # Outside the defined table
         if y >= self.get_height():
@@ -1546,7 +2448,7 @@ class odf_table(odf_element):
                 odf_row.set_repeated)
 
 
-    def get_row_values(self, y):
+    def get_row_values(self, y, decoding='decimal'):
         """Shortcut to get the list of Python values for the cells of the row
         at the given "y" position.
 
@@ -1555,8 +2457,10 @@ class odf_table(odf_element):
         Arguments:
 
             y -- int
+
+            decoding -- 'decimal', 'float' or 'raw'
         """
-        values = self.get_row(y).get_values()
+        values = self.get_row(y).get_values(decoding=decoding)
         values.extend([None] * (self.get_width() - len(values)))
         return values
 
@@ -1573,6 +2477,7 @@ class odf_table(odf_element):
 
             values -- list of Python types
         """
+        self.__reset_index()
         row = self.get_row(y)
         row.set_values(values)
         self.set_row(y, row)
@@ -1595,6 +2500,95 @@ class odf_table(odf_element):
         return self.get_row(y).is_empty(aggressive=aggressive)
 
 
+    def sort_rows(self, key_columns, reverse=False):
+        """Sort *in-place* the rows by the values of the given columns, in
+        order of precedence. Numbers come first, then text ignoring case,
+        then dates and durations, and empty cells last. The sort is stable.
+
+        The row elements are moved, so their styles, formulas and
+        repetitions are kept. Rows are sorted among the consecutive rows of
+        their table or row group only, header rows are left untouched.
+
+        Alphabetical positions like "C" are accepted.
+
+        Arguments:
+
+            key_columns -- int or str, or list of them
+
+            reverse -- bool
+        """
+        self.__reset_index()
+        if not isiterable(key_columns):
+            key_columns = [key_columns]
+        key_columns = [self._translate_x(x) for x in key_columns]
+        x1, x2 = min(key_columns), max(key_columns)
+        containers = [self]
+        containers.extend(group for y1, y2, group in self.get_row_groups()
+                if group.get_tag() != 'table:table-header-rows')
+        # Blocks of consecutive rows, with their container and the element
+        # they follow
+        blocks = []
+        for container in containers:
+            rows = None
+            previous = None
+            for child in container.get_children():
+                if child.get_tag() != 'table:table-row':
+                    rows = None
+                elif rows is None:
+                    rows = [child]
+                    blocks.append((container, previous, rows))
+                else:
+                    rows.append(child)
+                previous = child
+        for container, previous, rows in blocks:
+            # Extract the keys once
+            keys = []
+            for row in rows:
+                values = row._get_values_between(x1, x2)
+                keys.append(tuple(_get_sort_key(values[x - x1])
+                    for x in key_columns))
+            # One stable pass per column, the last first, so empty cells
+            # stay last in reverse order too
+            order = range(len(rows))
+            for i in reversed(xrange(len(key_columns))):
+                filled = [j for j in order if keys[j][i] is not None]
+                empty = [j for j in order if keys[j][i] is None]
+                filled.sort(key=lambda j: keys[j][i], reverse=reverse)
+                order = filled + empty
+            # Move the rows
+            for row in rows:
+                container.delete(row)
+            for i in order:
+                row = rows[i]
+                if previous is None:
+                    container.insert(row, position=0)
+                else:
+                    previous.insert(row, xmlposition=NEXT_SIBLING)
+                previous = row
+
+
+    def filter_rows(self, predicate):
+        """Delete *in-place* the rows for which the predicate, called with
+        the list of Python values of the row, returns False. Repeated rows
+        are tested once.
+
+        Rows in header rows and row groups are left untouched.
+
+        Arguments:
+
+            predicate -- callable
+
+        Return: int, the number of rows deleted
+        """
+        self.__reset_index()
+        deleted = 0
+        for row in self.get_elements('table:table-row'):
+            if not predicate(row.get_values()):
+                deleted += row.get_repeated() or 1
+                self.delete(row)
+        return deleted
+
+
     #
     # Cells
     #
@@ -1611,10 +2605,35 @@ class odf_table(odf_element):
 
         Return: list of tuples
         """
+        if content and self.__indexed:
+            runs = self.__get_index().get_cell_runs(content)
+            runs.sort(key=itemgetter(0, 2))
+        else:
+            regex = _compile_content(content) if content else None
+            runs = []
+            y = 0
+            for row in self._get_rows():
+                height = row.get_repeated() or 1
+                x = 0
+                for cell in row._get_cells():
+                    width = cell.get_repeated() or 1
+                    if (regex is None or regex.search(
+                            cell.get_text(recursive=True)) is not None):
+                        runs.append((y, height, x, width, cell))
+                    x += width
+                y += height
         cells = []
-        for y, row in enumerate(self.traverse()):
-            for x, cell in row.get_cells(style=style, content=content):
-                cells.append((x, y, cell))
+        # The cells of the same row
+        for (y, height), group in groupby(runs, itemgetter(0, 1)):
+            group = [run for run in group
+                    if not style or style == run[4].get_style()]
+            for j in xrange(height):
+                for y, height, x, width, cell in group:
+                    for i in xrange(width):
+                        # Return a copy without the now obsolete repetition
+                        clone = cell.clone()
+                        clone.set_repeated(None)
+                        cells.append((x + i, y + j, clone))
         # Return the coordinates and element
         return cells
 
@@ -1645,7 +2664,7 @@ class odf_table(odf_element):
                 return row.get_cell(x)
 
 
-    def get_value(self, coordinates):
+    def get_value(self, coordinates, decoding='decimal'):
         """Shortcut to get the Python value of the cell at the given
         coordinates.
 
@@ -1655,9 +2674,11 @@ class odf_table(odf_element):
 
             coordinates -- (int, int) or str
 
+            decoding -- 'decimal', 'float' or 'raw'
+
         Return: Python type
         """
-        return self.get_cell(coordinates).get_value()
+        return self.get_cell(coordinates).get_value(decoding=decoding)
 
 
     def set_cell(self, coordinates, cell=None):
@@ -1672,6 +2693,7 @@ class odf_table(odf_element):
 
             cell -- odf_cell
         """
+        self.__reset_index()
         if cell is None:
             cell = odf_create_cell()
         x, y = self._translate_coordinates(coordinates)
@@ -1728,6 +2750,7 @@ class odf_table(odf_element):
 
             type -- 'spreadsheet' or 'text'
         """
+        self.__reset_index()
         # Test document type
         if type is None:
             body = self.get_document_body()
@@ -1780,6 +2803,7 @@ class odf_table(odf_element):
 
             cell -- odf_cell
         """
+        self.__reset_index()
         if cell is None:
             cell = odf_create_cell()
         x, y = self._translate_coordinates(coordinates)
@@ -1829,6 +2853,7 @@ class odf_table(odf_element):
 
             cell -- odf_cell
         """
+        self.__reset_index()
         if cell is None:
             cell = odf_create_cell()
         y = self._translate_y(y)
@@ -1868,6 +2893,7 @@ class odf_table(odf_element):
 
             coordinates -- (int, int) or str
         """
+        self.__reset_index()
         x, y = self._translate_coordinates(coordinates)
         # Outside the defined table
         if y >= self.get_height():
@@ -1878,6 +2904,120 @@ class odf_table(odf_element):
         self.set_row(y, row)
 
 
+    def get_spans(self):
+        """Get the list of the ranges of merged cells, as (x1, y1, x2, y2)
+        tuples, bounds included.
+
+        Return: list of tuples
+        """
+        spans, starts, lines = self.__get_spans()
+        return list(spans)
+
+
+    def get_span(self, coordinates):
+        """Get the range of merged cells the given cell belongs to, either
+        as the first cell or as a covered cell, or None.
+
+        The merged ranges are indexed by row at the first call, until the
+        table is changed through this table object.
+
+        Arguments:
+
+            coordinates -- (int, int) or str
+
+        Return: (int, int, int, int) or None
+        """
+        x, y = self._translate_coordinates(coordinates)
+        spans, starts, lines = self.__get_spans()
+        i = bisect_right(starts, y) - 1
+        if i < 0:
+            return None
+        line = lines[i]
+        i = bisect_right(line, (x, float('inf'))) - 1
+        if i < 0:
+            return None
+        x1, x2, span = line[i]
+        if x > x2:
+            return None
+        return span
+
+
+    def merge_cells(self, cell_range):
+        """Merge the cells in the range: the first cell spans the range and
+        the others become covered cells. Their content is kept but hidden.
+
+        Merged ranges inside are merged again, merged ranges overlapping
+        the range are refused.
+
+        See ``get_values`` for the range syntax.
+
+        Arguments:
+
+            cell_range -- str or tuple
+        """
+        x1, y1, x2, y2 = _get_cell_range(cell_range)
+        if (x1, y1) == (x2, y2):
+            return
+        inside = []
+        for span in self.get_spans():
+            sx1, sy1, sx2, sy2 = span
+            if sx2 < x1 or sx1 > x2 or sy2 < y1 or sy1 > y2:
+                continue
+            if x1 <= sx1 and sx2 <= x2 and y1 <= sy1 and sy2 <= y2:
+                inside.append(span)
+            else:
+                raise ValueError, "range overlaps merged cells %s" % (span,)
+        for span in inside:
+            self.__split_span(span)
+        self.__reset_index()
+        # Rows below the table
+        diff = y2 - self.get_height() + 1
+        if diff > 0:
+            self.append_row(odf_create_row(repeated=diff))
+        widest = None
+        for y, row in self._split_rows(y1, y2):
+            # Cells at the right of the row
+            diff = x2 - row.get_width() + 1
+            if diff > 0:
+                row.append_cell(odf_create_cell(repeated=diff))
+                widest = row
+            for x, cell in row._split_cells(x1, x2):
+                if (x, y) == (x1, y1):
+                    cell = cell.set_tag('table:table-cell')
+                    cell.set_attribute('table:number-columns-spanned',
+                            str(x2 - x1 + 1))
+                    cell.set_attribute('table:number-rows-spanned',
+                            str(y2 - y1 + 1))
+                else:
+                    cell.set_tag('table:covered-table-cell')
+        # Rows grown the same, the last one will do
+        if widest is not None:
+            self.__update_width(widest)
+
+
+    def split_cells(self, cell_range=None):
+        """Split the merged cells in or overlapping the range, by default
+        all of them. Covered cells become normal cells again, with their
+        content.
+
+        See ``get_values`` for the range syntax.
+
+        Arguments:
+
+            cell_range -- str or tuple
+        """
+        if cell_range is None:
+            spans = self.get_spans()
+        else:
+            x1, y1, x2, y2 = _get_cell_range(cell_range)
+            spans = [(sx1, sy1, sx2, sy2)
+                    for sx1, sy1, sx2, sy2 in self.get_spans()
+                    if not (sx2 < x1 or sx1 > x2 or sy2 < y1 or sy1 > y2)]
+        self.__reset_index()
+        for span in spans:
+            self.__split_span(span)
+
+
     #
     # Columns
     #
@@ -2005,6 +3145,7 @@ class odf_table(odf_element):
 
             column -- odf_column
         """
+        self.__reset_index()
         if column is None:
             column = odf_create_column()
         x = self._translate_x(x)
@@ -2021,12 +3162,13 @@ class odf_table(odf_element):
                 odf_column.set_repeated)
         # Repetitions are accepted
         repeated = column.get_repeated() or 1
-        # Update width on every row
+        cell = odf_create_cell(repeated=repeated)
+        # Update width on every row, in one pass each
         for row in self._get_rows():
-            if row.get_width() > x:
-                row.insert_cell(x, odf_create_cell(repeated=repeated))
             # Shorter rows don't need insert
             # Longer rows shouldn't exist!
+            _insert_element(x, cell, row._get_cells(), odf_cell.get_repeated,
+                    odf_cell.set_repeated)
         return column
 
 
@@ -2064,6 +3206,7 @@ class odf_table(odf_element):
 
             x -- int or str.isalpha()
         """
+        self.__reset_index()
         x = self._translate_x(x)
         # Outside the defined table
         if x >= self.get_columns_width():
@@ -2072,11 +3215,11 @@ class odf_table(odf_element):
         _delete_element(x, self._get_columns(),
                 odf_column.get_repeated,
                 odf_column.set_repeated)
-        # Update width
-        width = self.get_columns_width()
-        for y, row in enumerate(self._get_rows()):
-            if row.get_width() >= width:
-                row.delete_cell(x)
+        # Update width on every row, in one pass each
+        for row in self._get_rows():
+            # Shorter rows don't need delete
+            _delete_element(x, row._get_cells(), odf_cell.get_repeated,
+                    odf_cell.set_repeated)
 
 
     def get_column_cells(self, x):
@@ -2095,26 +3238,36 @@ class odf_table(odf_element):
         result = []
         for row in self._get_rows():
             cell = row.get_cell(x)
+            result.append(cell)
             repeated = row.get_repeated() or 1
-            for i in xrange(repeated):
+            for i in xrange(repeated - 1):
                 result.append(cell.clone())
         return result
 
 
-    def get_column_values(self, x):
+    def get_column_values(self, x, decoding='decimal'):
         """Shortcut to get the list of Python values for the cells at the
         given position.
 
         Position start at 0. So cell C4 is on column 2. Alphabetical position
         like "C" is accepted.
 
+        Repeated rows and cells are decoded once.
+
         Arguments:
 
             x -- int or str.isalpha()
 
+            decoding -- 'decimal', 'float' or 'raw'
+
         Return: list of Python types
         """
-        return [cell.get_value() for cell in self.get_column_cells(x)]
+        x = self._translate_x(x)
+        values = []
+        for row in self._get_rows():
+            value = row._get_values_between(x, x, decoding=decoding)[0]
+            values.extend([value] * (row.get_repeated() or 1))
+        return values
 
 
     def set_column_cells(self, x, cells):
@@ -2131,13 +3284,29 @@ class odf_table(odf_element):
 
             cells -- list of odf_cell
         """
+        self.__reset_index()
+        x = self._translate_x(x)
         height = self.get_height()
         if len(cells) != height:
             raise ValueError, "col mismatch: %s cells expected" % height
-        cells = iter(cells)
-        for y, row in enumerate(self.traverse()):
-            row.set_cell(x, cells.next())
-            self.set_row(y, row)
+        # Repeated rows only get split if their new cells differ
+        split = []
+        y = 0
+        for row in self._get_rows():
+            repeated = row.get_repeated() or 1
+            if repeated == 1:
+                row.set_cell(x, cells[y])
+            else:
+                first = cells[y].serialize()
+                for cell in cells[y + 1:y + repeated]:
+                    if cell.serialize() != first:
+                        split.extend(xrange(y, y + repeated))
+                        break
+                else:
+                    row.set_cell(x, cells[y])
+            y += repeated
+        for y, row in self._split_rows_at(split):
+            row.set_cell(x, cells[y])
 
 
     def set_column_values(self, x, values):
@@ -2155,6 +3324,7 @@ class odf_table(odf_element):
 
             values -- list of Python types
         """
+        self.__reset_index()
         cells = [odf_create_cell(value) for value in values]
         self.set_column_cells(x, cells)
 
@@ -2181,13 +3351,87 @@ class odf_table(odf_element):
     # Utilities
     #
 
+    def iter_arrays(self, cell_range=None, chunk_size=None,
+            decoding='decimal'):
+        """Iterate through the table by chunks of rows, as lists of one
+        NumPy array per column. NumPy is required.
+
+        See ``arrays.iter_table_arrays``.
+
+        Arguments:
+
+            cell_range -- str or tuple
+
+            chunk_size -- int
+
+            decoding -- 'decimal', 'float' or 'raw'
+
+        Return: iterator of lists of numpy.ndarray
+        """
+        from arrays import iter_table_arrays, CHUNK_SIZE
+
+        return iter_table_arrays(self, cell_range=cell_range,
+                chunk_size=chunk_size or CHUNK_SIZE, decoding=decoding)
+
+
+    def to_arrays(self, cell_range=None, decoding='decimal'):
+        """Get the table as a list of one NumPy array per column. NumPy is
+        required.
+
+        See ``arrays.iter_table_arrays``.
+
+        Arguments:
+
+            cell_range -- str or tuple
+
+            decoding -- 'decimal', 'float' or 'raw'
+
+        Return: list of numpy.ndarray
+        """
+        from arrays import table_to_arrays
+
+        return table_to_arrays(self, cell_range=cell_range,
+                decoding=decoding)
+
+
+    def to_dataframe(self, cell_range=None, header=True):
+        """Get the table as a pandas DataFrame. If header is True, the first
+        row gives the column names. Pandas is required.
+
+        See ``arrays.iter_table_arrays``.
+
+        Arguments:
+
+            cell_range -- str or tuple
+
+            header -- bool
+
+        Return: pandas.DataFrame
+        """
+        from arrays import table_to_dataframe
+
+        return table_to_dataframe(self, cell_range=cell_range, header=header)
+
+
     def to_csv(self, path_or_file=None, delimiter=',', quotechar='"',
-            lineterminator='\n', encoding='utf-8'):
+            lineterminator='\n', encoding='utf-8', render='value',
+            rstrip=False, decoding='decimal'):
         """
         Write the table as CSV in the file. If the file is a string, it is
         opened as a local path. Else a open file-like is expected; it will not
         be closed afterwards.
 
+        Values are rendered as Python values ("value"), as stored in the
+        "office:*-value" attributes without decoding ("raw"), or as the
+        displayed text ("text"). Python values are decoded as with
+        ``odf_cell.get_value``.
+
+        If rstrip is True, the empty rows below and the empty cells at the
+        right are not written, as after ``rstrip(aggressive=True)``, but the
+        table is not modified.
+
+        Repeated rows and cells are rendered once.
+
         Arguments:
 
             path_or_file -- str or file-like
@@ -2199,7 +3443,15 @@ class odf_table(odf_element):
             lineterminator -- str
 
             encoding -- str
+
+            render -- 'value', 'raw' or 'text'
+
+            rstrip -- bool
+
+            decoding -- 'decimal', 'float' or 'raw'
         """
+        if render not in ('value', 'raw', 'text'):
+            raise ValueError, 'unknown rendering "%s"' % render
         close_after = False
         # In-memory
         if path_or_file is None:
@@ -2211,25 +3463,230 @@ class odf_table(odf_element):
         # Open file
         else:
             file = path_or_file
-        quoted = quotechar * 2
-        for values in self.iter_values():
+        csv = writer(file, delimiter=delimiter, quotechar=quotechar,
+                lineterminator=lineterminator, quoting=QUOTE_ALL)
+        if rstrip:
+            width, height = self._get_rstripped_size(aggressive=True)
+        else:
+            width, height = self.get_width(), None
+        y = 0
+        for row in self._get_rows():
+            if height is not None and y >= height:
+                break
+            repeated = row.get_repeated() or 1
+            if height is not None:
+                repeated = min(repeated, height - y)
             line = []
-            for value in values:
-                # Also testing lxml.etree._ElementUnicodeResult
-                if type(value) is unicode:
-                    value = value.encode(encoding)
-                elif type(value) is str:
-                    value = value.strip()
-                value = '' if value is None else str(value)
-                value = value.replace(quotechar, quoted)
-                line.append(quotechar + value + quotechar)
-            file.write(delimiter.join(line) + lineterminator)
+            for cell in row._get_cells():
+                if len(line) >= width:
+                    break
+                value = _render_cell(cell, render, encoding, decoding)
+                line.extend([value] * (cell.get_repeated() or 1))
+            # Complement row to match column width
+            line.extend([''] * (width - len(line)))
+            del line[width:]
+            for i in xrange(repeated):
+                csv.writerow(line)
+            y += repeated
         if path_or_file is None:
             return file.getvalue()
         if close_after:
             file.close()
 
 
+    def to_sqlite(self, connection, name=None, header=False):
+        """Write the table in a new table of the SQLite database, replacing
+        any table of the same name, by default the name of this table.
+
+        If header is True, the first row gives the column names. Else the
+        columns are named "A", "B", etc. Empty names fall back to the
+        letter, repeated ones get a "_2", "_3", etc. suffix. The column
+        types are inferred from the value types of the cells, mixed
+        columns have no type.
+
+        The rows are streamed to the database in a single transaction, the
+        empty rows below and the empty cells at the right are skipped.
+
+        Arguments:
+
+            connection -- sqlite3.Connection
+
+            name -- unicode
+
+            header -- bool
+        """
+        if name is None:
+            name = self.get_name()
+        width, height = self._get_rstripped_size(aggressive=True)
+        names = [_digit_to_alpha(x) for x in xrange(width)]
+        if header and width:
+            for values in self.iter_values((0, 0, width - 1, 0)):
+                for x, value in enumerate(values):
+                    if value is not None and unicode(value).strip():
+                        names[x] = unicode(value).strip()
+        # Make the names unique, SQLite ignores case
+        seen = set()
+        for x, column_name in enumerate(names):
+            unique = column_name
+            i = 2
+            while unique.lower() in seen:
+                unique = u"%s_%d" % (column_name, i)
+                i += 1
+            seen.add(unique.lower())
+            names[x] = unique
+        columns = []
+        for column_name, types in zip(names,
+                self.__get_column_types(width, int(header), height)):
+            sql_types = set(_sqlite_types[value_type]
+                    for value_type in types)
+            sql_type = sql_types.pop() if len(sql_types) == 1 else u""
+            columns.append(u"%s %s" % (_quote_sql_name(column_name),
+                sql_type))
+        table = _quote_sql_name(name)
+        with connection:
+            connection.execute(u"DROP TABLE IF EXISTS %s" % table)
+            connection.execute(u"CREATE TABLE %s (%s)" % (table,
+                u", ".join(columns) or u'"A"'))
+            if width:
+                connection.executemany(u"INSERT INTO %s VALUES (%s)"
+                        % (table, u", ".join(u"?" * width)),
+                        self.__iter_sqlite_rows(width, int(header), height))
+
+
+    def __iter_sqlite_rows(self, width, y1, y2):
+        """Iterate through the rows between "y1" included and "y2"
+        excluded, as tuples of values for SQLite. Repeated rows are decoded
+        once.
+        """
+        y = 0
+        for row in self._get_rows():
+            if y >= y2:
+                return
+            repeated = row.get_repeated() or 1
+            first = max(y, y1)
+            y += repeated
+            if y <= y1:
+                continue
+            values = tuple([_get_sqlite_value(value)
+                for value in row._get_values_between(0, width - 1,
+                    decoding='float')])
+            for i in xrange(min(y, y2) - first):
+                yield values
+
+
+    def __get_column_types(self, width, y1, y2):
+        """Get for each column the set of value types of its cells between
+        "y1" included and "y2" excluded.
+        """
+        types = [set() for x in xrange(width)]
+        y = 0
+        for row in self._get_rows():
+            if y >= y2:
+                break
+            repeated = row.get_repeated() or 1
+            y += repeated
+            if y <= y1:
+                continue
+            x = 0
+            for cell in row._get_cells():
+                if x >= width:
+                    break
+                repeated = cell.get_repeated() or 1
+                value_type = cell.get_type()
+                if value_type in _sqlite_types:
+                    for i in xrange(x, min(x + repeated, width)):
+                        types[i].add(value_type)
+                x += repeated
+        return types
+
+
+
+def _quote_sql_name(name):
+    """Quote the table or column name for SQL.
+    """
+    return u'"%s"' % name.replace(u'"', u'""')
+
+
+
+def _get_sqlite_value(value):
+    """Convert the Python value of a cell to a type SQLite accepts.
+    """
+    value_type = type(value)
+    if value_type is timedelta:
+        return Duration.encode(value)
+    elif value_type is datetime:
+        return value.isoformat()
+    return value
+
+
+
+def _render_cell(cell, render, encoding, decoding):
+    """Render the cell as a str for ``odf_table.to_csv``.
+    """
+    value_type = cell.get_type()
+    if value_type is None:
+        return ''
+    if render == 'value':
+        value = cell.get_value(decoding=decoding)
+        if value is None:
+            return ''
+        # Also testing lxml.etree._ElementUnicodeResult
+        if isinstance(value, unicode):
+            return value.encode(encoding)
+        return str(value)
+    elif render == 'raw':
+        attribute = _value_attributes.get(value_type)
+        if attribute is not None:
+            value = cell.get_attribute(attribute)
+            if type(value) is bool:
+                value = Boolean.encode(value)
+            if value is not None:
+                return value.encode(encoding)
+    return cell.get_text_content().encode(encoding)
+
+
+
+def _table_to_csv(args):
+    """Worker of ``export_to_csv``.
+    """
+    data, path, options = args
+    odf_create_element(data).to_csv(path, **options)
+
+
+
+def export_to_csv(tables, paths, processes=None, **options):
+    """Write each table as CSV at the path of the same index, in parallel
+    worker processes. Each table is sent serialized to its worker.
+
+    If processes is None, the number of CPUs is used. If it is 1, the
+    tables are written one after the other in the current process.
+
+    Other arguments are passed to ``odf_table.to_csv``.
+
+    Arguments:
+
+        tables -- list of odf_table
+
+        paths -- list of str
+
+        processes -- int
+    """
+    if len(tables) != len(paths):
+        raise ValueError, "as many paths as tables expected"
+    if processes == 1 or len(tables) < 2:
+        for table, path in zip(tables, paths):
+            table.to_csv(path, **options)
+        return
+    jobs = [(table.serialize(), path, options)
+            for table, path in zip(tables, paths)]
+    pool = Pool(processes)
+    try:
+        pool.map(_table_to_csv, jobs)
+    finally:
+        pool.close()
+        pool.join()
+
+
 
 def import_from_csv(path_or_file, name, style=None, delimiter=None,
         quotechar=None, lineterminator=None, encoding='utf-8'):
@@ -2240,6 +3697,11 @@ def import_from_csv(path_or_file, name, style=None, delimiter=None,
     CSV format can be autodetected to a certain limit, but encoding is
     important.
 
+    The file is read as a stream: the dialect and the type of each column
+    are guessed from the first lines, then values are decoded with the type
+    of their column, or guessed one by one when it doesn't fit. Identical
+    consecutive cells and rows are repeated.
+
     Arguments:
 
       path_or_file -- str or file-like
@@ -2256,20 +3718,17 @@ def import_from_csv(path_or_file, name, style=None, delimiter=None,
 
       encoding -- str
     """
-
-    # Load the data
-    # XXX Load the entire file in memory
-    # Alternative: a file-wrapper returning the sample then the rest
     if type(path_or_file) is str:
         file = open(path_or_file, 'rb')
-        data = file.read().splitlines(True)
-        file.close()
+        close_after = True
     else:
         # Leave the file we were given open
-        data = path_or_file.read().splitlines(True)
+        file = path_or_file
+        close_after = False
+    lines = _iter_csv_lines(file)
     # Sniff the dialect
-    sample = ''.join(data[:100])
-    dialect = Sniffer().sniff(sample)
+    sample = list(islice(lines, CSV_SAMPLE_SIZE))
+    dialect = Sniffer().sniff(''.join(sample))
     # We can overload the result
     if delimiter is not None:
         dialect.delimiter = delimiter
@@ -2277,18 +3736,121 @@ def import_from_csv(path_or_file, name, style=None, delimiter=None,
         dialect.quotechar = quotechar
     if lineterminator is not None:
         dialect.lineterminator = lineterminator
+    # Guess the type of the columns, the first line may be a header
+    decoders = _get_csv_decoders(islice(reader(sample, dialect), 1, None),
+            encoding)
     # Make the rows
-    csv = reader(data, dialect)
-    table = odf_create_table(name, style=style)
-    for line in csv:
-        row = odf_create_row()
-        # rstrip line
-        while line and not line[-1].strip():
-            line.pop()
-        for value in line:
-            cell = odf_create_cell(_get_python_value(value, encoding))
-            row.append_cell(cell)
-        table.append_row(row)
+    csv = reader(chain(sample, lines), dialect)
+    # Cells already encoded by column, by raw value
+    caches = [{} for decoder in decoders]
+    width = [0]
+    def make_rows():
+        for line in csv:
+            # rstrip line
+            while line and not line[-1].strip():
+                line.pop()
+            width[0] = max(width[0], len(line))
+            cells = []
+            for x, data in enumerate(line):
+                if x == len(decoders):
+                    decoders.append(None)
+                    caches.append({})
+                cache = caches[x]
+                cell = cache.get(data)
+                if cell is None:
+                    decoder = decoders[x]
+                    if decoder is not None and data:
+                        try:
+                            value = decoder(unicode(data, encoding))
+                        except ValueError:
+                            value = _get_python_value(data, encoding)
+                    else:
+                        value = _get_python_value(data, encoding)
+                    cell = _encode_cell(value)
+                    if len(cache) == CSV_CACHE_SIZE:
+                        cache.clear()
+                    cache[data] = cell
+                cells.append(cell)
+            yield _encode_row(cells)
+    # Parse the rows as they come
+    table = _create_element_from_chunks(chain(
+        [u'<table:table table:name="%s">'
+            % escape(name, _attribute_entities)],
+        _repeat_rows(make_rows()),
+        [u'</table:table>']))
+    if close_after:
+        file.close()
+    if style:
+        table.set_style(style)
+    if width[0]:
+        table.insert(odf_create_column(repeated=width[0]), position=0)
+    return table
+
+
+
+def import_from_cursor(cursor, name, style=None, header=False,
+        batch_size=CURSOR_BATCH_SIZE):
+    """Convert the result of the query executed by the DB-API cursor to an
+    odf_table. If header is True, the first row gives the column names.
+
+    The rows are fetched by batches of "batch_size" and parsed as they
+    come. Values are encoded like ``odf_create_cell`` does, identical
+    consecutive cells and rows are repeated.
+
+    Arguments:
+
+      cursor -- DB-API cursor
+
+      name -- unicode
+
+      style -- str
+
+      header -- bool
+
+      batch_size -- int
+
+    Return: odf_table
+    """
+    description = cursor.description or []
+    width = len(description)
+    # Cells already encoded by column, by value
+    caches = [{} for x in xrange(width)]
+    def make_rows():
+        if header:
+            names = []
+            for column in description:
+                column_name = column[0]
+                if type(column_name) is str:
+                    column_name = unicode(column_name, 'utf-8')
+                names.append(_encode_cell(column_name))
+            yield _encode_row(names)
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                return
+            for line in batch:
+                cells = []
+                for value, cache in zip(line, caches):
+                    # 1, 1.0 and True are equal
+                    key = (type(value), value)
+                    cell = cache.get(key)
+                    if cell is None:
+                        cell = _encode_cell(value)
+                        if len(cache) == CSV_CACHE_SIZE:
+                            cache.clear()
+                        cache[key] = cell
+                    cells.append(cell)
+                yield _encode_row(cells)
+    # Parse the rows as they come
+    table = _create_element_from_chunks(chain(
+        [u'<table:table table:name="%s">'
+            % escape(name, _attribute_entities)],
+        _repeat_rows(make_rows()),
+        [u'</table:table>']))
+    if style:
+        table.set_style(style)
+    if width:
+        table.insert(odf_create_column(repeated=width), position=0)
     return table
 
 
@@ -2297,5 +3859,6 @@ def import_from_csv(path_or_file, name, style=None, delimiter=None,
 register_element_class('table:table-cell', odf_cell)
 register_element_class('table:covered-table-cell', odf_cell)
 register_element_class('table:table-row', odf_row)
+register_element_class('table:table-row-group', odf_row_group)
 register_element_class('table:table-column', odf_column)
 register_element_class('table:table', odf_table)
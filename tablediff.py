@@ -0,0 +1,297 @@
+# -*- coding: UTF-8 -*-
+#
+# Copyright (c) 2009-2010 Ars Aperta, Itaapy, Pierlis, Talend.
+#
+# This file is part of Lpod (see: http://lpod-project.org).
+# Lpod is free software; you can redistribute it and/or modify it under
+# the terms of either:
+#
+# a) the GNU General Public License as published by the Free Software
+#    Foundation, either version 3 of the License, or (at your option)
+#    any later version.
+#    Lpod is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#    You should have received a copy of the GNU General Public License
+#    along with Lpod.  If not, see <http://www.gnu.org/licenses/>.
+#
+# b) the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+
+"""Cell-level comparison of spreadsheets.
+
+Tables are aligned by name, and rows by the values of key columns or by
+their content. Each row is serialized once, and rows with the same XML
+are never compared cell by cell.
+
+Changes are tuples of (kind, table name, old position, new position,
+old, new):
+
+- ("insert-table", name, None, None, None, None)
+- ("delete-table", name, None, None, None, None)
+- ("insert-row", name, None, y, None, values)
+- ("delete-row", name, y, None, values, None)
+- ("change-cell", name, (x, y), (x, y), old value, new value)
+- ("change-style", name, (x, y), (x, y), old style, new style), x is None
+  for the style of the row
+"""
+
+# Import from the Standard Library
+from difflib import SequenceMatcher
+from re import compile
+
+# Import from lpod
+from table import _digit_to_alpha
+from utils import get_value
+
+
+_repeated = compile(r' table:number-rows-repeated="\d+"')
+
+
+
+def _get_row_items(table, key_columns):
+    """Get the (XML, key, row) of each row but the empty ones below,
+    repeated rows sharing the same item. The key is None without key
+    columns.
+    """
+    rows = table._get_rows()
+    # Only the last rows are read to find the empty ones
+    height = sum(row.get_repeated() or 1 for row in rows)
+    for row in reversed(rows):
+        if not row.is_empty(aggressive=True):
+            break
+        height -= row.get_repeated() or 1
+    if key_columns:
+        x1, x2 = min(key_columns), max(key_columns)
+    items = []
+    y = 0
+    for row in rows:
+        if y >= height:
+            break
+        repeated = row.get_repeated() or 1
+        data = row.serialize()
+        if repeated > 1:
+            data = _repeated.sub('', data, 1)
+        key = None
+        if key_columns:
+            values = row._get_values_between(x1, x2, decoding='raw')
+            key = tuple(values[x - x1] for x in key_columns)
+        items.extend([(data, key, row)] * min(repeated, height - y))
+        y += repeated
+    return items
+
+
+
+_empty_state = ((None, None, None), None, None)
+
+
+
+def _get_cell_states(row):
+    """Get the list of (value state, style, cell) of the cells of the row
+    but the empty ones at the right. Repeated cells are read once.
+    """
+    runs = []
+    for cell in row._get_cells():
+        value = (cell.get_type(), get_value(cell, decoding='raw'),
+                cell.get_formula())
+        runs.append(((value, cell.get_style(), cell),
+            cell.get_repeated() or 1))
+    while runs and runs[-1][0][:2] == _empty_state[:2]:
+        runs.pop()
+    states = []
+    for state, repeated in runs:
+        states.extend([state] * repeated)
+    return states
+
+
+
+def _diff_rows(name, row1, y1, row2, y2):
+    """Compare two rows cell by cell.
+    """
+    changes = []
+    style1 = row1.get_style()
+    style2 = row2.get_style()
+    if style1 != style2:
+        changes.append(('change-style', name, (None, y1), (None, y2),
+            style1, style2))
+    states1 = _get_cell_states(row1)
+    states2 = _get_cell_states(row2)
+    width = max(len(states1), len(states2))
+    states1.extend([_empty_state] * (width - len(states1)))
+    states2.extend([_empty_state] * (width - len(states2)))
+    for x in xrange(width):
+        value1, style1, cell1 = states1[x]
+        value2, style2, cell2 = states2[x]
+        if value1 != value2:
+            changes.append(('change-cell', name, (x, y1), (x, y2),
+                cell1.get_value() if cell1 is not None else None,
+                cell2.get_value() if cell2 is not None else None))
+        if style1 != style2:
+            changes.append(('change-style', name, (x, y1), (x, y2),
+                style1, style2))
+    return changes
+
+
+
+def _get_row_values(row):
+    values = row.get_values()
+    while values and values[-1] is None:
+        values.pop()
+    return values
+
+
+
+def diff_tables(table1, table2, key_columns=None):
+    """Get the list of changes from the first table to the second one. See
+    the module documentation for the changes.
+
+    Rows are paired by the values of the key columns if given, else by
+    their content like ``difflib`` does for lines. Empty rows below and
+    empty cells at the right of the rows are ignored.
+
+    Arguments:
+
+        table1 -- odf_table
+
+        table2 -- odf_table
+
+        key_columns -- list of int or str
+
+    Return: list of tuples
+    """
+    name = table2.get_name()
+    if key_columns:
+        key_columns = [table1._translate_x(x) for x in key_columns]
+    items1 = _get_row_items(table1, key_columns)
+    items2 = _get_row_items(table2, key_columns)
+    changes = []
+    if key_columns:
+        positions = {}
+        for y1, (data, key, row) in enumerate(items1):
+            positions.setdefault(key, []).append(y1)
+        pairs = []
+        inserted = []
+        for y2, (data, key, row) in enumerate(items2):
+            found = positions.get(key)
+            if found:
+                pairs.append((found.pop(0), y2))
+            else:
+                inserted.append(y2)
+        deleted = sorted(y1 for found in positions.itervalues()
+                for y1 in found)
+    else:
+        xml1 = [item[0] for item in items1]
+        xml2 = [item[0] for item in items2]
+        try:
+            # Frequent rows are not junk
+            matcher = SequenceMatcher(None, xml1, xml2, autojunk=False)
+        except TypeError:
+            # Python < 2.7.1
+            matcher = SequenceMatcher(None, xml1, xml2)
+        pairs = []
+        inserted = []
+        deleted = []
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == 'equal':
+                continue
+            # Rows replaced are compared one to one
+            count = min(i2 - i1, j2 - j1)
+            pairs.extend(zip(xrange(i1, i1 + count), xrange(j1, j1 + count)))
+            deleted.extend(xrange(i1 + count, i2))
+            inserted.extend(xrange(j1 + count, j2))
+    for y1 in deleted:
+        changes.append(('delete-row', name, y1, None,
+            _get_row_values(items1[y1][2]), None))
+    for y2 in inserted:
+        changes.append(('insert-row', name, None, y2, None,
+            _get_row_values(items2[y2][2])))
+    for y1, y2 in pairs:
+        data1, key1, row1 = items1[y1]
+        data2, key2, row2 = items2[y2]
+        # Identical rows are skipped at once
+        if data1 == data2:
+            continue
+        changes.extend(_diff_rows(name, row1, y1, row2, y2))
+    return changes
+
+
+
+def diff_documents(document1, document2, key_columns=None):
+    """Get the list of changes from the first spreadsheet to the second
+    one. Tables are paired by name. See ``diff_tables``.
+
+    Arguments:
+
+        document1 -- odf_document
+
+        document2 -- odf_document
+
+        key_columns -- list of int or str
+
+    Return: list of tuples
+    """
+    tables1 = document1.get_body().get_tables()
+    tables2 = document2.get_body().get_tables()
+    names2 = set(table.get_name() for table in tables2)
+    by_name = dict((table.get_name(), table) for table in tables1)
+    changes = []
+    for table in tables1:
+        name = table.get_name()
+        if name not in names2:
+            changes.append(('delete-table', name, None, None, None, None))
+    for table in tables2:
+        name = table.get_name()
+        table1 = by_name.get(name)
+        if table1 is None:
+            changes.append(('insert-table', name, None, None, None, None))
+            continue
+        changes.extend(diff_tables(table1, table, key_columns=key_columns))
+    return changes
+
+
+
+def _format_coordinates(coordinates):
+    x, y = coordinates
+    if x is None:
+        return u"row %d" % (y + 1)
+    return u"%s%d" % (_digit_to_alpha(x), y + 1)
+
+
+
+def format_changes(changes):
+    """Render the changes as lines of text, with positions like "B4"
+    counted from 1.
+
+    Arguments:
+
+        changes -- list of tuples
+
+    Return: unicode
+    """
+    lines = []
+    for kind, name, old, new, old_value, new_value in changes:
+        if kind == 'insert-table':
+            lines.append(u"+ table %s" % name)
+        elif kind == 'delete-table':
+            lines.append(u"- table %s" % name)
+        elif kind == 'insert-row':
+            lines.append(u"+ %s row %d: %s" % (name, new + 1,
+                u", ".join(u"" if value is None else unicode(value)
+                    for value in new_value)))
+        elif kind == 'delete-row':
+            lines.append(u"- %s row %d: %s" % (name, old + 1,
+                u", ".join(u"" if value is None else unicode(value)
+                    for value in old_value)))
+        else:
+            position = _format_coordinates(new)
+            if old != new:
+                position = u"%s (was %s)" % (position,
+                        _format_coordinates(old))
+            label = u"style " if kind == 'change-style' else u""
+            lines.append(u"~ %s %s: %s%s -> %s" % (name, position, label,
+                old_value, new_value))
+    return u"\n".join(lines)
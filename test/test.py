@@ -36,6 +36,7 @@ import test_datatype
 import test_document
 import test_draw_page
 import test_element
+import test_formula
 import test_frame
 import test_heading
 import test_image
@@ -51,6 +52,7 @@ import test_span
 import test_style
 import test_styles
 import test_table
+import test_tablediff
 import test_text
 import test_tracked_changes
 import test_utils
@@ -65,6 +67,7 @@ test_modules = [test_bookmark,
                 test_document,
                 test_draw_page,
                 test_element,
+                test_formula,
                 test_frame,
                 test_heading,
                 test_image,
@@ -80,6 +83,7 @@ test_modules = [test_bookmark,
                 test_style,
                 test_styles,
                 test_table,
+                test_tablediff,
                 test_text,
                 test_tracked_changes,
                 test_utils,
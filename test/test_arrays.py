@@ -0,0 +1,159 @@
+# -*- coding: UTF-8 -*-
+#
+# Copyright (c) 2009-2010 Ars Aperta, Itaapy, Pierlis, Talend.
+#
+# This file is part of Lpod (see: http://lpod-project.org).
+# Lpod is free software; you can redistribute it and/or modify it under
+# the terms of either:
+#
+# a) the GNU General Public License as published by the Free Software
+#    Foundation, either version 3 of the License, or (at your option)
+#    any later version.
+#    Lpod is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#    You should have received a copy of the GNU General Public License
+#    along with Lpod.  If not, see <http://www.gnu.org/licenses/>.
+#
+# b) the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+
+# Import from the Standard Library
+from datetime import datetime
+from unittest import TestCase, main
+
+# Import from numpy
+from numpy import array, isnan
+
+# Import from lpod
+from lpod.arrays import odf_create_table_from_arrays
+from lpod.arrays import odf_create_table_from_dataframe
+from lpod.document import odf_get_document
+from lpod.table import odf_create_table, odf_create_row, odf_create_cell
+
+
+
+class TestToArrays(TestCase):
+
+    def setUp(self):
+        document = odf_get_document('samples/simple_table.ods')
+        body = document.get_body()
+        self.table = body.get_table(name=u"Example1")
+
+
+    def test_to_arrays(self):
+        arrays = self.table.to_arrays()
+        self.assertEqual(len(arrays), 7)
+        self.assertEqual(arrays[3].dtype.name, 'float64')
+        self.assertEqual(list(arrays[3]), [2.0, 2.0, 2.0, 4.0])
+
+
+    def test_to_arrays_range(self):
+        arrays = self.table.to_arrays('F3:G10')
+        self.assertEqual([list(column) for column in arrays],
+                [[3.0, 6.0], [3.0, 7.0]])
+
+
+    def test_to_arrays_types(self):
+        table = odf_create_table(u"Types")
+        row = odf_create_row(repeated=3)
+        row.append_cell(odf_create_cell(u"a"))
+        row.append_cell(odf_create_cell(datetime(2010, 1, 2)))
+        row.append_cell(odf_create_cell(repeated=2))
+        table.append_row(row)
+        row = odf_create_row()
+        row.append_cell(odf_create_cell(1, repeated=4))
+        table.append_row(row)
+        text, dates, floats, empty = table.to_arrays()
+        self.assertEqual(list(text), [u"a", u"a", u"a", 1])
+        self.assertEqual(dates.dtype.kind, 'O')
+        self.assertEqual(floats.dtype.name, 'float64')
+        self.assert_(isnan(floats[:3]).all())
+        self.assertEqual(floats[3], 1.0)
+        dates = table.to_arrays('B1:B3')[0]
+        self.assertEqual(dates.dtype.kind, 'M')
+        self.assertEqual(str(dates[2]), '2010-01-02T00:00:00.000000')
+
+
+    def test_to_arrays_decoding(self):
+        table = odf_create_table(u"Decoding")
+        table.set_value((0, 0), u"a")
+        table.set_value((0, 1), 1)
+        column = table.to_arrays()[0]
+        self.assertEqual(type(column[1]), int)
+        column = table.to_arrays(decoding='float')[0]
+        self.assertEqual(type(column[1]), float)
+
+
+    def test_iter_arrays_chunks(self):
+        table = odf_create_table(u"Chunks")
+        row = odf_create_row(repeated=25)
+        row.append_cell(odf_create_cell(1.5, repeated=2))
+        table.append_row(row)
+        chunks = list(table.iter_arrays(chunk_size=10))
+        self.assertEqual([len(chunk[0]) for chunk in chunks], [10, 10, 5])
+        self.assertEqual(chunks[-1][1][-1], 1.5)
+
+
+    def test_to_dataframe(self):
+        table = odf_create_table(u"Frame")
+        table.set_values([[u"name", u"value"], [u"a", 1], [u"b", 2]])
+        dataframe = table.to_dataframe()
+        self.assertEqual(list(dataframe.columns), [u"name", u"value"])
+        self.assertEqual(list(dataframe[u"value"]), [1.0, 2.0])
+
+
+
+class TestFromArrays(TestCase):
+
+    def test_from_arrays(self):
+        table = odf_create_table_from_arrays(u"Arrays",
+                [array([1.5, 1.5, float('nan')]),
+                 array([u"a", u"b", u"c"]),
+                 array([True, True, False])])
+        self.assertEqual(table.get_values(),
+                [[1.5, u"a", True],
+                 [1.5, u"b", True],
+                 [None, u"c", False]])
+
+
+    def test_from_arrays_repeated(self):
+        table = odf_create_table_from_arrays(u"Arrays",
+                [array([1, 1, 1]), array([1, 1, 1])])
+        self.assertEqual(table.serialize(),
+                '<table:table table:name="Arrays">'
+                  '<table:table-column table:number-columns-repeated="2"/>'
+                  '<table:table-row table:number-rows-repeated="3">'
+                    '<table:table-cell table:number-columns-repeated="2" '
+                      'office:value-type="float" office:value="1">'
+                      '<text:p>1</text:p>'
+                    '</table:table-cell>'
+                  '</table:table-row>'
+                '</table:table>')
+
+
+    def test_from_arrays_dates(self):
+        table = odf_create_table_from_arrays(u"Dates",
+                [array(['1975-05-07', 'NaT'], dtype='datetime64[D]')])
+        self.assertEqual(table.get_values(),
+                [[datetime(1975, 5, 7)], [None]])
+
+
+    def test_from_dataframe(self):
+        from pandas import DataFrame
+
+        dataframe = DataFrame({'a': [1.0, 2.0], 'b': [u"x", u"y"]},
+                columns=['a', 'b'])
+        table = odf_create_table_from_dataframe(u"Frame", dataframe)
+        self.assertEqual(table.get_values(),
+                [[u"a", u"b"], [1, u"x"], [2, u"y"]])
+        self.assertEqual(list(table.to_dataframe()[u"b"]), [u"x", u"y"])
+
+
+
+if __name__ == '__main__':
+    main()
@@ -47,6 +47,15 @@ class DateTimeTestCase(TestCase):
         self.assertEqual(DateTime.decode(date), expected)
 
 
+    def test_decode_micro(self):
+        date = '2009-06-29T14:33:21.123456Z'
+        expected = datetime(2009, 6, 29, 14, 33, 21, 123456)
+        self.assertEqual(DateTime.decode(date), expected)
+        # Memoized
+        self.assert_(DateTime.decode(date) is DateTime.decode(date))
+        self.assertRaises(ValueError, DateTime.decode, '2009-06-29')
+
+
 
 class DurationTestCase(TestCase):
 
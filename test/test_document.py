@@ -30,6 +30,8 @@
 # Import from the Standard Library
 from cStringIO import StringIO
 from ftplib import FTP
+from os import remove
+from sqlite3 import connect
 from unittest import TestCase, main
 from urllib2 import urlopen
 
@@ -38,8 +40,11 @@ from lpod.const import ODF_EXTENSIONS, ODF_CONTENT, ODF_MANIFEST, ODF_META
 from lpod.const import ODF_STYLES
 from lpod.content import odf_content
 from lpod.document import odf_new_document, odf_get_document
+from lpod.element import odf_create_element
 from lpod.manifest import odf_manifest
 from lpod.meta import odf_meta
+from lpod.paragraph import odf_create_paragraph
+from lpod.style import odf_create_style
 from lpod.styles import odf_styles
 
 
@@ -206,6 +211,124 @@ class DocumentTestCase(TestCase):
         self.assertEqual(generator, u"toto")
 
 
+    def test_to_sqlite(self):
+        document = odf_get_document('samples/simple_table.ods')
+        document.to_sqlite('trash.db')
+        try:
+            connection = connect('trash.db')
+            names = [name for name, in connection.execute(
+                'SELECT name FROM sqlite_master ORDER BY name')]
+            tables = document.get_body().get_tables()
+            self.assertEqual(names, sorted(table.get_name()
+                for table in tables))
+            rows = connection.execute('SELECT * FROM "%s"'
+                    % tables[0].get_name()).fetchall()
+            self.assertEqual(rows[0][0], 1)
+            connection.close()
+        finally:
+            remove('trash.db')
+
+
+    def test_add_file_same_bytes(self):
+        document = self.document.clone()
+        path1 = document.add_file('samples/image.png')
+        path2 = document.add_file('samples/image.png')
+        self.assertEqual(path2, path1)
+        paths = document.get_part(ODF_MANIFEST).get_paths()
+        self.assertEqual(paths.count(path1), 1)
+        # Other bytes under a name taken
+        data = open('samples/image2.jpg', 'rb').read()
+        path3 = document.add_media(path1, data, 'image/jpeg')
+        self.assertNotEqual(path3, path1)
+        self.assertEqual(document.get_part(path3), data)
+
+
+    def test_dedupe_media(self):
+        document = self.document.clone()
+        path = document.add_file('samples/image.png')
+        data = document.get_part(path)
+        document.set_part('Pictures/copy.png', data)
+        manifest = document.get_part(ODF_MANIFEST)
+        manifest.add_full_path('Pictures/copy.png', 'image/png')
+        body = document.get_body()
+        body.append(odf_create_element('<draw:frame><draw:image '
+            'xlink:href="Pictures/copy.png"/></draw:frame>'))
+        self.assertEqual(document.dedupe_media(), 1)
+        image = body.get_element('//draw:image')
+        self.assertEqual(image.get_attribute('xlink:href'), path)
+        self.assert_(manifest.get_media_type('Pictures/copy.png') is None)
+        self.assertEqual(document.dedupe_media(), 0)
+
+
+    def test_get_style_usage(self):
+        usage = self.document.get_style_usage()
+        self.assertEqual(len(usage[u'Standard']), 4)
+        self.assertEqual(len(usage[u'Text_20_body']), 10)
+        # Parent styles and page layouts are references too
+        tags = [element.get_tag() for element in usage[u'Standard']]
+        self.assert_(u'style:style' in tags)
+        self.assert_(u'Mpm1' in usage)
+        styled = self.document.get_styled_elements(u'Standard')
+        self.assertEqual(len(styled), 4)
+
+
+    def test_delete_styles(self):
+        document = self.document.clone()
+        self.assert_(document.delete_styles() > 0)
+        self.assertEqual(document.get_style_usage(), {})
+        self.assertEqual(document.get_styled_elements(), [])
+
+
+    def test_rename_styles(self):
+        document = self.document.clone()
+        used = len(document.get_styled_elements(u'Text_20_body'))
+        count = len(document.get_style_list())
+        mapping = {('paragraph', u'Text_20_body'): u'Body',
+                   ('paragraph', u'Heading_20_1'): u'Heading',
+                   ('paragraph', u'P1'): u'Paragraph'}
+        self.assertEqual(document.rename_styles(mapping), 3)
+        self.assertEqual(document.get_styled_elements(u'Text_20_body'), [])
+        # "Heading_20_1" was deleted with its next style
+        self.assertEqual(len(document.get_styled_elements(u'Body')),
+                used - 1)
+        style = document.get_style('paragraph', u'Body')
+        self.assertEqual(style.get_display_name(), u"Body")
+        self.assertEqual(document.get_style('paragraph',
+            display_name=u"Text body"), None)
+        self.assertEqual(document.get_style('paragraph', u'Text_20_body'),
+                None)
+        # "Heading" already exists
+        self.assertEqual(len(document.get_style_list()), count - 1)
+        self.assertEqual(document.get_style('paragraph', u'Heading_20_1'),
+                None)
+
+
+    def test_prune_styles(self):
+        document = self.document.clone()
+        # Used through the parent of a used style
+        parent = odf_create_style('paragraph', u'Parent', area='text',
+                color='#ff0000')
+        document.insert_style(parent, automatic=True)
+        child = odf_create_style('paragraph', u'Child', parent=u'Parent')
+        document.insert_style(child, automatic=True)
+        body = document.get_body()
+        body.append(odf_create_paragraph(u'Text', style=u'Child'))
+        unused = odf_create_style('paragraph', u'Unused')
+        document.insert_style(unused, automatic=True)
+        self.assertEqual(document.prune_styles(), 1)
+        self.assertEqual(document.get_style('paragraph', u'Unused'), None)
+        self.assertNotEqual(document.get_style('paragraph', u'Parent'), None)
+        self.assertNotEqual(document.get_style('paragraph', u'Child'), None)
+        # Common styles
+        self.assertNotEqual(document.get_style('paragraph', u'Caption'),
+                None)
+        self.assertEqual(document.prune_styles(common=True), 3)
+        self.assertEqual(document.get_style('paragraph', u'Caption'), None)
+        self.assertNotEqual(document.get_style('paragraph', u'Standard'),
+                None)
+
+
+
 
 class TestStyle(TestCase):
 
@@ -261,6 +384,91 @@ class TestStyle(TestCase):
         self.assertNotEqual(style, None)
 
 
+    def test_rename_styles_families(self):
+        document = self.document.clone()
+        # A text style of the same name as a paragraph style
+        text = odf_create_style('text', u'Standard')
+        document.insert_style(text)
+        span = odf_create_element('<text:span text:style-name="Standard"/>')
+        document.get_body().get_paragraph().append(span)
+        used = len(document.get_styled_elements(u'Standard'))
+        mapping = {('text', u'Standard'): u'Emphasis_20_2'}
+        self.assertEqual(document.rename_styles(mapping), 1)
+        self.assertEqual(span.get_attribute('text:style-name'),
+                u'Emphasis_20_2')
+        self.assertEqual(len(document.get_styled_elements(u'Standard')),
+                used - 1)
+        self.assertEqual(document.get_style('text', u'Emphasis_20_2')
+                .get_display_name(), None)
+        text.set_display_name(u"Emphasis")
+        document.rename_styles({('text', u'Emphasis_20_2'): u'Emphasis_20_3'})
+        self.assertEqual(document.get_style('text',
+            display_name=u"Emphasis 3").get_name(), u'Emphasis_20_3')
+
+
+    def test_rename_styles_font_face(self):
+        document = self.document.clone()
+        font = document.get_style_list(family='font-face')[0]
+        old_name = font.get_name()
+        used = len(document.get_styled_elements(old_name))
+        self.assert_(used > 0)
+        document.rename_styles({('font-face', old_name): u'Renamed'})
+        self.assertEqual(document.get_styled_elements(old_name), [])
+        self.assertEqual(len(document.get_styled_elements(u'Renamed')),
+                used)
+
+
+    def test_merge_styles_from_replace(self):
+        document = odf_get_document('samples/example.odt')
+        count = len(document.get_style_list())
+        source = self.document.clone()
+        standard = source.get_style('paragraph', u'Standard')
+        standard.set_properties(area='text', color='#ff0000')
+        self.assertEqual(document.merge_styles_from(source), {})
+        self.assert_(len(document.get_style_list()) > count)
+        standard = document.get_style('paragraph', u'Standard')
+        self.assertEqual(standard.get_properties(area='text')['fo:color'],
+                '#ff0000')
+        self.assertEqual(len([style for style
+            in document.get_style_list(family='paragraph')
+            if style.get_name() == u'Standard']), 1)
+
+
+    def test_merge_styles_from_keep(self):
+        document = odf_get_document('samples/example.odt')
+        source = self.document.clone()
+        standard = source.get_style('paragraph', u'Standard')
+        standard.set_properties(area='text', color='#ff0000')
+        document.merge_styles_from(source, conflict='keep')
+        standard = document.get_style('paragraph', u'Standard')
+        properties = standard.get_properties(area='text') or {}
+        self.assertNotEqual(properties.get('fo:color'), '#ff0000')
+
+
+    def test_merge_styles_from_rename(self):
+        document = odf_get_document('samples/example.odt')
+        source = self.document.clone()
+        used = len(source.get_styled_elements(u'Standard'))
+        count = len(source.get_style_list())
+        renamed = document.merge_styles_from(source, conflict='rename')
+        self.assertEqual(renamed[('paragraph', u'Standard')], u'Standard_1')
+        self.assertNotEqual(document.get_style('paragraph', u'Standard'),
+                None)
+        style = document.get_style('paragraph', u'Standard_1')
+        self.assertNotEqual(style, None)
+        # The source is left untouched
+        self.assertEqual(len(source.get_styled_elements(u'Standard')), used)
+        self.assertEqual(len(source.get_style_list()), count)
+        self.assertEqual(source.get_style('paragraph', u'Standard_1'), None)
+        # References between the copied styles are renamed
+        children = [style for style in document.get_style_list()
+                if style.get_parent_style() == u'Standard_1']
+        self.assertNotEqual(children, [])
+        # The mapping renames the source content before copying it
+        source.rename_styles(renamed)
+        self.assertEqual(source.get_styled_elements(u'Standard'), [])
+
+
     def test_show_styles(self):
         # XXX hard to unit test
         document = self.document
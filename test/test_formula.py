@@ -0,0 +1,203 @@
+# -*- coding: UTF-8 -*-
+#
+# Copyright (c) 2009-2010 Ars Aperta, Itaapy, Pierlis, Talend.
+#
+# This file is part of Lpod (see: http://lpod-project.org).
+# Lpod is free software; you can redistribute it and/or modify it under
+# the terms of either:
+#
+# a) the GNU General Public License as published by the Free Software
+#    Foundation, either version 3 of the License, or (at your option)
+#    any later version.
+#    Lpod is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#    You should have received a copy of the GNU General Public License
+#    along with Lpod.  If not, see <http://www.gnu.org/licenses/>.
+#
+# b) the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+
+
+# Import from the Standard Library
+from decimal import Decimal as dec
+from unittest import TestCase, main
+
+# Import from lpod
+from lpod.document import odf_new_document
+from lpod.formula import odf_formula_engine, parse_formula, FormulaError
+from lpod.table import odf_create_table, odf_create_row, odf_create_cell
+
+
+
+def make_document():
+    document = odf_new_document('spreadsheet')
+    body = document.get_body()
+    body.clear()
+    sheet1 = odf_create_table(u"Sheet1")
+    sheet1.set_values([[1, 2, None],
+                       [3, 4, None],
+                       [u"a", 5, None]])
+    sheet1.set_cell('C1', odf_create_cell(formula=u"of:=[.A1]+[.B1]"))
+    sheet1.set_cell('C2', odf_create_cell(formula=u"of:=SUM([.A1:.B3])"))
+    sheet1.set_cell('C3', odf_create_cell(formula=u"of:=[.C2]*2"))
+    body.append(sheet1)
+    sheet2 = odf_create_table(u"Other sheet")
+    sheet2.set_values([[u"x", 10], [u"y", 20], [u"z", 30]])
+    sheet2.set_cell('C1', odf_create_cell(
+        formula=u"oooc:=[$Sheet1.C1]&\"-\"&VLOOKUP(\"y\";[.A1:.B3];2;0)"))
+    body.append(sheet2)
+    return document
+
+
+
+class TestParse(TestCase):
+
+    def test_arithmetic(self):
+        self.assertEqual(parse_formula(u"of:=1+2*-3%", u"S"),
+                ('binary', '+', ('value', dec(1)),
+                    ('binary', '*', ('value', dec(2)),
+                        ('negate', ('percent', ('value', dec(3)))))))
+
+
+    def test_references(self):
+        self.assertEqual(parse_formula(u"of:=SUM([.A1:.$B$3];['My ''S'''.C4])",
+            u"S"), ('call', 'SUM', [('range', u"S", 0, 0, 1, 2),
+                ('ref', u"My 'S'", 2, 3)]))
+
+
+    def test_syntax_error(self):
+        self.assertRaises(FormulaError, parse_formula, u"of:=(1+2", u"S")
+        self.assertRaises(FormulaError, parse_formula, u"of:=1 $ 2", u"S")
+
+
+
+class TestEngine(TestCase):
+
+    def setUp(self):
+        self.document = make_document()
+        self.engine = odf_formula_engine(self.document)
+
+
+    def get_table(self, name):
+        return self.document.get_body().get_table(name=name)
+
+
+    def test_recalculate(self):
+        engine = self.engine
+        engine.recalculate()
+        self.assertEqual(engine.get_value(u"Sheet1", 'C1'), 3)
+        self.assertEqual(engine.get_value(u"Sheet1", 'C2'), 15)
+        self.assertEqual(engine.get_value(u"Sheet1", 'C3'), 30)
+        self.assertEqual(engine.get_value(u"Other sheet", 'C1'), u"3-20")
+        # Cached in the cells
+        cell = self.get_table(u"Sheet1").get_cell('C3')
+        self.assertEqual(cell.get_value(), 30)
+        self.assertEqual(cell.get_formula(), u"of:=[.C2]*2")
+
+
+    def test_set_value(self):
+        engine = self.engine
+        engine.recalculate()
+        updated = engine.set_value(u"Sheet1", 'B2', 14)
+        # Only the formulas depending on B2
+        self.assertEqual(updated, [(u"Sheet1", 2, 1), (u"Sheet1", 2, 2)])
+        self.assertEqual(self.get_table(u"Sheet1").get_value('C3'), 50)
+        updated = engine.set_value(u"Sheet1", 'A1', 5)
+        self.assertEqual(sorted(updated), [(u"Other sheet", 2, 0),
+            (u"Sheet1", 2, 0), (u"Sheet1", 2, 1), (u"Sheet1", 2, 2)])
+        self.assertEqual(self.get_table(u"Other sheet").get_value('C1'),
+                u"7-20")
+
+
+    def test_set_value_over_formula(self):
+        engine = self.engine
+        engine.set_value(u"Sheet1", 'C2', 1)
+        self.assertEqual(engine.get_formula(u"Sheet1", 'C2'), None)
+        self.assertEqual(self.get_table(u"Sheet1").get_cell('C2')
+                .get_formula(), None)
+        self.assertEqual(engine.get_value(u"Sheet1", 'C3'), 2)
+
+
+    def test_set_formula(self):
+        engine = self.engine
+        engine.recalculate()
+        engine.set_formula(u"Sheet1", 'D1',
+                u'of:=IF([.C3]>10;AVERAGE([.A1:.B2]);"small")')
+        self.assertEqual(engine.get_value(u"Sheet1", 'D1'), dec('2.5'))
+        engine.set_value(u"Sheet1", 'A1', -100)
+        self.assertEqual(engine.get_value(u"Sheet1", 'D1'), u"small")
+
+
+    def test_errors(self):
+        engine = self.engine
+        engine.set_formula(u"Sheet1", 'D1', u"of:=1/([.B1]-2)")
+        self.assertEqual(engine.get_value(u"Sheet1", 'D1'),
+                FormulaError(u"#DIV/0!"))
+        engine.set_formula(u"Sheet1", 'D2', u"of:=[.D1]+1")
+        self.assertEqual(engine.get_value(u"Sheet1", 'D2'),
+                FormulaError(u"#DIV/0!"))
+        self.assertEqual(self.get_table(u"Sheet1").get_value('D2'),
+                u"#DIV/0!")
+        engine.set_formula(u"Sheet1", 'D3', u"of:=VLOOKUP(9;[.A1:.B3];2;0)")
+        self.assertEqual(engine.get_value(u"Sheet1", 'D3'),
+                FormulaError(u"#N/A"))
+        engine.set_formula(u"Sheet1", 'D4', u"of:=NOPE(1)")
+        self.assertEqual(engine.get_value(u"Sheet1", 'D4'),
+                FormulaError(u"#NAME?"))
+
+
+    def test_round(self):
+        engine = self.engine
+        engine.set_formula(u"Sheet1", 'D1', u"of:=ROUND(1234;-2)")
+        engine.set_formula(u"Sheet1", 'D2', u"of:=ROUND(2.5)")
+        engine.set_formula(u"Sheet1", 'D3', u"of:=ROUND(1/3;2)")
+        self.assertEqual(engine.get_value(u"Sheet1", 'D1'), 1200)
+        cell = self.get_table(u"Sheet1").get_cell('D1')
+        self.assertEqual(cell.get_attribute('office:value'), u"1200")
+        self.assertEqual(cell.get_text_content(), u"1200")
+        cell = self.get_table(u"Sheet1").get_cell('D2')
+        self.assertEqual(cell.get_attribute('office:value'), u"3")
+        cell = self.get_table(u"Sheet1").get_cell('D3')
+        self.assertEqual(cell.get_attribute('office:value'), u"0.33")
+        self.assertEqual(cell.get_text_content(), u"0.33")
+
+
+    def test_circular(self):
+        engine = self.engine
+        engine.set_formula(u"Sheet1", 'A1', u"of:=[.C1]+1")
+        self.assertEqual(engine.get_value(u"Sheet1", 'A1'),
+                FormulaError(u"Err:522"))
+        self.assertEqual(engine.get_value(u"Sheet1", 'C1'),
+                FormulaError(u"Err:522"))
+        engine.set_value(u"Sheet1", 'A1', 1)
+        self.assertEqual(engine.get_value(u"Sheet1", 'C1'), 3)
+
+
+    def test_chain(self):
+        document = odf_new_document('spreadsheet')
+        body = document.get_body()
+        body.clear()
+        table = odf_create_table(u"Chain")
+        table.set_value('A1', 1)
+        for y in xrange(2, 2001):
+            row = odf_create_row()
+            row.append_cell(odf_create_cell(
+                formula=u"of:=[.A%d]+1" % (y - 1)))
+            table.append_row(row)
+        body.append(table)
+        engine = odf_formula_engine(document)
+        engine.recalculate()
+        self.assertEqual(engine.get_value(u"Chain", 'A2000'), 2000)
+        updated = engine.set_value(u"Chain", 'A1999', 0)
+        self.assertEqual(updated, [(u"Chain", 0, 1999)])
+        self.assertEqual(engine.get_value(u"Chain", 'A2000'), 1)
+
+
+
+if __name__ == '__main__':
+    main()
@@ -103,6 +103,25 @@ class ManifestTestCase(TestCase):
         self.assertEqual(manifest.get_media_type(path), 'image/jpeg')
 
 
+    def test_add_full_path_no_duplicate(self):
+        manifest = self.manifest.clone()
+        path = self.image_path
+        manifest.add_full_path(path, 'image/jpeg')
+        self.assertEqual(len(manifest.get_paths()), 20)
+        self.assertEqual(manifest.serialize().count(path), 1)
+
+
+    def test_add_full_path_quote(self):
+        manifest = self.manifest.clone()
+        path = u'Pictures/"quoted" & \'single\'.png'
+        manifest.add_full_path(path, 'image/png')
+        self.assertEqual(manifest.get_media_type(path), 'image/png')
+        self.assertEqual(manifest.get_paths()[-1], path)
+        manifest.del_full_path(path)
+        self.assert_(manifest.get_media_type(path) is None)
+        self.assertEqual(len(manifest.get_paths()), 20)
+
+
     def test_del_full_path(self):
         manifest = self.manifest.clone()
         path = self.image_path
@@ -30,8 +30,9 @@
 from unittest import TestCase, main
 
 # Import from lpod
-from lpod.const import ODF_STYLES
+from lpod.const import ODF_CONTENT, ODF_STYLES
 from lpod.document import odf_get_document
+from lpod.paragraph import odf_create_paragraph
 from lpod.style import odf_create_style
 from lpod.styles import hex2rgb, rgb2hex
 
@@ -216,6 +217,52 @@ class TestInsertStyleCase(TestCase):
         self.assertNotEqual(style.get_name(), None)
 
 
+    def test_insert_automatic_style_names(self):
+        doc = self.doc
+
+        names = []
+        for i in range(3):
+            style = odf_create_style('text')
+            names.append(doc.insert_style(style, automatic=True))
+        self.assertEqual(names, [u'lpod_auto_1', u'lpod_auto_2',
+                                 u'lpod_auto_3'])
+        # A name given by hand is skipped
+        style = odf_create_style('text', u'lpod_auto_4')
+        doc.insert_style(style, automatic=True)
+        style = odf_create_style('text')
+        self.assertEqual(doc.insert_style(style, automatic=True),
+                         u'lpod_auto_5')
+
+
+    def test_insert_automatic_style_names_by_hand(self):
+        doc = self.doc
+
+        style = odf_create_style('text')
+        self.assertEqual(doc.insert_style(style, automatic=True),
+                         u'lpod_auto_1')
+        content = doc.get_part(ODF_CONTENT)
+        context = content.get_element('office:automatic-styles')
+        context.insert(odf_create_style('text', u'lpod_auto_2'), position=0)
+        # Inserted through the element API
+        content._styles_changed()
+        style = odf_create_style('text')
+        self.assertEqual(doc.insert_style(style, automatic=True),
+                         u'lpod_auto_3')
+
+
+    def test_get_style_font_renamed(self):
+        doc = self.doc
+
+        font = odf_create_style('font-face', font_name=u'MyFont')
+        doc.insert_style(font)
+        self.assertEqual(doc.get_style('font-face', u'MyFont').get_name(),
+                u'MyFont')
+        font.set_font(u'MyFont2')
+        self.assertEqual(doc.get_style('font-face', u'MyFont'), None)
+        self.assertEqual(doc.get_style('font-face', u'MyFont2').get_name(),
+                u'MyFont2')
+
+
     def test_insert_with_error(self):
         doc = self.doc
 
@@ -234,6 +281,145 @@ class TestInsertStyleCase(TestCase):
         self.assertEqual(style.serialize(), inserted_style.serialize())
 
 
+    def test_insert_style_replace(self):
+        doc = self.doc
+
+        count = len(doc.get_style_list(family='paragraph'))
+        style = odf_create_style('paragraph', u'Standard', area='text',
+                                 color='#ff0000')
+        doc.insert_style(style)
+        inserted_style = doc.get_style('paragraph', u'Standard')
+        self.assertEqual(inserted_style.serialize(), style.serialize())
+        self.assertEqual(len(doc.get_style_list(family='paragraph')), count)
+
+
+    def test_get_style_renamed(self):
+        doc = self.doc
+
+        style = doc.get_style('paragraph', u'Standard')
+        style.set_name(u'Standard2')
+        self.assertEqual(doc.get_style('paragraph', u'Standard'), None)
+        renamed = doc.get_style('paragraph', u'Standard2')
+        self.assertEqual(renamed.get_name(), u'Standard2')
+
+
+    def test_get_style_deleted(self):
+        doc = self.doc
+
+        style = doc.get_style('paragraph', display_name=u"Text body")
+        style.delete()
+        self.assertEqual(doc.get_style('paragraph',
+            display_name=u"Text body"), None)
+        self.assertEqual(doc.get_style('paragraph', u'Text_20_body'), None)
+
+
+    def test_get_style_changed_by_hand(self):
+        doc = self.doc
+
+        # Build the index first
+        self.assertNotEqual(doc.get_style('paragraph', u'Standard'), None)
+        part = doc.get_part(ODF_STYLES)
+        styles = part.get_element('office:styles')
+        first = odf_create_style('paragraph', u'First')
+        styles.insert(first, position=0)
+        # Inserted through the element API
+        part._styles_changed()
+        self.assertEqual(doc.get_style('paragraph', u'First').get_name(),
+                u'First')
+        style = doc.get_style('paragraph', u'Standard')
+        style.set_attribute('style:name', u'Standard2')
+        self.assertEqual(doc.get_style('paragraph', u'Standard'), None)
+        self.assertEqual(doc.get_style('paragraph', u'Standard2')
+                .get_name(), u'Standard2')
+        style.set_attribute('style:display-name', u'Renamed')
+        part._styles_changed()
+        self.assertEqual(doc.get_style('paragraph', display_name=u'Renamed')
+                .get_name(), u'Standard2')
+
+
+    def test_insert_automatic_style_dedupe(self):
+        doc = self.doc
+
+        style1 = odf_create_style('text', area='text', color='#ff0000')
+        name1 = doc.insert_style(style1, automatic=True, dedupe=True)
+        style2 = odf_create_style('text', area='text', color='#ff0000')
+        name2 = doc.insert_style(style2, automatic=True, dedupe=True)
+        self.assertEqual(name2, name1)
+        self.assertEqual(style2.get_name(), name1)
+        style3 = odf_create_style('text', area='text', color='#0000ff')
+        name3 = doc.insert_style(style3, automatic=True, dedupe=True)
+        self.assertNotEqual(name3, name1)
+        styles = doc.get_style_list(family='text', automatic=True)
+        names = [style.get_name() for style in styles]
+        self.assertEqual(names.count(name1), 1)
+
+
+    def test_get_effective_properties(self):
+        doc = self.doc
+
+        base = odf_create_style('paragraph', u'Base', area='text',
+                color='#ff0000', size='12pt')
+        doc.insert_style(base)
+        derived = odf_create_style('paragraph', u'Derived', parent=u'Base',
+                area='text', size='14pt')
+        doc.insert_style(derived, automatic=True)
+        properties = doc.get_effective_properties('paragraph', u'Derived',
+                area='text')
+        self.assertEqual(properties['fo:color'], '#ff0000')
+        self.assertEqual(properties['fo:font-size'], '14pt')
+        # From the default style
+        default = doc.get_effective_properties('paragraph', area='text')
+        for name, value in default.iteritems():
+            if name not in ('fo:color', 'fo:font-size'):
+                self.assertEqual(properties[name], value)
+        # Changing a parent in place needs the cache reset
+        base.set_properties(area='text', color='#0000ff')
+        properties = doc.get_effective_properties('paragraph', u'Derived',
+                area='text')
+        self.assertEqual(properties['fo:color'], '#ff0000')
+        styles = doc.get_part(ODF_STYLES)
+        content = doc.get_part(ODF_CONTENT)
+        styles._styles_changed()
+        properties = doc.get_effective_properties('paragraph', u'Derived',
+                area='text')
+        self.assertEqual(properties['fo:color'], '#0000ff')
+        # Through the element API too
+        text_properties = derived.get_element('style:text-properties')
+        text_properties.set_attribute('fo:font-size', '16pt')
+        content._styles_changed()
+        properties = doc.get_effective_properties('paragraph', u'Derived',
+                area='text')
+        self.assertEqual(properties['fo:font-size'], '16pt')
+        derived.set_attribute('style:parent-style-name', None)
+        content._styles_changed()
+        properties = doc.get_effective_properties('paragraph', u'Derived',
+                area='text')
+        self.assertEqual(properties.get('fo:color'), default.get('fo:color'))
+        derived.set_parent_style(u'Base')
+        base.delete()
+        styles._styles_changed()
+        properties = doc.get_effective_properties('paragraph', u'Derived',
+                area='text')
+        self.assertEqual(properties.get('fo:color'), default.get('fo:color'))
+
+
+    def test_dedupe_styles(self):
+        doc = self.doc
+
+        body = doc.get_body()
+        names = []
+        for i in range(3):
+            style = odf_create_style('paragraph', u'Dup%d' % i,
+                    parent=u'Standard', area='text', color='#ff0000')
+            doc.insert_style(style, automatic=True)
+            body.append(odf_create_paragraph(u'Text', style=u'Dup%d' % i))
+        self.assertEqual(doc.dedupe_styles(), 2)
+        self.assertEqual(doc.get_style('paragraph', u'Dup1'), None)
+        self.assertNotEqual(doc.get_style('paragraph', u'Dup0'), None)
+        self.assertEqual(len(doc.get_styled_elements(u'Dup0')), 3)
+        self.assertEqual(doc.dedupe_styles(), 0)
+
+
 
 if __name__ == '__main__':
     main()
@@ -30,14 +30,23 @@
 from datetime import date, datetime, timedelta
 from decimal import Decimal as dec
 from cStringIO import StringIO
+from os import mkdir
+from re import compile, IGNORECASE, VERBOSE
+from shutil import rmtree
+from sqlite3 import connect
 from unittest import TestCase, main
 
 # Import from lpod
 from lpod.document import odf_get_document
+from lpod.element import odf_create_element
 from lpod.table import _alpha_to_digit, _digit_to_alpha
-from lpod.table import _get_cell_coordinates, odf_cell, odf_row
+from lpod.table import _get_cell_coordinates, _get_cell_range
+from lpod.table import _get_pattern_trigrams
+from lpod.table import odf_cell, odf_row
 from lpod.table import odf_create_cell, odf_create_row, odf_create_column
 from lpod.table import odf_create_table, import_from_csv, odf_column
+from lpod.table import export_to_csv, import_from_cursor
+from lpod.table import odf_create_header_rows, odf_create_row_group
 
 
 csv_data = '"A float","3.14"\n"A date","1975-05-07"\n'
@@ -79,6 +88,37 @@ class TestCoordinates(TestCase):
 
 
 
+    def test_get_cell_range_alphanum(self):
+        self.assertEqual(_get_cell_range('B2:D5'), (1, 1, 3, 4))
+        self.assertEqual(_get_cell_range('D5:B2'), (1, 1, 3, 4))
+        self.assertEqual(_get_cell_range('C3'), (2, 2, 2, 2))
+
+
+    def test_get_cell_range_tuple(self):
+        self.assertEqual(_get_cell_range((1, 1, 3, 4)), (1, 1, 3, 4))
+        self.assertEqual(_get_cell_range(((1, 1), (3, 4))), (1, 1, 3, 4))
+        self.assertRaises(ValueError, _get_cell_range, (1, 2, 3))
+
+
+
+class TestTrigrams(TestCase):
+
+    def test_literal(self):
+        self.assertEqual(_get_pattern_trigrams(u'abcd'),
+                set([u'abc', u'bcd']))
+
+
+    def test_parts(self):
+        self.assertEqual(_get_pattern_trigrams(u'^ab.cdef+\\d'),
+                set([u'cde']))
+
+
+    def test_no_hint(self):
+        self.assertEqual(_get_pattern_trigrams(u'abc|def'), set())
+        self.assertEqual(_get_pattern_trigrams(u'(?i)abcd'), set())
+
+
+
 class TestCreateCell(TestCase):
 
     def test_bool(self):
@@ -509,6 +549,19 @@ class TestCell(TestCase):
         self.assertEqual(cell.get_style(), None)
 
 
+    def test_is_empty(self):
+        cell = odf_create_cell()
+        self.assertEqual(cell.is_empty(), True)
+        cell.set_style(u"ce1")
+        self.assertEqual(cell.is_empty(), False)
+        self.assertEqual(cell.is_empty(aggressive=True), True)
+
+
+    def test_is_empty_no(self):
+        self.assertEqual(self.cell.is_empty(), False)
+        self.assertEqual(odf_create_cell(u"").is_empty(), False)
+
+
 
 class TestRow(TestCase):
 
@@ -554,6 +607,29 @@ class TestRow(TestCase):
                 [None, None, 1, 1, None])
 
 
+    def test_set_cell_values(self):
+        row = self.row.clone()
+        row.set_values([u"a", u"a", 2], style=u"ce2")
+        self.assertEqual(row.get_values(), [u"a", u"a", 2, 1, None])
+        cells = row.get_elements('table:table-cell')
+        self.assertEqual([cell.get_repeated() for cell in cells],
+                [2, None, None, None])
+        self.assertEqual([cell.get_style() for cell in cells],
+                [u"ce2", u"ce2", None, u"ce1"])
+        row.set_values([None, 3, 4, 5, 6, 7])
+        self.assertEqual(row.get_values(), [None, 3, 4, 5, 6, 7])
+
+
+    def test_set_values_from_inside(self):
+        row = odf_create_row()
+        row.append(odf_create_cell(1, repeated=6))
+        row._set_values_from(2, [u"a", u"b"])
+        self.assertEqual(row.get_values(), [1, 1, u"a", u"b", 1, 1])
+        cells = row.get_elements('table:table-cell')
+        self.assertEqual([cell.get_repeated() for cell in cells],
+                [2, None, None, 2])
+
+
     def test_is_empty(self):
         row = odf_create_row(width=100)
         self.assertEqual(row.is_empty(), True)
@@ -837,6 +913,27 @@ class TestTable(TestCase):
                  [1, 2, 3, 4, 5, 6, 7]])
 
 
+    def test_get_values_decoding(self):
+        table = odf_create_table(u"Decoding")
+        table.set_values([[1, dec('2.5'), True, datetime(2010, 1, 2),
+            u"a"]])
+        self.assertEqual(table.get_values(decoding='float'),
+                [[1.0, 2.5, True, datetime(2010, 1, 2), u"a"]])
+        self.assertEqual(type(table.get_value('A1', decoding='float')),
+                float)
+        self.assertEqual(table.get_values(decoding='raw'),
+                [[u"1", u"2.5", u"true", u"2010-01-02T00:00:00", u"a"]])
+        self.assertEqual(table.get_column_values(1, decoding='float'),
+                [2.5])
+        self.assertEqual(table.get_sparse_values(decoding='raw')[0],
+                (0, 0, u"1"))
+        self.assertRaises(ValueError, table.get_values, decoding='double')
+
+
+    def test_get_column_values_repeated(self):
+        self.assertEqual(self.table.get_column_values('D'), [2, 2, 2, 4])
+
+
     def  test_set_table_values(self):
         table = self.table.clone()
         values = [[u"a", u"b", u"c", u"d", u"e", u"f", u"g"],
@@ -854,6 +951,297 @@ class TestTable(TestCase):
         self.assertEqual(table.get_size(), (5, 9))
 
 
+    def test_get_values_range(self):
+        self.assertEqual(self.table.get_values('C2:E4'),
+                [[1, 2, 3],
+                 [1, 2, 3],
+                 [3, 4, 5]])
+        self.assertEqual(self.table.get_values((2, 1, 4, 3)),
+                self.table.get_values('C2:E4'))
+
+
+    def test_iter_values_range_outside(self):
+        # Padded to the width of the range, stopped at the table height
+        self.assertEqual(list(self.table.iter_values('F3:I10')),
+                [[3, 3, None, None],
+                 [6, 7, None, None]])
+
+
+    def test_set_values_range(self):
+        table = self.table.clone()
+        table.set_values([[u"a", u"b", u"c"], [u"d", u"e", u"f"]], 'B2:C3')
+        self.assertEqual(table.get_values(),
+                [[1, 1, 1, 2, 3, 3, 3],
+                 [1, u"a", u"b", 2, 3, 3, 3],
+                 [1, u"d", u"e", 2, 3, 3, 3],
+                 [1, 2, 3, 4, 5, 6, 7]])
+
+
+    def test_set_values_range_outside(self):
+        table = self.table.clone()
+        table.set_values([[u"a"], [u"b"]], 'H5')
+        self.assertEqual(table.get_size(), (8, 5))
+        self.assertEqual(table.get_values('G4:H6'),
+                [[7, None],
+                 [None, u"a"]])
+
+
+    def test_split_rows_at(self):
+        table = odf_create_table(u"Split")
+        table.append_row(odf_create_row(width=2, repeated=10))
+        ys = [y for y, row in table._split_rows_at([7, 2, 3, 20])]
+        self.assertEqual(ys, [2, 3, 7])
+        rows = table.get_elements('table:table-row')
+        self.assertEqual([row.get_repeated() for row in rows],
+                [2, None, None, 3, None, 2])
+        self.assertEqual(table.get_size(), (2, 10))
+
+
+    def test_sort_rows(self):
+        table = odf_create_table(u"Sort")
+        for values in [[u"b", 2], [None, 1], [3, 1], [u"A", 1], [u"a", 0]]:
+            row = odf_create_row()
+            row.set_values(values)
+            table.append_row(row)
+        row = table.get_elements('table:table-row')[0]
+        row.set_repeated(2)
+        row.set_style(u"ro1")
+        table.sort_rows(['B', 0])
+        self.assertEqual(table.get_values(),
+                [[u"a", 0], [3, 1], [u"A", 1], [None, 1], [u"b", 2],
+                 [u"b", 2]])
+        rows = table.get_elements('table:table-row')
+        self.assertEqual(rows[-1].get_repeated(), 2)
+        self.assertEqual(rows[-1].get_style(), u"ro1")
+        table.sort_rows(0, reverse=True)
+        self.assertEqual(table.get_column_values(0),
+                [u"b", u"b", u"a", u"A", 3, None])
+        table.sort_rows(['B', 0], reverse=True)
+        self.assertEqual(table.get_values(),
+                [[u"b", 2], [u"b", 2], [u"A", 1], [3, 1], [None, 1],
+                 [u"a", 0]])
+
+
+    def test_sort_rows_groups(self):
+        table = self.table.clone()
+        group = odf_create_element(u'<table:table-row-group>'
+                u'<table:table-row><table:table-cell/></table:table-row>'
+                u'</table:table-row-group>')
+        table.insert(group, position=table.index(table.get_elements(
+            'table:table-row')[2]))
+        table.sort_rows(6, reverse=True)
+        children = [child.get_tag() for child in table.get_children()]
+        self.assertEqual(children[-5:], ['table:table-row'] * 2
+                + ['table:table-row-group'] + ['table:table-row'] * 2)
+        # The last row only moves up to the group
+        rows = table.get_elements('table:table-row')
+        self.assertEqual(rows[0].get_values(), [1, 1, 1, 2, 3, 3, 3])
+        self.assertEqual(rows[2].get_values(), [1, 2, 3, 4, 5, 6, 7])
+
+
+    def test_sort_rows_containers(self):
+        table = self._get_grouped_table()
+        table.sort_rows(0, reverse=True)
+        # The header row, and the single rows of the table and the group
+        # stay in place
+        self.assertEqual(table.get_column_values(0), [0, 1, 4, 3, 2, 5])
+        groups = [(y1, y2, group.get_tag())
+                for y1, y2, group in table.get_row_groups()]
+        self.assertEqual(groups, [(0, 0, 'table:table-header-rows'),
+            (1, 4, 'table:table-row-group'), (2, 4, 'table:table-row-group')])
+
+
+    def test_filter_rows(self):
+        table = self.table.clone()
+        deleted = table.filter_rows(lambda values: values[6] == 3)
+        self.assertEqual(deleted, 1)
+        self.assertEqual(table.get_values(), [[1, 1, 1, 2, 3, 3, 3]] * 3)
+
+
+    def _get_grouped_table(self):
+        table = odf_create_table(u"Grouped")
+        header = odf_create_header_rows()
+        header.append(odf_create_row(width=2))
+        table.append(header)
+        group = odf_create_row_group(height=1, width=2)
+        subgroup = odf_create_row_group()
+        subgroup.append(odf_create_row(width=2, repeated=3))
+        group.append(subgroup)
+        table.append(group)
+        table.append(odf_create_row(width=2))
+        table.append(odf_create_column(repeated=2))
+        for y in xrange(6):
+            table.set_value((0, y), y)
+        return table
+
+
+    def test_grouped_rows(self):
+        table = self._get_grouped_table()
+        self.assertEqual(table.get_size(), (2, 6))
+        self.assertEqual(table.get_column_values(0), range(6))
+        self.assertEqual(len(list(table.traverse())), 6)
+        self.assertEqual(table.get_row(3).get_value(0), 3)
+        # Rows stay in their group
+        self.assertEqual(len(table.get_elements('table:table-row')), 1)
+
+
+    def test_get_row_groups(self):
+        table = self._get_grouped_table()
+        groups = [(y1, y2, group.get_tag())
+                for y1, y2, group in table.get_row_groups()]
+        self.assertEqual(groups, [(0, 0, 'table:table-header-rows'),
+            (1, 4, 'table:table-row-group'),
+            (2, 4, 'table:table-row-group')])
+
+
+    def test_grouped_rows_insert_delete(self):
+        table = self._get_grouped_table()
+        table.insert_row(3, odf_create_row(width=2))
+        table.delete_row(0)
+        self.assertEqual(table.get_column_values(0),
+                [1, 2, None, 3, 4, 5])
+        groups = [(y1, y2) for y1, y2, group in table.get_row_groups()]
+        self.assertEqual(groups, [(0, -1), (0, 4), (1, 4)])
+
+
+    def test_merge_cells(self):
+        table = self.table.clone()
+        table.merge_cells('B2:C3')
+        self.assertEqual(table.get_spans(), [(1, 1, 2, 2)])
+        cell = table.get_cell('B2')
+        self.assertEqual(cell.get_attribute('table:number-columns-spanned'),
+                '2')
+        self.assertEqual(cell.get_attribute('table:number-rows-spanned'),
+                '2')
+        self.assertEqual(table.get_cell('C3').get_tag(),
+                'table:covered-table-cell')
+        self.assertEqual(table.get_cell('D3').get_tag(), 'table:table-cell')
+        # Values are kept
+        self.assertEqual(table.get_values(), self.table.get_values())
+
+
+    def test_get_span(self):
+        table = self.table.clone()
+        table.merge_cells('B2:C3')
+        self.assertEqual(table.get_span('B2'), (1, 1, 2, 2))
+        self.assertEqual(table.get_span('C3'), (1, 1, 2, 2))
+        self.assertEqual(table.get_span('A2'), None)
+        self.assertEqual(table.get_span('D2'), None)
+        self.assertEqual(table.get_span('B4'), None)
+
+
+    def test_merge_cells_overlap(self):
+        table = self.table.clone()
+        table.merge_cells('B2:C3')
+        self.assertRaises(ValueError, table.merge_cells, 'C3:D4')
+        # Merged ranges inside are merged again
+        table.merge_cells('A1:D4')
+        self.assertEqual(table.get_spans(), [(0, 0, 3, 3)])
+        self.assertEqual(table.get_cell('B2').get_tag(),
+                'table:covered-table-cell')
+
+
+    def test_split_cells(self):
+        table = self.table.clone()
+        table.merge_cells('B2:C3')
+        table.merge_cells('E1:F1')
+        table.split_cells('A1:B2')
+        self.assertEqual(table.get_spans(), [(4, 0, 5, 0)])
+        self.assertEqual(table.get_cell('C3').get_tag(), 'table:table-cell')
+        self.assertEqual(table.get_cell('B2').get_attribute(
+            'table:number-columns-spanned'), None)
+        table.split_cells()
+        self.assertEqual(table.get_spans(), [])
+        self.assertEqual(table.get_values(), self.table.get_values())
+
+
+    def test_merge_cells_repeated(self):
+        table = odf_create_table(u"Repeated", width=3, height=10)
+        table.merge_cells('A3:B5')
+        self.assertEqual(table.get_spans(), [(0, 2, 1, 4)])
+        self.assertEqual(table.get_height(), 10)
+        self.assertEqual(table.get_width(), 3)
+        self.assertEqual(table.get_cell('B4').get_tag(),
+                'table:covered-table-cell')
+        self.assertEqual(table.get_cell('C4').get_tag(), 'table:table-cell')
+
+
+    def test_get_span_repeated_row(self):
+        table = odf_create_table(u"Spanned")
+        row = odf_create_row(repeated=3)
+        cell = odf_create_cell(u"x")
+        cell.set_attribute('table:number-columns-spanned', '2')
+        row.append_cell(cell)
+        row.append(odf_create_element('<table:covered-table-cell/>'))
+        row.append_cell(odf_create_cell(1))
+        table.append_row(row)
+        table.append_row(odf_create_row(width=3))
+        self.assertEqual(table.get_spans(),
+                [(0, 0, 1, 0), (0, 1, 1, 1), (0, 2, 1, 2)])
+        self.assertEqual(table.get_span('B3'), (0, 2, 1, 2))
+        self.assertEqual(table.get_span('A2'), (0, 1, 1, 1))
+        self.assertEqual(table.get_span('C2'), None)
+        self.assertEqual(table.get_span('A4'), None)
+        table.split_cells('A2:A2')
+        self.assertEqual(table.get_spans(), [(0, 0, 1, 0), (0, 2, 1, 2)])
+        self.assertEqual(table.get_cell('B2').get_tag(), 'table:table-cell')
+        self.assertEqual(table.get_cell('B3').get_tag(),
+                'table:covered-table-cell')
+        table.split_cells()
+        self.assertEqual(table.get_spans(), [])
+        self.assertEqual(table.get_values(),
+                [[u"x", None, 1], [u"x", None, 1], [u"x", None, 1],
+                 [None, None, None]])
+
+
+    def test_get_span_tall(self):
+        table = odf_create_table(u"Tall", width=3, height=300)
+        table.merge_cells('B2:C250')
+        table.merge_cells('A100:A101')
+        self.assertEqual(table.get_span('C100'), (1, 1, 2, 249))
+        self.assertEqual(table.get_span('A101'), (0, 99, 0, 100))
+        self.assertEqual(table.get_span('A102'), None)
+        self.assertEqual(table.get_span('B251'), None)
+
+
+    def test_get_values_repeated_rows(self):
+        values = self.table.get_values()
+        values[0][0] = None
+        # Repeated rows are not the same list
+        self.assertEqual(values[1][0], 1)
+
+
+    def test_get_sparse_values(self):
+        table = odf_create_table(u"Sparse")
+        row = odf_create_row(repeated=2)
+        row.append_cell(odf_create_cell(repeated=3))
+        row.append_cell(odf_create_cell(u"a", repeated=2))
+        table.append_row(row)
+        table.append_row(odf_create_row(width=5, repeated=1000))
+        row = odf_create_row()
+        row.append_cell(odf_create_cell(1))
+        table.append_row(row)
+        self.assertEqual(table.get_sparse_values(),
+                [(3, 0, u"a"), (4, 0, u"a"), (3, 1, u"a"), (4, 1, u"a"),
+                 (0, 1002, 1)])
+
+
+    def test_huge_repeat(self):
+        table = odf_create_table(u"Huge")
+        row = odf_create_row()
+        row.append_cell(odf_create_cell(1))
+        row.append_cell(odf_create_cell(style=u"ce1", repeated=1024))
+        table.append_row(row)
+        row = odf_create_row(repeated=1048575)
+        row.append_cell(odf_create_cell(style=u"ce1", repeated=1025))
+        table.append_row(row)
+        # None of these expand the repetitions
+        self.assertEqual(table.is_empty(), False)
+        self.assertEqual(table.get_sparse_values(), [(0, 0, 1)])
+        table.rstrip(aggressive=True)
+        self.assertEqual(table.get_size(), (1, 1))
+
+
 
 class TestTableRow(TestCase):
 
@@ -879,6 +1267,18 @@ class TestTableRow(TestCase):
         self.assertEqual(coordinates, [3])
 
 
+    def test_get_row_list_indexed(self):
+        table = self.table.clone()
+        table.set_indexed()
+        coordinates = [y for y, row in table.get_rows(content=ur'1\s+1')]
+        self.assertEqual(coordinates, [1])
+        coordinates = [y for y, row in table.get_rows(content=ur'4')]
+        self.assertEqual(coordinates, [3])
+        table.set_value((6, 0), 4)
+        coordinates = [y for y, row in table.get_rows(content=ur'4')]
+        self.assertEqual(coordinates, [0, 3])
+
+
     def test_get_row_list_style(self):
         table = self.table.clone()
         # Set a different style manually
@@ -1125,6 +1525,44 @@ class TestTableCell(TestCase):
         self.assertEqual(coordinates, expected)
 
 
+    def test_get_cell_list_indexed(self):
+        table = self.table.clone()
+        table.set_indexed()
+        for content in [ur'3', ur'^[2-4]$', ur'(?i)x', ur'']:
+            for style in [None, u"ce1"]:
+                indexed = [(x, y, cell.serialize())
+                        for x, y, cell in table.get_cells(style=style,
+                            content=content)]
+                table.set_indexed(False)
+                scanned = [(x, y, cell.serialize())
+                        for x, y, cell in table.get_cells(style=style,
+                            content=content)]
+                table.set_indexed()
+                self.assertEqual(indexed, scanned)
+
+
+    def test_get_cell_list_indexed_flags(self):
+        table = odf_create_table(u"Flags", width=2, height=2)
+        table.set_value((1, 1), u"Hello world")
+        table.set_indexed()
+        for content in [compile(ur'hello', IGNORECASE),
+                compile(ur'Hel lo \s wor # comment', VERBOSE)]:
+            self.assertEqual([(x, y) for x, y, cell
+                in table.get_cells(content=content)], [(1, 1)])
+
+
+    def test_get_cell_list_indexed_reset(self):
+        table = self.table.clone()
+        table.set_indexed()
+        self.assertEqual(table.get_cells(content=ur'Changed'), [])
+        table.set_value('D3', u"Changed")
+        self.assertEqual([(x, y) for x, y, cell
+            in table.get_cells(content=ur'^Chan')], [(3, 2)])
+        table.delete_row(0)
+        self.assertEqual([(x, y) for x, y, cell
+            in table.get_cells(content=ur'^Chan')], [(3, 1)])
+
+
     def test_insert(self):
         table = self.table.clone()
         cell = table.insert_cell('B3')
@@ -1251,6 +1689,33 @@ class TestTableColumn(TestCase):
         self.assertEqual(self.table.get_column_values(3), [2, 2, 2, 4])
 
 
+    def test_insert_column_repeated(self):
+        table = odf_create_table(u"Repeated")
+        table.append(odf_create_column(repeated=5))
+        row = odf_create_row(repeated=100000)
+        row.append_cell(odf_create_cell(u"a", repeated=5))
+        table.append_row(row)
+        table.insert_column(2)
+        self.assertEqual(table.get_size(), (6, 100000))
+        self.assertEqual(table.get_values('A100000:F100000'),
+                [[u"a", u"a", None, u"a", u"a", u"a"]])
+        table.delete_column(0)
+        self.assertEqual(table.get_values('A1:F1'),
+                [[u"a", None, u"a", u"a", u"a", None]])
+
+
+    def test_set_column_values_repeated(self):
+        table = odf_create_table(u"Repeated", width=2)
+        table.append_row(odf_create_row(width=2, repeated=3))
+        table.set_column_values(1, [u"a", u"a", u"a", u"a"])
+        # Same cells for the repeated rows, not split
+        self.assertEqual(len(table.get_elements('table:table-row')), 2)
+        table.set_column_values(0, [1, 2, 2, 3])
+        self.assertEqual(len(table.get_elements('table:table-row')), 4)
+        self.assertEqual(table.get_values(),
+                [[1, u"a"], [2, u"a"], [2, u"a"], [3, u"a"]])
+
+
     def test_set_column_cell_values(self):
         table = self.table.clone()
         table.set_column_values(5, [u"a", u"b", u"c", u"d"])
@@ -1308,8 +1773,207 @@ class TestCSV(TestCase):
         self.assertEqual(self.table.serialize(), expected)
 
 
-    def _test_export_to_csv(self):
-        raise NotImplementedError
+    def test_import_from_csv_columns(self):
+        data = ('"id","price","name"\n' '1,2,a\n' '2,3.5,a\n' '3,x,a\n'
+                '3,x,a\n')
+        table = import_from_csv(StringIO(data), u"Columns")
+        self.assertEqual(table.get_values(),
+                [[u"id", u"price", u"name"],
+                 [1, 2, u"a"],
+                 [2, dec('3.5'), u"a"],
+                 [3, u"x", u"a"],
+                 [3, u"x", u"a"]])
+        self.assertEqual(table.get_width(), 3)
+
+
+    def test_import_from_csv_integers(self):
+        data = '"name","price"\na,2\nb,3.5\n'
+        table = import_from_csv(StringIO(data), u"Integers")
+        cell = table.get_cell((1, 1))
+        self.assertEqual(cell.get_attribute('office:value'), u"2")
+        self.assertEqual(cell.get_text_content(), u"2")
+        self.assertEqual(table.get_value((1, 2)), dec('3.5'))
+
+
+    def test_import_from_csv_line_endings(self):
+        data = '"a","b"\r1,2\r3,4\r'
+        table = import_from_csv(StringIO(data), u"Mac", delimiter=',')
+        self.assertEqual(table.get_values(), [[u"a", u"b"], [1, 2], [3, 4]])
+        data = '"a","b"\r\n1,2\n"c\rd",4'
+        table = import_from_csv(StringIO(data), u"Mixed", delimiter=',')
+        self.assertEqual(table.get_values(),
+                [[u"a", u"b"], [1, 2], [u"c\rd", 4]])
+
+
+    def test_import_from_csv_repeated(self):
+        data = '"a","a","b"\n"a","a","b"\n"c"\n'
+        table = import_from_csv(StringIO(data), u"Repeated")
+        self.assertEqual(table.get_values(),
+                [[u"a", u"a", u"b"],
+                 [u"a", u"a", u"b"],
+                 [u"c", None, None]])
+        row = table.get_elements('table:table-row')[0]
+        self.assertEqual(row.get_repeated(), 2)
+        self.assertEqual(row.get_elements('table:table-cell')[0]
+                .get_repeated(), 2)
+
+
+    def test_import_from_csv_whitespace(self):
+        data = '"line1\nline2","a\tb"\n"c\r\nd",e\n'
+        table = import_from_csv(StringIO(data), u"Whitespace", delimiter=',')
+        self.assertEqual(table.get_values(),
+                [[u"line1\nline2", u"a\tb"],
+                 [u"c\r\nd", u"e"]])
+
+
+    def test_export_to_csv(self):
+        self.assertEqual(self.table.to_csv(),
+                '"A float","3.14"\n"A date","1975-05-07 00:00:00"\n')
+
+
+    def test_export_to_csv_render(self):
+        table = self.table
+        self.assertEqual(table.to_csv(render='raw'),
+                '"A float","3.14"\n"A date","1975-05-07T00:00:00"\n')
+        cell = table.get_cell((0, 0))
+        cell.set_value(u'Say "é"', text=u"Said")
+        table.set_cell((0, 0), cell)
+        self.assertEqual(table.to_csv(render='text', delimiter=';'),
+                '"Said";"3.14"\n"A date";"1975-05-07T00:00:00"\n')
+        self.assertEqual(table.to_csv(render='raw').split('\n')[0],
+                '"Say ""\xc3\xa9""","3.14"')
+
+
+    def test_export_to_csv_decoding(self):
+        table = odf_create_table(u"Decoding")
+        table.set_value((0, 0), dec('2.50'))
+        self.assertEqual(table.to_csv(), '"2.50"\n')
+        self.assertEqual(table.to_csv(decoding='float'), '"2.5"\n')
+
+
+    def test_export_to_csv_rstrip(self):
+        table = odf_create_table(u"Big", width=10, height=3)
+        table.set_value((1, 1), 2)
+        table.set_value((0, 2), u"a")
+        table.append_row(odf_create_row(width=10, repeated=100000))
+        self.assertEqual(table.to_csv(rstrip=True),
+                '"",""\n"","2"\n"a",""\n')
+        # The table is left untouched
+        self.assertEqual(table.get_size(), (10, 100003))
+        self.assertEqual(len(table.to_csv().split('\n')), 100004)
+
+
+    def test_export_to_csv_parallel(self):
+        tables = [self.table, import_from_csv(StringIO('a,b\n1,2\n'), u"B")]
+        mkdir('trash')
+        try:
+            paths = ['trash/a.csv', 'trash/b.csv']
+            export_to_csv(tables, paths, processes=2)
+            self.assertEqual(open(paths[0]).read(), self.table.to_csv())
+            self.assertEqual(open(paths[1]).read(), '"a","b"\n"1","2"\n')
+        finally:
+            rmtree('trash')
+
+
+
+class TestSQLite(TestCase):
+
+    def setUp(self):
+        self.connection = connect(':memory:')
+
+
+    def tearDown(self):
+        self.connection.close()
+
+
+    def test_to_sqlite(self):
+        data = ('"id","price","name"\n' '1,2,a\n' '2,3.5,a\n' '3,x,a\n'
+                '4,,"b ""c"""\n')
+        table = import_from_csv(StringIO(data), u"My table")
+        table.to_sqlite(self.connection, header=True)
+        cursor = self.connection.execute('SELECT * FROM "My table"')
+        self.assertEqual([column[0] for column in cursor.description],
+                [u"id", u"price", u"name"])
+        # Mixed column without affinity
+        self.assertEqual(cursor.fetchall(),
+                [(1.0, 2, u"a"), (2.0, 3.5, u"a"), (3.0, u"x", u"a"),
+                 (4.0, u"", u'b "c"')])
+        schema = self.connection.execute('SELECT sql FROM sqlite_master'
+                ).fetchone()[0]
+        self.assertEqual(schema, u'CREATE TABLE "My table" ("id" REAL, '
+                u'"price" , "name" TEXT)')
+
+
+    def test_to_sqlite_names(self):
+        data = '"id","Id"," ",id,"C"\n1,2,3,4,5\n'
+        table = import_from_csv(StringIO(data), u"Names")
+        table.to_sqlite(self.connection, header=True)
+        cursor = self.connection.execute('SELECT * FROM Names')
+        self.assertEqual([column[0] for column in cursor.description],
+                [u"id", u"Id_2", u"C", u"id_3", u"C_2"])
+        self.assertEqual(cursor.fetchall(), [(1, 2, 3, 4, 5)])
+
+
+    def test_to_sqlite_repeated(self):
+        table = odf_create_table(u"Repeated", width=3, height=2)
+        table.set_value((0, 0), datetime(2010, 1, 2, 3, 4, 5))
+        table.set_value((1, 1), timedelta(hours=1))
+        table.append_row(odf_create_row(width=3, repeated=10000))
+        table.set_value((2, 10000), True)
+        table.to_sqlite(self.connection, name=u"Other")
+        cursor = self.connection.execute('SELECT * FROM Other')
+        self.assertEqual([column[0] for column in cursor.description],
+                [u"A", u"B", u"C"])
+        rows = cursor.fetchall()
+        self.assertEqual(len(rows), 10001)
+        self.assertEqual(rows[0], (u"2010-01-02T03:04:05", None, None))
+        self.assertEqual(rows[1], (None, u"PT01H00M00S", None))
+        self.assertEqual(rows[-1], (None, None, 1))
+        # Replaced
+        table.to_sqlite(self.connection, name=u"Other")
+        self.assertEqual(self.connection.execute('SELECT COUNT(*) FROM '
+            'Other').fetchone(), (10001,))
+
+
+    def test_import_from_cursor(self):
+        connection = self.connection
+        connection.execute('CREATE TABLE t (id INTEGER, price REAL, '
+                'name TEXT)')
+        connection.executemany('INSERT INTO t VALUES (?, ?, ?)',
+                [(1, 2.5, u"a"), (1, 2.5, u"a"), (2, None, u"<b>"),
+                 (1, 1.0, None)])
+        cursor = connection.execute('SELECT * FROM t')
+        table = import_from_cursor(cursor, u"From SQL", header=True,
+                batch_size=3)
+        self.assertEqual(table.get_values(),
+                [[u"id", u"price", u"name"],
+                 [1, dec('2.5'), u"a"],
+                 [1, dec('2.5'), u"a"],
+                 [2, None, u"<b>"],
+                 [1, 1, None]])
+        self.assertEqual(table.get_width(), 3)
+        row = table.get_elements('table:table-row')[1]
+        self.assertEqual(row.get_repeated(), 2)
+
+
+    def test_import_from_cursor_whitespace(self):
+        connection = self.connection
+        connection.execute('CREATE TABLE t (name TEXT)')
+        connection.execute('INSERT INTO t VALUES (?)',
+                (u"line1\nline2\r\n\tend",))
+        cursor = connection.execute('SELECT * FROM t')
+        table = import_from_cursor(cursor, u"Whitespace")
+        self.assertEqual(table.get_values(),
+                [[u"line1\nline2\r\n\tend"]])
+
+
+    def test_sqlite_round_trip(self):
+        table = import_from_csv(StringIO(csv_data), u"From CSV")
+        table.to_sqlite(self.connection)
+        cursor = self.connection.execute('SELECT * FROM "From CSV"')
+        self.assertEqual(import_from_cursor(cursor, u"From SQL").get_values(),
+                [[u"A float", dec('3.14')],
+                 [u"A date", u"1975-05-07T00:00:00"]])
 
 
 
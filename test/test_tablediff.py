@@ -0,0 +1,126 @@
+# -*- coding: UTF-8 -*-
+#
+# Copyright (c) 2009-2010 Ars Aperta, Itaapy, Pierlis, Talend.
+#
+# This file is part of Lpod (see: http://lpod-project.org).
+# Lpod is free software; you can redistribute it and/or modify it under
+# the terms of either:
+#
+# a) the GNU General Public License as published by the Free Software
+#    Foundation, either version 3 of the License, or (at your option)
+#    any later version.
+#    Lpod is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#    You should have received a copy of the GNU General Public License
+#    along with Lpod.  If not, see <http://www.gnu.org/licenses/>.
+#
+# b) the Apache License, Version 2.0 (the "License");
+#    you may not use this file except in compliance with the License.
+#    You may obtain a copy of the License at
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+
+
+
+# Import from the Standard Library
+from unittest import TestCase, main
+
+# Import from lpod
+from lpod.document import odf_new_document
+from lpod.table import odf_create_table, odf_create_row
+from lpod.tablediff import diff_tables, diff_documents, format_changes
+
+
+
+def make_table(name, values):
+    table = odf_create_table(name)
+    table.set_values(values)
+    return table
+
+
+
+class TestDiffTables(TestCase):
+
+    def setUp(self):
+        self.table = make_table(u"Sheet", [[1, u"a", 10],
+                                           [2, u"b", 20],
+                                           [3, u"c", 30]])
+
+
+    def test_identical(self):
+        self.assertEqual(diff_tables(self.table, self.table.clone()), [])
+
+
+    def test_changed_cell(self):
+        table = self.table.clone()
+        table.set_value('C2', 21)
+        self.assertEqual(diff_tables(self.table, table),
+                [('change-cell', u"Sheet", (2, 1), (2, 1), 20, 21)])
+
+
+    def test_inserted_deleted_rows(self):
+        table = make_table(u"Sheet", [[0, u"z", 0],
+                                      [1, u"a", 10],
+                                      [3, u"c", 30]])
+        self.assertEqual(diff_tables(self.table, table),
+                [('delete-row', u"Sheet", 1, None, [2, u"b", 20], None),
+                 ('insert-row', u"Sheet", None, 0, None, [0, u"z", 0])])
+
+
+    def test_key_columns(self):
+        table = make_table(u"Sheet", [[3, u"c", 31],
+                                      [1, u"a", 10],
+                                      [4, u"d", 40]])
+        self.assertEqual(diff_tables(self.table, table, key_columns=['A']),
+                [('delete-row', u"Sheet", 1, None, [2, u"b", 20], None),
+                 ('insert-row', u"Sheet", None, 2, None, [4, u"d", 40]),
+                 ('change-cell', u"Sheet", (2, 2), (2, 0), 30, 31)])
+
+
+    def test_style(self):
+        table = self.table.clone()
+        cell = table.get_cell('B3')
+        cell.set_style(u"ce1")
+        table.set_cell('B3', cell)
+        self.assertEqual(diff_tables(self.table, table),
+                [('change-style', u"Sheet", (1, 2), (1, 2), None, u"ce1")])
+
+
+    def test_repeated_rows(self):
+        table1 = self.table.clone()
+        table1.append_row(odf_create_row(width=3, repeated=1000))
+        table1.set_value('A1003', 1)
+        table2 = table1.clone()
+        table2.set_value('A500', u"x")
+        self.assertEqual(diff_tables(table1, table2),
+                [('change-cell', u"Sheet", (0, 499), (0, 499), None, u"x")])
+
+
+
+class TestDiffDocuments(TestCase):
+
+    def test_tables(self):
+        document1 = odf_new_document('spreadsheet')
+        document2 = odf_new_document('spreadsheet')
+        body1 = document1.get_body()
+        body2 = document2.get_body()
+        body1.clear()
+        body2.clear()
+        body1.append(make_table(u"A", [[1]]))
+        body1.append(make_table(u"B", [[1]]))
+        body2.append(make_table(u"B", [[2]]))
+        body2.append(make_table(u"C", [[1]]))
+        changes = diff_documents(document1, document2)
+        self.assertEqual(changes,
+                [('delete-table', u"A", None, None, None, None),
+                 ('change-cell', u"B", (0, 0), (0, 0), 1, 2),
+                 ('insert-table', u"C", None, None, None, None)])
+        self.assertEqual(format_changes(changes),
+                u"- table A\n~ B A1: 1 -> 2\n+ table C")
+
+
+
+if __name__ == '__main__':
+    main()
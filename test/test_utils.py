@@ -182,6 +182,12 @@ class FormulaConvertTestCase(TestCase):
         self.assertEqual(oooc_to_ooow(formula), excepted)
 
 
+    def test_sheet(self):
+        formula = "oooc:=[$Sheet1.A2]+SUM([$'My sheet'.B2:.B4])"
+        excepted = "ooow:<$Sheet1.A2>+sum <$'My sheet'.B2:B4>"
+        self.assertEqual(oooc_to_ooow(formula), excepted)
+
+
 
 class IsIterableTestCase(TestCase):
 
@@ -31,7 +31,7 @@ from datetime import date, datetime, timedelta
 from decimal import Decimal as dec
 from os import getcwd
 from os.path import splitdrive, join, sep
-from re import search
+from re import search, compile
 from sys import _getframe, modules
 from warnings import warn
 
@@ -42,6 +42,9 @@ from datatype import Boolean, Date, DateTime, Duration
 CELL_TYPES = ('boolean', 'currency', 'date', 'float', 'percentage', 'string',
               'time')
 
+# How numbers and other values are decoded from cells
+DECODINGS = ('decimal', 'float', 'raw')
+
 STYLE_FAMILIES = ('paragraph', 'text', 'section', 'table', 'table-column',
                   'table-row', 'table-cell', 'table-page', 'chart',
                   'default', 'drawing-page', 'graphic', 'presentation',
@@ -51,6 +54,15 @@ STYLE_FAMILIES = ('paragraph', 'text', 'section', 'table', 'table-column',
 NOTE_CLASSES = ('footnote', 'endnote')
 
 
+# Cell references of the "oooc:" and "of:" formulas: "[.A1]", "[.A1:.B2]",
+# "[$'My sheet'.$B$3]"...
+_formula_address = ur"\$?(?:'(?:[^']|'')*'|[^.:'$\[\]]*)\.\$?[A-Za-z]+\$?\d+"
+_formula_reference = compile(ur"\[(%s)(?::(%s))?\]" % (_formula_address,
+    _formula_address))
+# The sheet, column and line of an address
+_formula_address_parts = compile(
+        ur"^\$?('(?:[^']|'')*'|[^.:'$]*)\.\$?([A-Za-z]+)\$?(\d+)$")
+
 # This DPI is computed to have:
 # 640 px (width of your wiki) <==> 17 cm (width of a normal ODT page)
 DPI = 640 * dec('2.54') / 17
@@ -332,9 +344,13 @@ def _set_value_and_type(element, value=None, value_type=None, text=None,
     elif isinstance(value, (int, float, long, dec)):
         if value_type is None:
             value_type = 'float'
+        if isinstance(value, dec):
+            # Not "1.2E+3", no valid float value
+            value = '{0:f}'.format(value)
+        else:
+            value = str(value)
         if text is None:
             text = unicode(value)
-        value = str(value)
     elif type(value) is date:
         if value_type is None:
             value_type = 'date'
@@ -390,22 +406,43 @@ def _set_value_and_type(element, value=None, value_type=None, text=None,
 ######################################################################
 # Public API
 ######################################################################
-def get_value(element, value_type=None, try_get_text=True):
+def get_value(element, value_type=None, try_get_text=True,
+        decoding='decimal'):
     """Only for "with office:value-type" elements
+
+    Numbers are decoded as int or Decimal ("decimal"), always as float
+    ("float"), or values are left as the strings stored in the attributes
+    ("raw").
     """
+    if decoding not in DECODINGS:
+        raise ValueError, 'unknown decoding "%s"' % decoding
     if value_type is None:
         value_type = element.get_attribute('office:value-type')
     if value_type == 'boolean':
         value = element.get_attribute('office:boolean-value')
+        # "get_attribute" already decodes "true" and "false"
+        if type(value) is bool:
+            if decoding == 'raw':
+                return Boolean.encode(value)
+            return value
+        if decoding == 'raw':
+            return value
         return Boolean.decode(value)
     elif value_type in  ('float', 'percentage', 'currency'):
-        value = dec(element.get_attribute('office:value'))
+        value = element.get_attribute('office:value')
+        if decoding == 'float':
+            return float(value)
+        elif decoding == 'raw':
+            return value
+        value = dec(value)
         # Return 3 instead of 3.0 if possible
         if int(value) == value:
             return int(value)
         return value
     elif value_type == 'date':
         value = element.get_attribute('office:date-value')
+        if decoding == 'raw':
+            return value
         if 'T' in value:
             return DateTime.decode(value)
         else:
@@ -423,6 +460,8 @@ def get_value(element, value_type=None, try_get_text=True):
         return None
     elif value_type == 'time':
         value = element.get_attribute('office:time-value')
+        if decoding == 'raw':
+            return value
         return Duration.decode(value)
     elif value_type is None:
         return None
@@ -478,6 +517,15 @@ def convert_unicode(text):
 
 
 
+def _get_ooow_reference(match):
+    """"[.A1:.B2]" is "<A1:B2>", "[$Sheet1.A1]" is "<$Sheet1.A1>".
+    """
+    addresses = [address[1:] if address.startswith('.') else address
+            for address in match.groups() if address is not None]
+    return "<%s>" % ":".join(addresses)
+
+
+
 def oooc_to_ooow(formula):
     """Convert (proprietary) formula from calc format to writer format.
 
@@ -490,7 +538,7 @@ def oooc_to_ooow(formula):
     prefix, formula = formula.split(":=", 1)
     assert "oooc" in prefix
     # Convert cell addresses
-    formula = formula.replace("[.", "<").replace(":.", ":").replace("]", ">")
+    formula = _formula_reference.sub(_get_ooow_reference, formula)
     # Convert functions
     formula = formula.replace("SUM(", "sum ").replace(")", "")
     return "ooow:" + formula
@@ -34,7 +34,45 @@ from lxml.etree import parse, tostring
 
 # Import from lpod
 from element import _make_odf_element
-from utils import obsolete
+from utils import family_mapping, obsolete, _get_style_family
+
+
+
+def _get_family(style):
+    tag = style.get_tag()
+    if tag == 'style:style' or tag == 'style:default-style':
+        return style.get_attribute('style:family')
+    return _get_style_family(tag)
+
+
+
+def _get_style_keys(style):
+    """Get the (position in the index, key) pairs of the style.
+    """
+    family = _get_family(style)
+    if family is None:
+        return []
+    keys = []
+    # Default styles have no name
+    name = style.get_attribute('style:name')
+    if name is not None or style.get_tag() == 'style:default-style':
+        keys.append((0, (family, name)))
+    display_name = style.get_attribute('style:display-name')
+    if display_name is not None:
+        keys.append((1, (family, display_name)))
+    return keys
+
+
+
+def _add_style(index, style):
+    for position, key in _get_style_keys(style):
+        styles = index[position]
+        if key in styles:
+            # The first one wins
+            index[2].add((position, key))
+        else:
+            styles[key] = style
+
 
 
 class odf_xmlpart(object):
@@ -48,6 +86,11 @@ class odf_xmlpart(object):
         # Internal state
         self.__tree = None
         self.__root = None
+        # Style contexts, and their styles by (family, name) and (family,
+        # display name), by tag name, see "_styles_changed"
+        self.__style_contexts = {}
+        self.__style_indexes = {}
+        self.__style_version = 0
 
 
     def __get_tree(self):
@@ -102,6 +145,9 @@ class odf_xmlpart(object):
                 setattr(clone, name, self.container.clone())
             elif name in ('_odf_xmlpart__tree',):
                 setattr(clone, name, None)
+            elif name in ('_odf_xmlpart__style_contexts',
+                    '_odf_xmlpart__style_indexes'):
+                setattr(clone, name, {})
             else:
                 value = getattr(self, name)
                 value = deepcopy(value)
@@ -109,6 +155,111 @@ class odf_xmlpart(object):
         return clone
 
 
+    #
+    # Style index
+    #
+
+    def _get_style_context(self, tagname):
+        """Return the style context of the given tag name, like
+        "office:automatic-styles", or None, looked up on the first call
+        only.
+        """
+        contexts = self.__style_contexts
+        if tagname not in contexts:
+            contexts[tagname] = self.get_element(tagname)
+        return contexts[tagname]
+
+
+    def __build_style_index(self, context):
+        # [styles by (family, name), styles by (family, display name), keys
+        # shared by several styles]
+        index = [{}, {}, set()]
+        for style in context.get_children():
+            _add_style(index, style)
+        self.__style_indexes[context.get_tag()] = index
+        return index
+
+
+    def _get_indexed_style(self, context, family, name=None,
+            display_name=None):
+        """Like "context.get_style" for a name, a display name or the
+        default style, but from an index of the styles of the context
+        built on the first call.
+
+        The index follows the style methods of the part and the document.
+        Styles added or renamed through the element API need a call to
+        "_styles_changed"; a style found but since renamed or removed is
+        not returned.
+        """
+        if (family not in family_mapping or (name and display_name)
+                # Only the families of "style:style" have a default style
+                or not (name or display_name or family_mapping[family][1])):
+            return context.get_style(family, name_or_element=name,
+                    display_name=display_name)
+        if display_name:
+            key, attribute, position = display_name, 'style:display-name', 1
+        else:
+            key, attribute, position = name or None, 'style:name', 0
+        tagname = context.get_tag()
+        for attempt in (0, 1):
+            index = self.__style_indexes.get(tagname)
+            if index is None:
+                index = self.__build_style_index(context)
+            style = index[position].get((family, key))
+            if style is None:
+                return None
+            if (style.get_parent() is not None
+                    and style.get_attribute(attribute) == key):
+                return style
+            # Changed behind our back
+            del self.__style_indexes[tagname]
+        return None
+
+
+    def _append_style(self, context, style):
+        """Append the style to the context, keeping the index up to date.
+        """
+        context.append(style)
+        self.__style_version += 1
+        index = self.__style_indexes.get(context.get_tag())
+        if index is not None:
+            _add_style(index, style)
+
+
+    def _delete_style(self, context, style):
+        """Delete the style from the context, keeping the index up to date.
+        """
+        context.delete(style)
+        self.__style_version += 1
+        tagname = context.get_tag()
+        index = self.__style_indexes.get(tagname)
+        if index is None:
+            return
+        for position, key in _get_style_keys(style):
+            if (position, key) in index[2]:
+                # Another style may take its place
+                del self.__style_indexes[tagname]
+                return
+            index[position].pop(key, None)
+
+
+    def _styles_changed(self):
+        """Forget the style contexts and indexes of the part, after styles
+        were changed in place. Caches built on the styles, like the
+        effective properties of the document, are reset too.
+        """
+        self.__style_version += 1
+        self.__style_contexts.clear()
+        self.__style_indexes.clear()
+
+
+    def _get_style_version(self):
+        """Return a number changed on every change to the styles made
+        through the style methods, see "_styles_changed".
+        """
+        return self.__style_version
+
+
     def serialize(self, pretty=False):
         tree = self.__get_tree()
         # Lxml declaration is too exotic to me